@@ -0,0 +1,147 @@
+import re
+import time
+import asyncio
+import itertools
+import logging
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("AssetScheduler")
+
+DEFAULT_COST_MODEL = {
+    "base_seconds": 30,
+    "pdf_seconds_per_page": 4,
+    "video_seconds_per_minute": 20,
+}
+
+PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+@dataclass
+class QueueEntry:
+    asset_id: str
+    cost: float                 # 本阶段预估耗时（秒）
+    priority: int = 0           # 用户优先级，越大越先
+    enqueued_at: float = field(default_factory=time.monotonic)
+    seq: int = 0
+
+
+class AssetPriorityQueue:
+    """
+    阶段队列：支持 FIFO / 最短作业优先 (SJF)，叠加用户优先级与等待老化。
+    有效得分 = 预估耗时 - 优先级 * priority_weight - 已等待秒数 * aging_rate，得分最低者先出队。
+    """
+
+    def __init__(self, policy: str = "sjf", aging_rate: float = 1.0, priority_weight: float = 600):
+        self.policy = policy
+        self.aging_rate = aging_rate
+        self.priority_weight = priority_weight
+        self._entries: Dict[str, QueueEntry] = {}
+        self._seq = itertools.count()
+        self._not_empty = asyncio.Condition()
+
+    def _score(self, entry: QueueEntry, now: float):
+        base = entry.cost if self.policy == "sjf" else 0.0
+        waited = now - entry.enqueued_at
+        return (base - entry.priority * self.priority_weight - waited * self.aging_rate, entry.seq)
+
+    async def put(self, asset_id: str, cost: float, priority: int = 0):
+        async with self._not_empty:
+            self._entries[asset_id] = QueueEntry(asset_id, cost, priority, seq=next(self._seq))
+            self._not_empty.notify()
+
+    async def get(self) -> str:
+        async with self._not_empty:
+            while not self._entries:
+                await self._not_empty.wait()
+            now = time.monotonic()
+            entry = min(self._entries.values(), key=lambda e: self._score(e, now))
+            del self._entries[entry.asset_id]
+            return entry.asset_id
+
+    async def get_batch(self, max_items: int = 1, window: float = 0.0) -> List[str]:
+        """
+        阻塞取出首个资产，随后最多再等待 window 秒凑满 max_items 个（按当前调度顺序）。
+        """
+        first = await self.get()
+        batch = [first]
+        if max_items <= 1:
+            return batch
+        deadline = time.monotonic() + window
+        async with self._not_empty:
+            while len(self._entries) < max_items - 1:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._not_empty.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            for entry in self.ordered()[:max_items - 1]:
+                del self._entries[entry.asset_id]
+                batch.append(entry.asset_id)
+        return batch
+
+    def qsize(self) -> int:
+        return len(self._entries)
+
+    def ordered(self) -> List[QueueEntry]:
+        """按当前出队顺序排列的快照"""
+        now = time.monotonic()
+        return sorted(self._entries.values(), key=lambda e: self._score(e, now))
+
+    def set_priority(self, asset_id: str, priority: int) -> bool:
+        entry = self._entries.get(asset_id)
+        if entry is None:
+            return False
+        entry.priority = priority
+        return True
+
+
+# --- 上传时的廉价成本探测 ---
+
+def count_pdf_pages(path: Path) -> int:
+    try:
+        from pypdf import PdfReader
+        return len(PdfReader(str(path)).pages)
+    except Exception:
+        pass
+    # 无 pypdf 或解析失败时退回到扫描页对象
+    return len(PDF_PAGE_PATTERN.findall(Path(path).read_bytes()))
+
+
+async def probe_video_seconds(path: Path, timeout: float = 15) -> Optional[float]:
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        return float(stdout.decode().strip())
+    except Exception as e:
+        logger.warning(f"ffprobe failed for {path}: {e}")
+        return None
+
+
+async def estimate_asset_cost(asset_type: str, raw_path: str, cost_model: Optional[dict] = None) -> dict:
+    """
+    预估整条流水线耗时。PDF 按页数，视频按时长（ffprobe 失败时按 1 Mbps 码率由文件大小推算）。
+    """
+    model = dict(DEFAULT_COST_MODEL, **(cost_model or {}))
+    path = Path(raw_path)
+    if asset_type == "pdf":
+        try:
+            pages = await asyncio.to_thread(count_pdf_pages, path)
+        except Exception as e:
+            logger.warning(f"Page count failed for {path}: {e}")
+            pages = 0
+        units, unit = max(pages, 1), "pages"
+        seconds = model["base_seconds"] + units * model["pdf_seconds_per_page"]
+    else:
+        duration = await probe_video_seconds(path)
+        if duration is None:
+            duration = path.stat().st_size * 8 / 1_000_000 if path.exists() else 0
+        units, unit = round(duration, 1), "seconds"
+        seconds = model["base_seconds"] + duration / 60 * model["video_seconds_per_minute"]
+    return {"units": units, "unit": unit, "seconds": round(seconds, 1)}
@@ -1,10 +1,12 @@
-import json
+import time
 import logging
 import asyncio
 from enum import Enum
 from pathlib import Path
-from typing import Dict,Optional
+from typing import Dict, List, Optional, Set
 from datetime import datetime
+from core.registry_store import RegistryStore, create_registry_store
+from core.asset_scheduler import AssetPriorityQueue, estimate_asset_cost
 
 # --- 配置与日志 ---
 logging.basicConfig(
@@ -68,6 +70,68 @@ class AcademicAsset:
         asset.retry_count = data.get("retry_count", 0)
         return asset
 
+def resolve_processed_dir(asset: dict) -> Path:
+    """资产处理产物所在目录（PDF 的 MinerU 输出目录名不带 .pdf 后缀）"""
+    processed = asset.get("asset_processed_path") or ""
+    if asset.get("asset_type") == AssetType.PDF.value:
+        processed = processed.replace(".pdf", "")
+    return Path(processed)
+
+# --- 流水线阶段定义 ---
+# 每个阶段对应资产在该阶段执行期间的状态，按顺序流转
+PIPELINE_STAGES = [
+    AssetStatus.RECOGNIZING,
+    AssetStatus.CLIPING,
+    AssetStatus.STRUCTURING,
+    AssetStatus.INGESTING,
+]
+
+# 支持多资产单次调用的阶段（clip_work / milvus_ingest 接受 batch 参数）
+BATCHABLE_STAGES = [AssetStatus.CLIPING, AssetStatus.INGESTING]
+
+# 断点续跑时仍在执行中的状态（进程重启后这些资产没有 worker 在跑）
+INTERRUPTED_STATUSES = [stage.value for stage in PIPELINE_STAGES]
+
+def stage_artifacts(asset: dict, stage: AssetStatus) -> List[Path]:
+    """阶段完成后应存在的产物文件；入库阶段没有本地产物，仅记录完成标记"""
+    base = resolve_processed_dir(asset)
+    if stage == AssetStatus.RECOGNIZING:
+        if asset.get("asset_type") == AssetType.PDF.value:
+            middle = sorted(base.glob("**/*_middle.json"))
+            return middle[:1] or [base / f"{base.name}_middle.json"]
+        return [base / "transcript.json", base / f"{asset['asset_id']}.standard.mp4"]
+    if stage == AssetStatus.CLIPING:
+        return [base / "clip_features.json"]
+    if stage == AssetStatus.STRUCTURING:
+        return [base / "summary_outline.json"]
+    return []
+
+# 各阶段占整条流水线预估耗时的比例，用于阶段排队与 ETA 估算
+DEFAULT_STAGE_WEIGHTS = {
+    AssetStatus.RECOGNIZING: 0.7,
+    AssetStatus.CLIPING: 0.15,
+    AssetStatus.STRUCTURING: 0.1,
+    AssetStatus.INGESTING: 0.05,
+}
+
+DEFAULT_STAGE_CONCURRENCY = {
+    AssetStatus.RECOGNIZING: 1,  # GPU 识别（MinerU / Whisper）
+    AssetStatus.CLIPING: 2,
+    AssetStatus.STRUCTURING: 4,  # DeepSeek 调用，受网络而非显存限制
+    AssetStatus.INGESTING: 2,
+}
+
+def load_pipeline_config(config_path: str = "configs/model_config.yaml") -> dict:
+    # 延迟导入：各 wrapper 环境也会 import 本模块，不强制依赖 yaml
+    import yaml
+    full_path = Path(__file__).resolve().parent.parent / config_path
+    try:
+        with open(full_path, 'r', encoding='utf-8') as f:
+            return (yaml.safe_load(f) or {}).get('pipeline', {}) or {}
+    except Exception as e:
+        logger.warning(f"Pipeline config unavailable, using defaults: {e}")
+        return {}
+
 # --- 资产管理类 ---
 class GlobalAssetManager:
     _instance = None
@@ -81,185 +145,406 @@ class GlobalAssetManager:
     def __init__(self, storage_root: str = "./storage"):
         if hasattr(self, "_initialized"): return
         self.storage_root = Path(storage_root)
-        self.db_file = self.storage_root / "assets_registry.json"
-        
-        self.assets_map: Dict[str, dict] = {}
-        self.pending_queue = asyncio.Queue() 
-        self.current_processing_id: Optional[str] = None
-        self.is_worker_running = False
-        self._worker_task = None  
+
+        # 阶段级调度：每个阶段一个队列 + 独立并发上限，不同资产可在不同阶段重叠执行
+        pipeline_cfg = load_pipeline_config()
+        registry_cfg = pipeline_cfg.get('registry', {}) or {}
+        self.store: RegistryStore = create_registry_store(self.storage_root, registry_cfg.get('backend', 'sqlite'))
+        concurrency_cfg = pipeline_cfg.get('concurrency', {}) or {}
+        self.stage_concurrency: Dict[AssetStatus, int] = {
+            stage: max(1, int(concurrency_cfg.get(stage.value.lower(), DEFAULT_STAGE_CONCURRENCY[stage])))
+            for stage in PIPELINE_STAGES
+        }
+        # 成本感知调度：SJF / FIFO + 用户优先级 + 等待老化
+        sched_cfg = pipeline_cfg.get('scheduling', {}) or {}
+        self.cost_model = sched_cfg.get('cost_model', {}) or {}
+        weights_cfg = sched_cfg.get('stage_weights', {}) or {}
+        self.stage_weights: Dict[AssetStatus, float] = {
+            stage: float(weights_cfg.get(stage.value.lower(), DEFAULT_STAGE_WEIGHTS[stage]))
+            for stage in PIPELINE_STAGES
+        }
+        self.stage_queues: Dict[AssetStatus, AssetPriorityQueue] = {
+            stage: AssetPriorityQueue(
+                policy=sched_cfg.get('policy', 'sjf'),
+                aging_rate=float(sched_cfg.get('aging_rate', 1.0)),
+                priority_weight=float(sched_cfg.get('priority_weight', 600))
+            )
+            for stage in PIPELINE_STAGES
+        }
+        # 批处理阶段：一次把多个资产交给同一个 wrapper 调用（共享模型/连接）
+        batching_cfg = pipeline_cfg.get('batching', {}) or {}
+        self.stage_batching: Dict[AssetStatus, tuple] = {
+            stage: (max(1, int(cfg.get('max_batch', 1))), float(cfg.get('window_ms', 0)) / 1000)
+            for stage in BATCHABLE_STAGES
+            for cfg in [batching_cfg.get(stage.value.lower(), {}) or {}]
+        }
+        self.in_flight: Dict[AssetStatus, Set[str]] = {stage: set() for stage in PIPELINE_STAGES}
+        self._started_at: Dict[str, float] = {}  # 正在执行的资产 -> 本阶段开始时间
+        self.scheduled: Set[str] = set()  # 已进入流水线（排队或执行中）的资产，避免重复入队
+        self._stage_tasks: Dict[AssetStatus, List[asyncio.Task]] = {stage: [] for stage in PIPELINE_STAGES}
+        self._services = None
         
         self._initialized = True
-        self.load_state()
 
-    async def register_new_upload(self, asset_id: str, asset_type: str, raw_path: str):
+    @property
+    def is_worker_running(self) -> bool:
+        return any(not t.done() for tasks in self._stage_tasks.values() for t in tasks)
+
+    async def register_new_upload(self, asset_id: str, asset_type: str, raw_path: str, priority: int = 0):
         """[API] 注册新上传 - 修正了字典键名"""
         async with self._lock:
             # 这里的键名必须与 AcademicAsset.to_dict() 保持一致
-            self.assets_map[asset_id] = {
+            self.store.upsert({
                 "asset_id": asset_id,
                 "asset_type": asset_type,
                 "status": AssetStatus.UPLOADING.value,
                 "asset_raw_path": raw_path,
                 "asset_processed_path": "",
                 "created_at": datetime.now().isoformat(),
-                "retry_count": 0
-            }
-            self.save_state()
+                "retry_count": 0,
+                "priority": priority
+            })
             logger.info(f"Asset {asset_id} registered.")
 
-    async def update_to_raw(self, asset_id: str):
+    async def update_to_raw(self, asset_id: str, content_hash: Optional[str] = None) -> Optional[str]:
+        """
+        [API] 落盘完成：内容哈希命中已处理产物则直接链接并置为 READY，否则进入 RAW 待处理。
+        返回资产的最新状态。
+        """
+        async with self._lock:
+            record = self.store.get(asset_id)
+            if record is None:
+                return None
+            if content_hash and self._link_duplicate(record, content_hash):
+                return AssetStatus.READY.value
+        # 成本探测（ffprobe / 页数扫描）不占用锁
+        estimated_cost = await estimate_asset_cost(record["asset_type"], record["asset_raw_path"], self.cost_model)
         async with self._lock:
-            if asset_id in self.assets_map:
-                self.assets_map[asset_id]["status"] = AssetStatus.RAW.value
-                self.save_state()
-                logger.info(f"Asset {asset_id} moved to RAW and queued.")
+            fields = {"status": AssetStatus.RAW.value, "estimated_cost": estimated_cost}
+            if content_hash:
+                fields["content_hash"] = content_hash
+            self.store.update(asset_id, fields)
+            logger.info(f"Asset {asset_id} moved to RAW and queued.")
+            return AssetStatus.RAW.value
+
+    def _link_duplicate(self, record: dict, content_hash: str) -> bool:
+        """同内容资产已处理过：复用其解析产物与向量，跳过整条流水线"""
+        artifact = self.store.get_artifact(content_hash)
+        if not artifact or artifact.get("asset_type") != record["asset_type"]:
+            return False
+        if not (resolve_processed_dir(artifact) / "summary_outline.json").exists():
+            logger.warning(f"Artifacts for hash {content_hash[:12]} missing on disk, reprocessing {record['asset_id']}.")
+            return False
+
+        fields = {
+            "status": AssetStatus.READY.value,
+            "content_hash": content_hash,
+            "asset_processed_path": artifact["asset_processed_path"],
+        }
+        if artifact["asset_id"] != record["asset_id"]:
+            # 向量以原始资产名入库，检索结果会引用 duplicate_of 指向的资产
+            fields["duplicate_of"] = artifact["asset_id"]
+            canonical_raw = Path(artifact.get("asset_raw_path", ""))
+            new_raw = Path(record["asset_raw_path"])
+            if canonical_raw.exists() and canonical_raw.resolve() != new_raw.resolve():
+                new_raw.unlink(missing_ok=True)
+                fields["asset_raw_path"] = str(canonical_raw)
+        self.store.update(record["asset_id"], fields)
+        logger.info(f"Asset {record['asset_id']} deduplicated against {artifact['asset_id']} (sha256 {content_hash[:12]}).")
+        return True
+
+    def _index_artifacts(self, asset_id: str):
+        """资产处理完成后登记 内容哈希 -> 产物 索引"""
+        record = self.store.get(asset_id)
+        if not record or not record.get("content_hash"):
+            return
+        self.store.put_artifact(record["content_hash"], {
+            "asset_id": asset_id,
+            "asset_type": record["asset_type"],
+            "asset_raw_path": record["asset_raw_path"],
+            "asset_processed_path": record["asset_processed_path"],
+            "indexed_at": datetime.now().isoformat()
+        })
 
     async def start_queue_processing(self):
         count = 0
-        for aid, a_data in self.assets_map.items():
-            if a_data["status"] == AssetStatus.RAW.value:
-                # 检查是否已经在队列中（避免重复触发）
-                await self.pending_queue.put(aid)
+        for a_data in self.store.find_by_status(AssetStatus.RAW.value):
+            if await self._schedule(a_data["asset_id"], PIPELINE_STAGES[0]):
                 count += 1
-        if not self.is_worker_running:
-            logger.info("Starting Asset Queue Worker...")
-            self.is_worker_running = True
-            self._worker_task = asyncio.create_task(self._queue_worker())
-            self._worker_task.add_done_callback(self._on_worker_done)
+        count += await self._requeue_interrupted()
+        was_running = self.is_worker_running
+        self._ensure_stage_workers()
+        if not was_running:
             return {"status": "success", "message": f"Processor started. {count} assets queued."}
         return {"status": "success", "message": f"Worker already running. {count} new assets added to queue."}
 
+    async def _schedule(self, asset_id: str, stage: AssetStatus) -> bool:
+        if asset_id in self.scheduled:
+            return False
+        self.scheduled.add(asset_id)
+        await self._enqueue(asset_id, stage)
+        return True
+
+    def _stage_cost(self, record: dict, stage: AssetStatus) -> float:
+        total = (record.get("estimated_cost") or {}).get("seconds") or self.cost_model.get("base_seconds", 30)
+        return total * self.stage_weights[stage]
+
+    async def _enqueue(self, asset_id: str, stage: AssetStatus):
+        record = self.store.get(asset_id) or {}
+        await self.stage_queues[stage].put(
+            asset_id, cost=self._stage_cost(record, stage), priority=int(record.get("priority") or 0)
+        )
+
+    async def set_priority(self, asset_id: str, priority: int) -> bool:
+        """[API] 调整用户优先级，已在队列中的资产立即生效"""
+        if not self.store.update(asset_id, {"priority": priority}):
+            return False
+        for queue in self.stage_queues.values():
+            queue.set_priority(asset_id, priority)
+        return True
+
+    def _estimate_eta(self, record: dict) -> Optional[float]:
+        """
+        预计完成时间（秒）：所在阶段前方排队与执行中资产的耗时按并发摊分，加上自身剩余阶段耗时。
+        """
+        aid = record["asset_id"]
+        if aid not in self.scheduled:
+            return 0.0 if record["status"] == AssetStatus.READY.value else None
+        now = time.monotonic()
+        for idx, stage in enumerate(PIPELINE_STAGES):
+            queued = self.stage_queues[stage].ordered()
+            position = next((i for i, e in enumerate(queued) if e.asset_id == aid), None)
+            if position is None and aid not in self.in_flight[stage]:
+                continue
+            own = sum(self._stage_cost(record, s) for s in PIPELINE_STAGES[idx:])
+            if position is None:
+                return round(max(own - (now - self._started_at.get(aid, now)), 0.0), 1)
+            busy = sum(
+                max(self._stage_cost(self.store.get(other) or {}, stage) - (now - self._started_at.get(other, now)), 0.0)
+                for other in self.in_flight[stage]
+            )
+            ahead = sum(e.cost for e in queued[:position])
+            return round((busy + ahead) / self.stage_concurrency[stage] + own, 1)
+        return None
+
+    async def _requeue_interrupted(self) -> int:
+        """把上次进程退出时仍处于执行阶段的资产，从首个未完成阶段重新入队"""
+        count = 0
+        for a_data in self.store.find_by_status(*INTERRUPTED_STATUSES):
+            aid = a_data["asset_id"]
+            if aid in self.scheduled:
+                continue
+            stage = self._resume_stage(a_data)
+            if stage is None:
+                self.store.update(aid, {"status": AssetStatus.READY.value})
+                self._index_artifacts(aid)
+                continue
+            logger.info(f"Resuming interrupted asset {aid} from stage {stage.value}.")
+            if await self._schedule(aid, stage):
+                count += 1
+        return count
+
+    async def resume_interrupted(self) -> dict:
+        """[启动] 恢复被中断的流水线；没有中断资产时不启动 worker"""
+        count = await self._requeue_interrupted()
+        if count:
+            self._ensure_stage_workers()
+        return {"status": "success", "message": f"{count} interrupted assets resumed."}
+
+    async def retry_asset(self, asset_id: str) -> dict:
+        """[API] 重试失败资产：校验已完成阶段的产物，从首个未完成阶段继续"""
+        record = self.store.get(asset_id)
+        if record is None:
+            return {"status": "error", "message": "Asset not found"}
+        if record["status"] != AssetStatus.FAILED.value:
+            return {"status": "error", "message": f"Asset is {record['status']}, only Failed assets can be retried"}
+        stage = self._resume_stage(record)
+        self.store.update(asset_id, {"retry_count": record.get("retry_count", 0) + 1})
+        if stage is None:
+            self.store.update(asset_id, {"status": AssetStatus.READY.value})
+            self._index_artifacts(asset_id)
+            return {"status": "success", "message": "All stages already complete.", "resume_stage": None}
+        await self._schedule(asset_id, stage)
+        self._ensure_stage_workers()
+        return {"status": "success", "message": f"Asset re-queued at {stage.value}.", "resume_stage": stage.value}
+
+    def _resume_stage(self, record: dict) -> Optional[AssetStatus]:
+        """首个没有有效完成标记的阶段；某阶段产物失效时其后的标记一并作废"""
+        checkpoints = record.get("checkpoints") or {}
+        for idx, stage in enumerate(PIPELINE_STAGES):
+            marker = checkpoints.get(stage.value)
+            artifacts = (marker or {}).get("artifacts") or []
+            valid = bool(marker) and (bool(artifacts) or stage == AssetStatus.INGESTING) and all(
+                Path(a).is_file() and Path(a).stat().st_size > 0 for a in artifacts
+            )
+            if not valid:
+                stale = {s.value for s in PIPELINE_STAGES[idx:]}
+                if stale & checkpoints.keys():
+                    self.store.update(record["asset_id"], {
+                        "checkpoints": {k: v for k, v in checkpoints.items() if k not in stale}
+                    })
+                return stage
+        return None
+
+    def _record_checkpoint(self, asset_dict: dict, stage: AssetStatus):
+        """阶段完成标记与产物路径随注册表事务一并落盘"""
+        artifacts = [a for a in stage_artifacts(asset_dict, stage) if a.is_file()]
+        checkpoints = dict(asset_dict.get("checkpoints") or {})
+        checkpoints[stage.value] = {
+            "completed_at": datetime.now().isoformat(),
+            "artifacts": [str(a) for a in artifacts]
+        }
+        asset_dict["checkpoints"] = checkpoints
+        self.store.update(asset_dict["asset_id"], {"checkpoints": checkpoints})
+
+    def _ensure_stage_workers(self):
+        """按各阶段并发上限补齐 worker 协程（首次启动或异常退出后）"""
+        if self._services is None:
+            from core.services_manager import ServicesManager
+            self._services = ServicesManager()
+        for stage in PIPELINE_STAGES:
+            alive = [t for t in self._stage_tasks[stage] if not t.done()]
+            for _ in range(self.stage_concurrency[stage] - len(alive)):
+                task = asyncio.create_task(self._stage_worker(stage))
+                task.add_done_callback(self._on_worker_done)
+                alive.append(task)
+            self._stage_tasks[stage] = alive
+        logger.info(f"Stage workers running: { {s.value: len(t) for s, t in self._stage_tasks.items()} }")
+
     def _on_worker_done(self, task):
-        self.is_worker_running = False
+        if task.cancelled():
+            return
         try:
             task.result()
         except Exception as e:
             logger.error(f"Worker Task exited with CRITICAL ERROR: {e}", exc_info=True)
     
     def get_asset_status(self, asset_id: str) -> Optional[dict]:
-        return self.assets_map.get(asset_id)
+        record = self.store.get(asset_id)
+        if record:
+            record["eta_seconds"] = self._estimate_eta(record)
+        return record
 
     def get_all_assets(self) -> Dict[str, dict]:
-        return self.assets_map
+        assets = self.store.list_all()
+        for record in assets.values():
+            record["eta_seconds"] = self._estimate_eta(record)
+        return assets
     
     def get_global_status(self) -> dict:
-        has_uploading = any(a["status"] == AssetStatus.UPLOADING.value for a in self.assets_map.values())
+        has_uploading = self.store.count(AssetStatus.UPLOADING.value) > 0
+        stages = {
+            stage.value: {
+                "queued": self.stage_queues[stage].qsize(),
+                "in_flight": sorted(self.in_flight[stage]),
+                "concurrency": self.stage_concurrency[stage]
+            }
+            for stage in PIPELINE_STAGES
+        }
         state = GlobalStatus.WAITING.value
-        if self.current_processing_id:
+        if self.scheduled:
             state = GlobalStatus.HANDLING.value
         elif has_uploading:
             state = GlobalStatus.UPLOADING.value
 
         return {
             "global_state": state,
-            "assets_number": len(self.assets_map),
-            "queue_length": self.pending_queue.qsize(),
-            "current_processing": self.current_processing_id
+            "assets_number": self.store.count(),
+            "queue_length": sum(info["queued"] for info in stages.values()),
+            "in_flight_number": sum(len(info["in_flight"]) for info in stages.values()),
+            "stages": stages
         }
 
-    async def _queue_worker(self):
-        logger.info("Worker: [ENTERED] Background loop started.")
-        try:
-            from core.services_manager import ServicesManager
-            sm = ServicesManager()
-            logger.info("Worker: ServicesManager integrated.")
-        except Exception as e:
-            logger.error(f"Worker: Failed to import ServicesManager: {e}")
-            return
-
+    async def _stage_worker(self, stage: AssetStatus):
+        """单阶段消费协程：执行本阶段后把资产交给下一阶段队列（批处理阶段一次取多个）"""
+        queue = self.stage_queues[stage]
+        stage_idx = PIPELINE_STAGES.index(stage)
+        max_batch, window = self.stage_batching.get(stage, (1, 0.0))
         while True:
+            asset_ids = await queue.get_batch(max_batch, window)
+            for asset_id in asset_ids:
+                self.in_flight[stage].add(asset_id)
+                self._started_at[asset_id] = time.monotonic()
+            outcomes = {asset_id: False for asset_id in asset_ids}
             try:
-                q_size = self.pending_queue.qsize()
-                logger.info(f"Worker: Waiting for task... Current Queue Size: {q_size}")
-                
-                asset_id = await self.pending_queue.get()
-                self.current_processing_id = asset_id
-                
-                logger.info(f"Worker: >>> START Processing: {asset_id}")
-                await self._drive_pipeline(asset_id, sm)
-                logger.info(f"Worker: <<< FINISH Processing: {asset_id}")
-
+                logger.info(f"Worker[{stage.value}]: >>> START {asset_ids}")
+                outcomes.update(await self._drive_pipeline(asset_ids, stage, self._services))
+                logger.info(f"Worker[{stage.value}]: <<< FINISH {outcomes}")
             except Exception as e:
-                logger.error(f"Worker: Pipeline Error for {self.current_processing_id}: {e}", exc_info=True)
+                logger.error(f"Worker[{stage.value}]: Pipeline Error for {asset_ids}: {e}", exc_info=True)
+                for asset_id in asset_ids:
+                    self.store.update(asset_id, {"status": AssetStatus.FAILED.value, "failed_stage": stage.value})
             finally:
-                if self.current_processing_id:
-                    self.current_processing_id = None
-                    self.pending_queue.task_done()
-                self.save_state()
-
-    async def _drive_pipeline(self, asset_id: str, sm):
-        """驱动状态机：Raw -> Ready"""
-        # 每次从 map 获取最新的字典数据
-        asset_dict = self.assets_map[asset_id]
-        
-        steps = [
-            (AssetStatus.RAW, AssetStatus.RECOGNIZING),
-            (AssetStatus.RECOGNIZING, AssetStatus.CLIPING),
-            (AssetStatus.CLIPING, AssetStatus.STRUCTURING),
-            (AssetStatus.STRUCTURING, AssetStatus.INGESTING),
-            (AssetStatus.INGESTING, AssetStatus.READY)
-        ]
-
-        for current_step, next_step in steps:
-            asset_dict["status"] = next_step.value
-            self.save_state()
-
-            res = {"status": "error", "message": "Unknown step"}
-            
-            # 关键：实例化 AcademicAsset 对象传递给服务
-            asset_obj = AcademicAsset.from_dict(asset_dict)
-            
-            if current_step == AssetStatus.RAW:
-                if asset_dict["asset_type"] == "pdf":
-                    res = await sm.start_pdf_recognition(asset_obj)
+                for asset_id in asset_ids:
+                    self.in_flight[stage].discard(asset_id)
+                    self._started_at.pop(asset_id, None)
+
+            for asset_id, ok in outcomes.items():
+                if ok and stage_idx + 1 < len(PIPELINE_STAGES):
+                    await self._enqueue(asset_id, PIPELINE_STAGES[stage_idx + 1])
                 else:
-                    res = await sm.start_video_recognition(asset_obj)
-            
-            elif current_step == AssetStatus.RECOGNIZING:
-                res = await sm.start_clip_indexing(asset_obj)
-            
-            elif current_step == AssetStatus.CLIPING:
-                res = await sm.start_structure_generation(asset_obj)
-            
-            elif current_step == AssetStatus.STRUCTURING:
-                res = await sm.start_milvus_ingestion(asset_obj)
-            
-            elif current_step == AssetStatus.INGESTING:
-                res = {"status": "success"}
-
-            if res.get("status") == "success":
-                path_val = res.get("processed_path")
-                if path_val:
-                    if not str(path_val).startswith("/"):
-                        full_path = (self.storage_root / "processed" / path_val).resolve()
-                        asset_dict["asset_processed_path"] = str(full_path)
-                    else:
-                        asset_dict["asset_processed_path"] = str(path_val)
-                
-                if next_step == AssetStatus.READY:
-                    asset_dict["status"] = AssetStatus.READY.value
-            else:
-                asset_dict["status"] = AssetStatus.FAILED.value
-                logger.error(f"Pipeline failed at {current_step.value}: {res.get('message')}")
-                break 
-
-    def save_state(self):
-        try:
-            with open(self.db_file, 'w', encoding='utf-8') as f:
-                json.dump(self.assets_map, f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"Save state failed: {e}")
+                    if ok:
+                        self.store.update(asset_id, {"status": AssetStatus.READY.value})
+                        self._index_artifacts(asset_id)
+                    self.scheduled.discard(asset_id)
 
-    def load_state(self):
-        if self.db_file.exists():
-            try:
-                data = json.loads(self.db_file.read_text(encoding='utf-8'))
-                # 兼容旧版本 JSON 结构或直接覆盖
-                if "assets_map" in data:
-                    self.assets_map = data["assets_map"]
+    async def _drive_pipeline(self, asset_ids: List[str], stage: AssetStatus, sm) -> Dict[str, bool]:
+        """驱动状态机：执行一组资产在指定阶段的处理，逐资产返回是否成功"""
+        # 每次从注册表获取最新的记录
+        asset_dicts = []
+        outcomes: Dict[str, bool] = {}
+        for asset_id in asset_ids:
+            asset_dict = self.store.get(asset_id)
+            if asset_dict is None:
+                logger.error(f"Asset {asset_id} vanished from registry.")
+                outcomes[asset_id] = False
+                continue
+            asset_dict["status"] = stage.value
+            self.store.update(asset_id, {"status": stage.value})
+            asset_dicts.append(asset_dict)
+
+        # 关键：实例化 AcademicAsset 对象传递给服务
+        asset_objs = [AcademicAsset.from_dict(d) for d in asset_dicts]
+
+        if len(asset_objs) > 1 and stage == AssetStatus.CLIPING:
+            results = await sm.start_clip_indexing_batch(asset_objs)
+        elif len(asset_objs) > 1 and stage == AssetStatus.INGESTING:
+            results = await sm.start_milvus_ingestion_batch(asset_objs)
+        else:
+            results = {a.asset_id: await self._run_stage(a, stage, sm) for a in asset_objs}
+
+        for asset_dict in asset_dicts:
+            res = results.get(asset_dict["asset_id"]) or {"status": "error", "message": "No result reported for asset"}
+            outcomes[asset_dict["asset_id"]] = self._apply_stage_result(asset_dict, stage, res)
+        return outcomes
+
+    async def _run_stage(self, asset_obj: AcademicAsset, stage: AssetStatus, sm) -> dict:
+        if stage == AssetStatus.RECOGNIZING:
+            if asset_obj.asset_type == AssetType.PDF:
+                return await sm.start_pdf_recognition(asset_obj)
+            return await sm.start_video_recognition(asset_obj)
+        elif stage == AssetStatus.CLIPING:
+            return await sm.start_clip_indexing(asset_obj)
+        elif stage == AssetStatus.STRUCTURING:
+            return await sm.start_structure_generation(asset_obj)
+        elif stage == AssetStatus.INGESTING:
+            return await sm.start_milvus_ingestion(asset_obj)
+        return {"status": "error", "message": "Unknown step"}
+
+    def _apply_stage_result(self, asset_dict: dict, stage: AssetStatus, res: dict) -> bool:
+        asset_id = asset_dict["asset_id"]
+        if res.get("status") == "success":
+            path_val = res.get("processed_path")
+            if path_val:
+                if not str(path_val).startswith("/"):
+                    full_path = (self.storage_root / "processed" / path_val).resolve()
+                    asset_dict["asset_processed_path"] = str(full_path)
                 else:
-                    self.assets_map = data
-            
-            except Exception as e:
-                logger.error(f"Load state failed: {e}")
\ No newline at end of file
+                    asset_dict["asset_processed_path"] = str(path_val)
+                self.store.update(asset_id, {"asset_processed_path": asset_dict["asset_processed_path"]})
+            self._record_checkpoint(asset_dict, stage)
+            return True
+
+        self.store.update(asset_id, {"status": AssetStatus.FAILED.value, "failed_stage": stage.value})
+        logger.error(f"Pipeline failed at {stage.value} for {asset_id}: {res.get('message')}")
+        return False
@@ -1,9 +1,9 @@
 import logging
-import os
 import json
-import httpx
 import uuid
+import time
 from pathlib import Path
+from collections import OrderedDict
 import asyncio
 from enum import Enum
 from typing import List, Dict, Optional, Any, Union
@@ -16,6 +16,12 @@ load_dotenv()
 # 内部组件
 from core.services_manager import ServicesManager
 from core.prompts_manager import PromptManager
+from core.llm_client import LLMClient
+from core.evidence_manager import EvidenceManager, evidence_key, assess_sufficiency
+from core.sessions_store import SessionsStore
+from core.llm_governor import LLMGovernor
+from core import tracing
+from core.tracing import TurnTrace, PhaseLatency
 
 # --- 枚举定义 ---
 class ChatStatus(Enum):
@@ -38,20 +44,34 @@ class ChatMessage(BaseModel):
     timestamp: str = datetime.now().isoformat()
 
 class ChatSession:
-    def __init__(self, chat_id: str, chat_name: str):
+    def __init__(self, chat_id: str, chat_name: str, evidence_cfg: Optional[Dict] = None):
         self.chat_id = chat_id
         self.chat_name = chat_name
         self.status = ChatStatus.IDLE
         self.messages: List[ChatMessage] = []
-        self.evidence: List[Dict] = []
+        # 去重 + 跨轮衰减的证据集，各 prompt 只拿按预算挑选的子集
+        self.evidence_manager = EvidenceManager(cfg=evidence_cfg)
         self.retry_count = 0
         self.start_time = datetime.now().isoformat()
         self.last_update = datetime.now().isoformat()
+        # 最近若干轮的阶段耗时追踪（见 core/tracing.py）
+        self.traces: List[Dict] = []
+        # 尚未落盘的日志事件（由 ChatsManager.save_session 追加写入）
+        self._pending_events: List[Dict] = []
+
+    @property
+    def evidence(self) -> List[Dict]:
+        return self.evidence_manager.to_list()
+
+    @property
+    def turn(self) -> int:
+        """当前轮次 = 用户消息条数"""
+        return sum(1 for m in self.messages if m.role == "user")
 
     # --- 新增：从字典恢复会话对象 ---
     @classmethod
-    def from_dict(cls, data: Dict):
-        session = cls(data['chat_id'], data['chat_name'])
+    def from_dict(cls, data: Dict, evidence_cfg: Optional[Dict] = None):
+        session = cls(data['chat_id'], data['chat_name'], evidence_cfg=evidence_cfg)
         session.status = ChatStatus(data['status'])
         session.retry_count = data.get('retry_count', 0)
         session.start_time = data.get('uptime', datetime.now().isoformat())
@@ -59,14 +79,71 @@ class ChatSession:
         # 恢复消息列表
         if 'messages' in data: # 假设你在 to_dict 里补齐了 messages
              session.messages = [ChatMessage(**m) for m in data['messages']]
-        # 恢复证据
-        session.evidence = data.get('evidence', [])
+        # 恢复证据（旧会话中的重复条目在此合并）
+        session.evidence_manager = EvidenceManager(data.get('evidence', []), cfg=evidence_cfg)
+        session.traces = data.get('traces', [])
+        return session
+
+    @classmethod
+    def from_events(cls, chat_id: str, events: List[Dict], evidence_cfg: Optional[Dict] = None):
+        """按日志重放：首条快照 + 之后的增量事件"""
+        session = cls(chat_id, "New Academic Chat", evidence_cfg=evidence_cfg)
+        for event in events:
+            op = event.get("op")
+            if op == "snapshot":
+                session = cls.from_dict(event["data"], evidence_cfg=evidence_cfg)
+            elif op == "meta":
+                session.chat_name = event.get("chat_name", session.chat_name)
+                session.status = ChatStatus(event.get("status", session.status.value))
+                session.retry_count = event.get("retry_count", session.retry_count)
+                session.start_time = event.get("uptime", session.start_time)
+                session.last_update = event.get("last_active", session.last_update)
+            elif op == "message":
+                session.messages.append(ChatMessage(**event["data"]))
+            elif op == "evidence":
+                session.evidence_manager.add(event.get("items", []), event.get("turn", 0))
+            elif op == "trace":
+                session.add_trace(event["data"], keep=event.get("keep", 20), record=False)
         return session
 
     def update_status(self, new_status: ChatStatus):
         self.status = new_status
         self.last_update = datetime.now().isoformat()
 
+    def add_message(self, role: str, message: str):
+        msg = ChatMessage(role=role, message=message, timestamp=datetime.now().isoformat())
+        self.messages.append(msg)
+        self._pending_events.append({"op": "message", "data": msg.model_dump()})
+
+    def add_evidence(self, results: List[Dict]) -> int:
+        turn = self.turn
+        self._pending_events.append({"op": "evidence", "turn": turn, "items": results})
+        return self.evidence_manager.add(results, turn)
+
+    def add_trace(self, trace: Dict, keep: int = 20, record: bool = True):
+        self.traces = (self.traces + [trace])[-keep:]
+        if record:
+            self._pending_events.append({"op": "trace", "keep": keep, "data": trace})
+
+    def summary(self) -> dict:
+        """会话列表用的轻量元数据"""
+        return {
+            "chat_id": self.chat_id,
+            "chat_name": self.chat_name,
+            "status": self.status.value,
+            "messages_count": len(self.messages),
+            "evidence_count": len(self.evidence_manager),
+            "retry_count": self.retry_count,
+            "uptime": self.start_time,
+            "last_active": self.last_update
+        }
+
+    def drain_events(self) -> List[Dict]:
+        events, self._pending_events = self._pending_events, []
+        meta = self.summary()
+        events.append({"op": "meta", **{k: meta[k] for k in ("chat_name", "status", "retry_count", "uptime", "last_active")}})
+        return events
+
     def to_dict(self):
         # 补全了 messages 和 evidence 的导出，确保持久化完整
         return {
@@ -75,6 +152,7 @@ class ChatSession:
             "status": self.status.value,
             "messages": [m.model_dump() for m in self.messages], 
             "evidence": self.evidence,
+            "traces": self.traces,
             "messages_count": len(self.messages),
             "evidence_count": len(self.evidence),
             "retry_count": self.retry_count,
@@ -97,20 +175,39 @@ class ChatsManager:
         self.services = ServicesManager()
         self.prompt_manager = PromptManager()
         
-        # 活跃会话存储
-        self.active_chats: Dict[str, ChatSession] = {}
+        # 已加载会话的 LRU（空闲会话超出容量时被驱逐，需要时再从日志重放）
+        self.active_chats: "OrderedDict[str, ChatSession]" = OrderedDict()
         self.running_tasks: Dict[str, asyncio.Task] = {}
+        # 每个推理中会话的 SSE 旁路事件（排队位置等），由 chats 路由消费
+        self.event_channels: Dict[str, asyncio.Queue] = {}
         
-        # LLM 配置
-        self.api_key = os.getenv("DEEPSEEK_API_KEY")
-        self.base_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+        # LLM 配置：共享连接池的客户端（keep-alive / 重试）+ 全局准入控制
+        self.llm = LLMClient()
+        self.governor = LLMGovernor()
         
+        # 推理策略（专家超时等）
+        self.strategies = self._load_strategies()
+
         # 路径配置
         self.storage_dir = Path("./storage/chats")
         self.storage_dir.mkdir(parents=True, exist_ok=True)
         
-        # --- 关键新增：启动时加载本地数据 ---
-        self._load_local_sessions()
+        # 会话存储：只追加日志 + 元数据索引，启动时不加载会话正文
+        store_cfg = self.strategies.get("sessions", {}) or {}
+        self.max_loaded_sessions = store_cfg.get("max_loaded_sessions", 32)
+        self.store = SessionsStore(self.storage_dir, compact_every=store_cfg.get("compact_every", 200))
+
+        # 投机检索统计：原始消息检索与 query_refiner 并行，事后合并或丢弃
+        self.speculation_stats = {"turns": 0, "merged": 0, "discarded": 0, "failed": 0,
+                                  "hits_merged": 0, "hits_selected": 0, "hits_survived": 0}
+        # 证据评估统计：本地打分可跳过的 evidence_evaluator 调用
+        self.evaluation_stats = {"evaluations": 0, "llm_calls": 0, "skipped_proceed": 0,
+                                 "skipped_refetch": 0, "skipped_final": 0}
+        # 阶段耗时追踪：每轮的 span 随会话持久化，跨会话的分位数只在内存中统计
+        trace_cfg = self.strategies.get("tracing", {}) or {}
+        self.tracing_enabled = trace_cfg.get("enabled", True)
+        self.trace_keep_turns = trace_cfg.get("keep_turns", 20)
+        self.phase_latency = PhaseLatency(window=trace_cfg.get("window", 2000))
         
         self.logger = logging.getLogger("ChatsManager")
         logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] [%(name)s] - %(message)s')
@@ -122,11 +219,150 @@ class ChatsManager:
         elif level == "error": self.logger.error(f"{extra} - {msg}")
         elif level == "warn": self.logger.warning(f"{extra} - {msg}")
 
+    # --- 投机检索 ---
+
+    def _start_speculative_search(self, chat_id: str, user_message: str) -> Optional[asyncio.Task]:
+        """refiner 往返期间先用原始消息检索（CLIP 文本编码只取前 77 个 token，故不带历史）"""
+        cfg = self.strategies.get("speculative_search", {}) or {}
+        if not cfg.get("enabled", False):
+            return None
+        spec_needs = {
+            "search_params": {"keywords": [user_message], "top_k": cfg.get("top_k", 8)},
+            "preferences": {}
+        }
+        self._log(chat_id, "info", "Speculative search started alongside query refinement.")
+        return asyncio.create_task(self._traced_search("speculative_search", spec_needs))
+
+    async def _traced_search(self, span_name: str, search_needs: dict, **attrs) -> dict:
+        """检索子进程调用，记录请求与结果大小"""
+        with tracing.span(span_name, request_bytes=len(json.dumps(search_needs, ensure_ascii=False).encode("utf-8")), **attrs) as record:
+            response = await self.services.start_academic_search(search_needs)
+            results = response.get("results", [])
+            record["results"] = len(results) if isinstance(results, list) else 0
+            record["response_bytes"] = len(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+            if response.get("status") != "success":
+                record["status"] = "failed"
+            return response
+
+    async def _merge_speculative(self, chat_id: str, spec_task: asyncio.Task, search_needs: dict, refined_results: List[Dict]) -> List[Dict]:
+        """
+        按 refiner 得出的硬偏好（资产名 / 模态）过滤投机结果，
+        且只保留得分不低于精确检索最低分的条目；精确检索为空时整体采用。
+        """
+        self.speculation_stats["turns"] += 1
+        try:
+            spec_response = await spec_task
+        except Exception as e:
+            self._log(chat_id, "warn", f"Speculative search failed: {e}")
+            self.speculation_stats["failed"] += 1
+            return []
+        spec_hits = spec_response.get("results", []) if spec_response.get("status") == "success" else []
+        if not isinstance(spec_hits, list) or not spec_hits:
+            self.speculation_stats["failed" if spec_response.get("status") != "success" else "discarded"] += 1
+            return []
+
+        prefs = search_needs.get("preferences", {}) or {}
+        pref_asset = (prefs.get("asset_name") or "").lower()
+        pref_mod = prefs.get("modality") if prefs.get("modality") in ("pdf", "video") else None
+        floor = min((float(r.get("score", 0)) for r in refined_results), default=None)
+        refined_keys = {evidence_key(r) for r in refined_results}
+
+        kept = []
+        for hit in spec_hits:
+            meta = hit.get("metadata", {}) or {}
+            if pref_asset and pref_asset not in (meta.get("asset_name") or "").lower():
+                continue
+            if pref_mod and meta.get("modality") != pref_mod:
+                continue
+            if floor is not None and float(hit.get("score", 0)) < floor:
+                continue
+            if evidence_key(hit) in refined_keys:
+                continue
+            kept.append(hit)
+
+        self.speculation_stats["merged" if kept else "discarded"] += 1
+        self.speculation_stats["hits_merged"] += len(kept)
+        self._log(chat_id, "info", f"Speculative search: {len(kept)}/{len(spec_hits)} hits merged.")
+        return kept
+
+    # --- 证据评估 ---
+
+    async def _evaluate_evidence(self, chat_id: str, session: ChatSession, search_needs: dict,
+                                 search_context_str: str, final_attempt: bool) -> str:
+        """
+        先本地打分：明显充足直接 proceed，明显不足直接 refetch，灰区才调用 evidence_evaluator。
+        最后一次尝试无论结论如何都会结束循环，因此不再评估。
+        """
+        stats = self.evaluation_stats
+        stats["evaluations"] += 1
+        if final_attempt:
+            stats["skipped_final"] += 1
+            return "proceed"
+
+        docs = session.evidence_manager.select("evidence_evaluator", session.turn)
+        cfg = self.strategies.get("sufficiency", {}) or {}
+        if cfg.get("enabled", True):
+            min_relevance = (self.strategies.get("retrieval_preferences", {}) or {}).get("min_relevance_threshold", 0.55)
+            keywords = (search_needs.get("search_params", {}) or {}).get("keywords", [])
+            verdict, confidence = assess_sufficiency(docs, keywords, min_relevance, cfg)
+            if verdict is not None:
+                stats[f"skipped_{verdict}"] += 1
+                self._log(chat_id, "info", f"Local sufficiency {confidence}: {verdict}, LLM evaluation skipped.")
+                return verdict
+            self._log(chat_id, "info", f"Local sufficiency {confidence}: borderline, asking LLM.")
+
+        stats["llm_calls"] += 1
+        eval_prompt = self.prompt_manager.render(
+            "evidence_evaluator", 
+            query=search_context_str, 
+            docs=docs,
+            retry_count=session.retry_count # 传入重试次数辅助 LLM 决策
+        )
+        eval_report = await self._direct_llm_call(eval_prompt, template="evidence_evaluator", chat_id=chat_id)
+        return eval_report.get("action", "refetch")
+
+    def _load_strategies(self, config_path: str = "configs/strategies.yaml") -> dict:
+        import yaml
+        full_path = Path(__file__).resolve().parent.parent / config_path
+        try:
+            with open(full_path, 'r', encoding='utf-8') as f:
+                return yaml.safe_load(f) or {}
+        except Exception as e:
+            logging.getLogger("ChatsManager").warning(f"Strategies config unavailable, using defaults: {e}")
+            return {}
+
     # --- 核心方法 ---
 
-    async def _direct_llm_call(self, prompt_or_messages: Union[str, List[Dict]], json_mode: bool = True, stream: bool = False) -> Any:
-        """支持流式的 LLM 调用"""
-        headers = {"Authorization": f"Bearer {self.api_key}"}
+    # --- SSE 旁路事件 ---
+
+    def open_event_channel(self, chat_id: str) -> asyncio.Queue:
+        channel = asyncio.Queue()
+        self.event_channels[chat_id] = channel
+        return channel
+
+    def close_event_channel(self, chat_id: str):
+        self.event_channels.pop(chat_id, None)
+
+    def _queue_reporter(self, chat_id: Optional[str], phase: Optional[str]):
+        """LLM 排队期间把位置与等待时长推给该会话的 SSE 通道"""
+        async def report(position: int, waited: float):
+            channel = self.event_channels.get(chat_id)
+            session = self.active_chats.get(chat_id)
+            if channel is None:
+                return
+            await channel.put(("queue", {
+                "status": session.status.value if session else None,
+                "phase": phase,
+                "queue_position": position,
+                "queue_wait_ms": round(waited * 1000)
+            }))
+        return report
+
+    async def _direct_llm_call(self, prompt_or_messages: Union[str, List[Dict]], json_mode: bool = True, stream: bool = False, template: Optional[str] = None, chat_id: Optional[str] = None) -> Any:
+        """
+        支持流式的 LLM 调用；template 用于命中响应缓存（见 model_config.yaml llm.cache），
+        同时作为准入控制的阶段名，chat_id 用于跨会话公平排队。
+        """
         if isinstance(prompt_or_messages, str):
             messages = [{"role": "user", "content": prompt_or_messages}]
         else:
@@ -139,79 +375,216 @@ class ChatsManager:
         if json_mode:
             payload["response_format"] = {"type": "json_object"}
         
-        # 增加超时设置
-        timeout = httpx.Timeout(180.0, connect=10.0)
-        client = httpx.AsyncClient(timeout=timeout)
-        
+        gate = self.governor.slot(chat_id, template, on_wait=self._queue_reporter(chat_id, template))
+        span_name = f"llm:{template or 'default'}"
+        request_bytes = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
         if not stream:
-            async with client:
-                response = await client.post(f"{self.base_url}/chat/completions", headers=headers, json=payload)
-                response.raise_for_status()
-                content = response.json()['choices'][0]['message']['content']
-                if json_mode:
-                    clean_content = content.replace("```json", "").replace("```", "").strip()
-                    return json.loads(clean_content)
-                return content
+            with tracing.span(span_name, request_bytes=request_bytes):
+                response = await self.llm.chat(payload, template=template, gate=gate)
+            content = response['choices'][0]['message']['content']
+            if json_mode:
+                clean_content = content.replace("```json", "").replace("```", "").strip()
+                return json.loads(clean_content)
+            return content
         else:
             # 流式返回模式 (注意：流式通常不建议配合 json_mode 使用)
-            async def gen():
-                full_content = []
-                try:
-                    async with client.stream("POST", f"{self.base_url}/chat/completions", headers=headers, json=payload) as r:
-                        r.raise_for_status()
-                        async for line in r.aiter_lines():
-                            if not line or line == "data: [DONE]": continue
-                            if line.startswith("data: "):
-                                data = json.loads(line[6:])
-                                delta = data['choices'][0]['delta'].get('content', '')
-                                if delta:
-                                    full_content.append(delta)
-                                    yield delta
-                finally:
-                    await client.aclose()
-            return gen()
+            return self._traced_stream(span_name, request_bytes, self.llm.stream_chat(payload, template=template, gate=gate))
+
+    async def _traced_stream(self, span_name: str, request_bytes: int, stream):
+        """流式调用的 span 覆盖整个流，并记录首 token 时间（ttft_ms）"""
+        with tracing.span(span_name, request_bytes=request_bytes) as record:
+            started = time.perf_counter()
+            chars = 0
+            async for delta in stream:
+                if not chars:
+                    record["ttft_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                chars += len(delta)
+                yield delta
+            record["response_chars"] = chars
     
-    def _load_local_sessions(self):
-        """扫描 storage 目录，恢复所有历史会话到内存"""
-        count = 0
-        for file_path in self.storage_dir.glob("*.json"):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    session = ChatSession.from_dict(data)
-                    # 重启后状态统一设为 IDLE，防止卡在 Researching
-                    if session.status != ChatStatus.FAILED:
-                        session.status = ChatStatus.IDLE
-                    self.active_chats[session.chat_id] = session
-                    count += 1
-            except Exception as e:
-                print(f"Error loading session {file_path}: {e}")
-        if count > 0:
-            print(f"成功从本地加载了 {count} 个历史会话")
-
-    def save_session(self, chat_id: str):
+    # --- Strengthening: 专家分支 ---
+
+    async def _vision_branch(self, chat_id: str, session: ChatSession, intent: dict, search_context_str: str) -> str:
+        """视觉专家：针对首个视频证据的关键帧"""
+        # 寻找第一个视频证据来获取帧路径
+        video_doc = next((d for d in session.evidence_manager.ranked(session.turn)
+                          if d.get("metadata", {}).get("modality") == "video"), None)
+        if not video_doc:
+            return "N/A"
+        meta = video_doc.get("metadata", {})
+        asset_name = meta.get("asset_name")
+        ts = meta.get("timestamp", 0)
+
+        # 构造对齐存储结构的路径
+        frame_path = f"storage/processed/video/{asset_name}/frames/time_{ts}.jpg"
+
+        # 获取策略指令
+        strategy_key = intent.get("vision_strategy", "scene_description")
+        vlm_instruction = f"Strategy: {strategy_key}. Context: {search_context_str}"
+
+        vlm_params = {
+            "image": frame_path,
+            "prompt": vlm_instruction
+        }
+        self._log(chat_id, "info", f"Calling Vision Expert for frame at {ts}s")
+        with tracing.span("expert:vision", request_bytes=len(json.dumps(vlm_params, ensure_ascii=False).encode("utf-8"))):
+            vlm_output = await self.services.call_visual_expert(params=vlm_params)
+        return vlm_output.get("response", "Vision parse failed.")
+
+    async def _sandbox_branch(self, chat_id: str, session: ChatSession) -> str:
+        """沙箱专家：先由 LLM 提取公式/代码，再执行验证"""
+        self._log(chat_id, "info", "Calling Sandbox for logic verification...")
+        # 1. 提取公式与准备代码 (直连)
+        docs = session.evidence_manager.select("sandbox_prep", session.turn)
+        combined_evidence = " ".join([str(d.get("content", "")) for d in docs])
+        sb_prep_prompt = self.prompt_manager.render("sandbox_prep", context=combined_evidence)
+        sb_instructions = await self._direct_llm_call(sb_prep_prompt, template="sandbox_prep", chat_id=chat_id)
+
+        # 2. 调用沙箱专家 (传递准备好的指令字典)
+        if sb_instructions.get("expression") == "empty":
+            return "No complex formulas to verify."
+        with tracing.span("expert:sandbox", request_bytes=len(json.dumps(sb_instructions, ensure_ascii=False).encode("utf-8"))):
+            sandbox_output = await self.services.call_sandbox_expert(params=sb_instructions)
+        return f"Verified Result: {sandbox_output.get('result', 'Calculation failed')}"
+
+    @staticmethod
+    async def _traced_branch(name: str, coro):
+        # wait_for 把分支包成独立任务，span 挂在 strengthening 之下，超时记为 cancelled
+        with tracing.span(f"branch:{name}"):
+            return await coro
+
+    async def _run_strengthening(self, chat_id: str, session: ChatSession, intent: dict, search_context_str: str):
+        """
+        视觉与沙箱两条分支互不依赖，并发执行且各自限时；
+        单个分支失败或超时不阻塞合成，对应结果降级为说明文字。
+        """
+        timeouts = self.strategies.get("strengthening", {}) or {}
+        branches = {}
+        if intent.get("need_vision") and len(session.evidence_manager):
+            branches["vision"] = (self._traced_branch("vision", self._vision_branch(chat_id, session, intent, search_context_str)),
+                                  timeouts.get("vision_timeout", 120))
+        if intent.get("need_sandbox"):
+            branches["sandbox"] = (self._traced_branch("sandbox", self._sandbox_branch(chat_id, session)),
+                                   timeouts.get("sandbox_timeout", 90))
+
+        names = list(branches)
+        outcomes = await asyncio.gather(
+            *[asyncio.wait_for(coro, timeout=limit) for coro, limit in branches.values()],
+            return_exceptions=True
+        )
+        results = {"vision": "N/A", "sandbox": "N/A"}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                self._log(chat_id, "warn", f"{name} branch timed out after {branches[name][1]}s, skipped.")
+                results[name] = f"{name} expert timed out."
+            elif isinstance(outcome, Exception):
+                self._log(chat_id, "error", f"{name} branch failed: {outcome}")
+                results[name] = f"{name} expert failed: {outcome}"
+            else:
+                results[name] = outcome
+        return results["vision"], results["sandbox"]
+
+    def _finish_trace(self, session: ChatSession, trace: TurnTrace):
+        data = trace.to_dict()
+        data["status"] = session.status.value
+        session.add_trace(data, keep=self.trace_keep_turns)
+        self.phase_latency.add(data)
+
+    def get_session(self, chat_id: str) -> Optional[ChatSession]:
+        """取会话：未加载时从日志重放，并维护 LRU"""
         session = self.active_chats.get(chat_id)
+        if session is not None:
+            self.active_chats.move_to_end(chat_id)
+            return session
+        if not self.store.exists(chat_id):
+            return None
+        try:
+            session = ChatSession.from_events(chat_id, self.store.read_events(chat_id), evidence_cfg=self.strategies.get("evidence"))
+        except Exception as e:
+            self.logger.error(f"Error loading session {chat_id}: {e}")
+            return None
+        # 未在运行中的会话统一设为 IDLE，防止卡在 Researching
+        if session.status != ChatStatus.FAILED:
+            session.status = ChatStatus.IDLE
+        self.active_chats[chat_id] = session
+        self._evict_idle_sessions()
+        return session
+
+    def _evict_idle_sessions(self):
+        for cid in list(self.active_chats):
+            if len(self.active_chats) <= self.max_loaded_sessions:
+                break
+            if cid in self.running_tasks:
+                continue
+            session = self.active_chats.pop(cid)
+            # 驱逐前落盘并压缩，下次加载只需读一条快照
+            self.save_session(cid, session=session)
+            self.store.compact(cid, session.to_dict())
+
+    def save_session(self, chat_id: str, session: Optional[ChatSession] = None):
+        session = session or self.active_chats.get(chat_id)
         if not session: return
-        storage_path = self.storage_dir / f"{chat_id}.json"
-        with open(storage_path, "w", encoding="utf-8") as f:
-            json.dump(session.to_dict(), f, ensure_ascii=False, indent=2)
+        if self.store.append(chat_id, session.drain_events(), session.summary()):
+            self.store.compact(chat_id, session.to_dict())
 
     # --- API 视察接口 ---
 
     def get_overall_status(self) -> dict:
+        # 推理中的会话一定常驻内存，无需扫描全部历史
         is_querying = any(c.status != ChatStatus.IDLE for c in self.active_chats.values())
+        stats = self.speculation_stats
+        ev = self.evaluation_stats
+        # 最后一次尝试不做任何评估，不计入本地打分的跳过率
+        judged = ev["evaluations"] - ev["skipped_final"]
         return {
-            "chats_number": len(self.active_chats),
+            "chats_number": self.store.count(),
             "chats_status": GlobalChatStatus.QUERYING.value if is_querying else GlobalChatStatus.WAITING.value,
+            "evaluation": dict(ev, skip_rate=round((ev["skipped_proceed"] + ev["skipped_refetch"]) / judged, 4) if judged else 0.0),
+            "speculation": dict(
+                stats,
+                merge_rate=round(stats["merged"] / stats["turns"], 4) if stats["turns"] else 0.0,
+                # 进入最终合成证据的投机命中占其合并数的比例
+                survival_rate=round(stats["hits_survived"] / stats["hits_merged"], 4) if stats["hits_merged"] else 0.0
+            ),
             "timestamp": datetime.now().isoformat()
         }
 
     def get_all_chats(self) -> Dict[str, dict]:
-        return {cid: session.to_dict() for cid, session in self.active_chats.items()}
+        """会话列表只返回索引中的元数据，messages / evidence 需按 chat_id 单独拉取"""
+        chats = self.store.list_meta()
+        for cid, session in self.active_chats.items():
+            if cid in chats:
+                chats[cid].update(session.summary())
+        for meta in chats.values():
+            meta.update(messages=[], evidence=[])
+        return chats
     
     def get_chat_details(self, chat_id: str) -> Optional[dict]:
+        session = self.get_session(chat_id)
+        if not session:
+            return None
+        details = session.to_dict()
+        details.pop("traces", None)  # 追踪数据走 get_chat_trace
+        return details
+
+    def get_chat_trace(self, chat_id: str, turn: Optional[int] = None) -> Optional[List[dict]]:
+        """按轮次返回 span 时间线；turn 为空时返回保留的全部轮次"""
+        session = self.get_session(chat_id)
+        if not session:
+            return None
+        if turn is None:
+            return session.traces
+        return [t for t in session.traces if t.get("turn") == turn]
+
+    def get_phase_latency(self) -> dict:
+        return self.phase_latency.summary()
+
+    def get_chat_status(self, chat_id: str) -> Optional[str]:
         session = self.active_chats.get(chat_id)
-        return session.to_dict() if session else None
+        if session is not None:
+            return session.status.value
+        meta = self.store.get_meta(chat_id)
+        return meta["status"] if meta else None
 
     # --- 核心推理流 (直连版) ---
 
@@ -219,66 +592,84 @@ class ChatsManager:
         """[修改点] 无需参数创建 chat_id"""
         chat_id = f"CH-{uuid.uuid4().hex[:8].upper()}"
         # 初始名字设为 New Chat，后续根据第一条消息自动重命名
-        self.active_chats[chat_id] = ChatSession(chat_id, "New Academic Chat")
+        self.active_chats[chat_id] = ChatSession(chat_id, "New Academic Chat", evidence_cfg=self.strategies.get("evidence"))
         self.save_session(chat_id)
+        self._evict_idle_sessions()
         return chat_id
 
     async def execute_reasoning_flow(self, chat_id: str, user_message: str):
-        if chat_id not in self.active_chats:
+        session = self.get_session(chat_id)
+        if session is None:
             raise ValueError("Session not found")
         
-        session = self.active_chats[chat_id]
-        
         # 1. 追加新消息到历史
         history_context = [{"role": m.role, "content": m.message} for m in session.messages[-6:]]
         
         # 记录当前用户消息
-        session.messages.append(ChatMessage(role="user", message=user_message))
+        session.add_message("user", user_message)
         if len(session.messages) <= 1:
             session.chat_name = f"Chat-{user_message[:12]}"
 
         # 用于搜索阶段的 Query（结合最近几轮对话防止指代不明）
         search_context_str = "\n".join([f"{m['role']}: {m['content']}" for m in history_context] + [f"user: {user_message}"])
         
+        spec_task = None
+        spec_keys = set()
+        # 本轮阶段耗时追踪：之后的 span（含并发分支与外部调用）都记到该 trace 上
+        trace = TurnTrace(chat_id, session.turn) if self.tracing_enabled else None
+        tracing.activate(trace)
         try:
-            # 1. Preparing: 结构化需求 (直连)
+            # 1. Preparing: 结构化需求 (直连)，同时发起投机检索
             session.update_status(ChatStatus.PREPARING)
             self.save_session(chat_id) # 状态变更即持久化
+            spec_task = self._start_speculative_search(chat_id, user_message)
             
-            prep_prompt = self.prompt_manager.render("query_refiner", query=search_context_str)
-            # search_needs 已经是符合 {search_params: ..., preferences: ...} 结构的字典
-            search_needs = await self._direct_llm_call(prep_prompt)
+            with tracing.span("preparing"):
+                prep_prompt = self.prompt_manager.render("query_refiner", query=search_context_str)
+                # search_needs 已经是符合 {search_params: ..., preferences: ...} 结构的字典
+                search_needs = await self._direct_llm_call(prep_prompt, template="query_refiner", chat_id=chat_id)
 
             # 2 & 3. Researching & Evaluating: 搜索循环 (逻辑决策直连)
             session.update_status(ChatStatus.RESEARCHING)
             session.retry_count = 0
-            while session.retry_count < 2:
+            max_attempts = 2
+            while session.retry_count < max_attempts:
                 self._log(chat_id, "info", f"Phase 2: Searching (Attempt {session.retry_count+1})...")
                 
-                search_response = await self.services.start_academic_search(search_needs)
+                search_response = await self._traced_search("search", search_needs, attempt=session.retry_count + 1)
+                search_results = []
                 
                 # 解析返回结果 (strengthened_search 返回 {"status": "success", "results": [...]})
                 if search_response.get("status") == "success":
                     search_results = search_response.get("results", [])
                 else:
                     self._log(chat_id, "error", f"Search failed: {search_response.get('message')}")
+
+                # 首轮检索后合并（或丢弃）投机结果
+                if spec_task is not None and isinstance(search_results, list):
+                    with tracing.span("speculative_merge") as record:
+                        spec_hits = await self._merge_speculative(chat_id, spec_task, search_needs, search_results)
+                        record["merged"] = len(spec_hits)
+                    spec_task = None
+                    spec_keys = {evidence_key(h) for h in spec_hits}
+                    search_results = search_results + spec_hits
                 
                 # 确保结果是列表才进行 extend
                 if isinstance(search_results, list):
-                    session.evidence = search_results + session.evidence
+                    added = session.add_evidence(search_results)
+                    self._log(chat_id, "info", f"Evidence: {added} new of {len(search_results)} hits, {len(session.evidence_manager)} total.")
                 
-                # Evaluating: 判断信息充足性 (直连)
+                # Evaluating: 判断信息充足性 (本地打分，灰区直连 LLM)
                 session.update_status(ChatStatus.EVALUATING)
-                eval_prompt = self.prompt_manager.render(
-                    "evidence_evaluator", 
-                    query=search_context_str, 
-                    docs=session.evidence,
-                    retry_count=session.retry_count # 传入重试次数辅助 LLM 决策
-                )
-                eval_report = await self._direct_llm_call(eval_prompt)
-
-                if eval_report.get("action") == "proceed":
-                    self._log(chat_id, "info", "Evidence confirmed by LLM.")
+                with tracing.span("evaluating", attempt=session.retry_count + 1) as record:
+                    action = await self._evaluate_evidence(
+                        chat_id, session, search_needs, search_context_str,
+                        final_attempt=session.retry_count + 1 >= max_attempts
+                    )
+                    record["action"] = action
+
+                if action == "proceed":
+                    self._log(chat_id, "info", "Evidence confirmed.")
                     break
                 
                 session.retry_count += 1
@@ -287,68 +678,41 @@ class ChatsManager:
             # 4. Strengthening: 意图检查与专家调用 (决策直连)
             session.update_status(ChatStatus.STRENGTHENING)
             self._log(chat_id, "info", "Phase 4: Strengthening via Experts...")
-            intent_prompt = self.prompt_manager.render("intent_check", query=search_context_str, docs=session.evidence)
-            intent = await self._direct_llm_call(intent_prompt)
-            print(f"Intent Check Result: {intent}") # 调试输出
-            vlm_res, sandbox_res = "N/A", "N/A"
-            if intent.get("need_vision") and session.evidence:
-                # 寻找第一个视频证据来获取帧路径
-                video_doc = next((d for d in session.evidence if d.get("metadata", {}).get("modality") == "video"), None)
-                if video_doc:
-                    meta = video_doc.get("metadata", {})
-                    asset_name = meta.get("asset_name")
-                    ts = meta.get("timestamp", 0)
-                    
-                    # 构造对齐存储结构的路径
-                    frame_path = f"storage/processed/video/{asset_name}/frames/time_{ts}.jpg"
-                    
-                    # 获取策略指令
-                    strategy_key = intent.get("vision_strategy", "scene_description")
-                    # 注意：这里假设 chats_manager 能访问到 strategies 配置，或者通过 prompt_manager 处理
-                    vlm_instruction = f"Strategy: {strategy_key}. Context: {search_context_str}" 
-
-                    vlm_params = {
-                        "image": frame_path,
-                        "prompt": vlm_instruction
-                    }
-                    self._log(chat_id, "info", f"Calling Vision Expert for frame at {ts}s")
-                    vlm_output = await self.services.call_visual_expert(params=vlm_params)
-                    vlm_res = vlm_output.get("response", "Vision parse failed.")
-
-            if intent.get("need_sandbox"):
-                self._log(chat_id, "info", "Calling Sandbox for logic verification...")
-                # 1. 提取公式与准备代码 (直连)
-                combined_evidence = " ".join([str(d.get("content", "")) for d in session.evidence])
-                sb_prep_prompt = self.prompt_manager.render("sandbox_prep", context=combined_evidence)
-                sb_instructions = await self._direct_llm_call(sb_prep_prompt)
-                
-                # 2. 调用沙箱专家 (传递准备好的指令字典)
-                if sb_instructions.get("expression") != "empty":
-                    sandbox_output = await self.services.call_sandbox_expert(params=sb_instructions)
-                    sandbox_res = f"Verified Result: {sandbox_output.get('result', 'Calculation failed')}"
-                else:
-                    sandbox_res = "No complex formulas to verify."
+            intent_prompt = self.prompt_manager.render(
+                "intent_check", query=search_context_str,
+                docs=session.evidence_manager.select("intent_check", session.turn)
+            )
+            with tracing.span("strengthening"):
+                intent = await self._direct_llm_call(intent_prompt, template="intent_check", chat_id=chat_id)
+                self._log(chat_id, "info", f"Intent check result: {intent}")
+                vlm_res, sandbox_res = await self._run_strengthening(chat_id, session, intent, search_context_str)
 
             # 5. Finalizing: 最终合成 (生成直连)
             session.update_status(ChatStatus.FINALIZING)
             self._log(chat_id, "info", "Phase 5: Synthesizing final answer...")
             
-            # 渲染最终提示词，注意 docs 此时已包含所有搜索到的 evidence
+            # 渲染最终提示词，docs 为按 synthesizer 预算挑选的证据子集
+            final_docs = session.evidence_manager.select("synthesizer", session.turn)
+            if spec_keys:
+                survived = sum(1 for d in final_docs if evidence_key(d) in spec_keys)
+                self.speculation_stats["hits_survived"] += survived
+            self.speculation_stats["hits_selected"] += len(final_docs)
             final_prompt = self.prompt_manager.render(
                 "synthesizer", 
                 query=user_message, 
-                docs=session.evidence, 
+                docs=final_docs,
                 vlm_feedback=vlm_res, 
                 math_res=sandbox_res
             )
             full_messages = history_context + [{"role": "user", "content": final_prompt}]
-            response_gen = await self._direct_llm_call(full_messages, json_mode=False, stream=True)
             full_answer = ""
-            async for token in response_gen:
-                full_answer += token
-                yield token # 向外部 API 层吐出流式 Token
+            with tracing.span("finalizing", docs=len(final_docs)):
+                response_gen = await self._direct_llm_call(full_messages, json_mode=False, stream=True, template="synthesizer", chat_id=chat_id)
+                async for token in response_gen:
+                    full_answer += token
+                    yield token # 向外部 API 层吐出流式 Token
             
-            session.messages.append(ChatMessage(role="assistant", message=str(full_answer)))
+            session.add_message("assistant", str(full_answer))
             session.update_status(ChatStatus.IDLE)
 
         except Exception as e:
@@ -356,4 +720,9 @@ class ChatsManager:
             self._log(chat_id, "error", f"Flow Error: {str(e)}")
             yield f"Error encountered: {str(e)}"
         finally:
+            if spec_task is not None and not spec_task.done():
+                spec_task.cancel()
+            if trace is not None:
+                self._finish_trace(session, trace)
+            tracing.activate(None)
             self.save_session(chat_id)
\ No newline at end of file
@@ -0,0 +1,160 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_SUFFICIENCY_CONFIG = {
+    "enabled": True,
+    "top_n": 3,                # 参与判断的头部证据条数
+    "relevance_spread": 0.2,   # 头部均分偏离阈值多少时相关度分量饱和
+    "keyword_weight": 0.4,     # 关键词覆盖率在置信度中的权重
+    "proceed_above": 0.8,      # 置信度高于此值直接 proceed
+    "refetch_below": 0.3,      # 低于此值直接 refetch，介于两者之间交给 LLM
+}
+
+DEFAULT_EVIDENCE_CONFIG = {
+    "decay_per_turn": 0.8,     # 每隔一轮对话，旧证据得分乘以该系数
+    "mmr_lambda": 0.7,         # 1.0 = 只看相关度，0.0 = 只看多样性
+    "max_items": 200,          # 会话内最多保留的证据条数
+    "default_budget": 3000,    # 未单独配置的模板使用的 token 预算
+    "token_budgets": {},
+}
+
+# 证据本身的簿记字段，渲染到 prompt 前剥离
+BOOKKEEPING_FIELDS = ("turn",)
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+|[\u4e00-\u9fff]")
+CJK_PATTERN = re.compile(r"[\u4e00-\u9fff]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算：中文按字计，其余按 4 字符一个 token"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _locator(meta: dict):
+    # PDF 用页码，视频用时间戳
+    return meta.get("page_label") if meta.get("page_label") is not None else meta.get("timestamp")
+
+
+def evidence_key(item: dict) -> Tuple:
+    meta = item.get("metadata", {}) or {}
+    return (meta.get("asset_name"), meta.get("type"), _locator(meta), (item.get("content") or "").strip())
+
+
+class EvidenceManager:
+    """
+    会话级证据集：按 (asset_name, content_type, 页码/时间戳, 内容) 去重，
+    跨轮次得分衰减，按 MMR 兼顾相关度与多样性，并按模板的 token 预算裁剪。
+    """
+
+    def __init__(self, items: Optional[List[dict]] = None, cfg: Optional[dict] = None):
+        self.cfg = dict(DEFAULT_EVIDENCE_CONFIG, **(cfg or {}))
+        self.items: Dict[Tuple, dict] = {}
+        for item in items or []:
+            self._merge(dict(item), item.get("turn", 0))
+
+    def _merge(self, item: dict, turn: int) -> bool:
+        key = evidence_key(item)
+        existing = self.items.get(key)
+        item["turn"] = turn
+        if existing is None:
+            self.items[key] = item
+            return True
+        # 重复命中：保留更高的原始得分，并刷新到最新轮次
+        if float(item.get("score", 0)) > float(existing.get("score", 0)):
+            item["turn"] = max(turn, existing.get("turn", 0))
+            self.items[key] = item
+        else:
+            existing["turn"] = max(turn, existing.get("turn", 0))
+        return False
+
+    def add(self, results: List[dict], turn: int) -> int:
+        """合并一批检索结果，返回新增条数"""
+        added = sum(1 for r in results if isinstance(r, dict) and self._merge(dict(r), turn))
+        if len(self.items) > self.cfg["max_items"]:
+            keep = self.ranked(turn)[:self.cfg["max_items"]]
+            self.items = {evidence_key(i): i for i in keep}
+        return added
+
+    def effective_score(self, item: dict, turn: int) -> float:
+        age = max(0, turn - item.get("turn", 0))
+        return float(item.get("score", 0)) * (self.cfg["decay_per_turn"] ** age)
+
+    def ranked(self, turn: int) -> List[dict]:
+        return sorted(self.items.values(), key=lambda i: self.effective_score(i, turn), reverse=True)
+
+    @staticmethod
+    def _similarity(a: dict, b: dict, tokens: Dict[int, set]) -> float:
+        ta, tb = tokens[id(a)], tokens[id(b)]
+        sim = len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+        ma, mb = a.get("metadata", {}) or {}, b.get("metadata", {}) or {}
+        # 同一资产同一页/同一时刻的片段视为高度冗余
+        if ma.get("asset_name") == mb.get("asset_name") and _locator(ma) == _locator(mb):
+            sim = max(sim, 0.5)
+        return sim
+
+    def select(self, template: str, turn: int, budget: Optional[int] = None) -> List[dict]:
+        """为指定模板挑选证据子集（MMR 排序 + token 预算）"""
+        if budget is None:
+            budget = (self.cfg.get("token_budgets") or {}).get(template, self.cfg["default_budget"])
+        candidates = self.ranked(turn)
+        if not candidates:
+            return []
+
+        scores = {id(i): self.effective_score(i, turn) for i in candidates}
+        top, bottom = max(scores.values()), min(scores.values())
+        span = (top - bottom) or 1.0
+        relevance = {k: (v - bottom) / span for k, v in scores.items()}
+        tokens = {id(i): set(TOKEN_PATTERN.findall((i.get("content") or "").lower())) for i in candidates}
+        lam = self.cfg["mmr_lambda"]
+
+        selected: List[dict] = []
+        max_sim = {id(i): 0.0 for i in candidates}
+        used = 0
+        remaining = list(candidates)
+        while remaining:
+            best = max(remaining, key=lambda i: lam * relevance[id(i)] - (1 - lam) * max_sim[id(i)])
+            remaining.remove(best)
+            cost = estimate_tokens(best.get("content") or "") + 20  # 元数据开销
+            # 超预算的跳过，继续尝试更短的片段（至少保留一条）
+            if selected and used + cost > budget:
+                continue
+            used += cost
+            selected.append(best)
+            for other in remaining:
+                max_sim[id(other)] = max(max_sim[id(other)], self._similarity(best, other, tokens))
+        return [{k: v for k, v in i.items() if k not in BOOKKEEPING_FIELDS} for i in selected]
+
+    def to_list(self) -> List[dict]:
+        return list(self.items.values())
+
+    def __len__(self):
+        return len(self.items)
+
+
+def assess_sufficiency(docs: List[dict], keywords: List[str], min_relevance: float,
+                       cfg: Optional[dict] = None) -> Tuple[Optional[str], float]:
+    """
+    本地充足性打分：头部证据的向量得分相对 min_relevance_threshold 的位置 + 关键词覆盖率。
+    返回 ("proceed" | "refetch" | None, 置信度)；None 表示处于灰区，需交给 LLM 评估。
+    """
+    cfg = dict(DEFAULT_SUFFICIENCY_CONFIG, **(cfg or {}))
+    if not docs:
+        return "refetch", 0.0
+    top = sorted(docs, key=lambda d: float(d.get("base_vector_score", d.get("score", 0))), reverse=True)[:cfg["top_n"]]
+    top_mean = sum(float(d.get("base_vector_score", d.get("score", 0))) for d in top) / len(top)
+    relevance = min(1.0, max(0.0, 0.5 + (top_mean - min_relevance) / (2 * cfg["relevance_spread"])))
+
+    keywords = [k.lower() for k in keywords or [] if isinstance(k, str) and k.strip()]
+    if keywords:
+        corpus = " ".join((d.get("content") or "") for d in docs).lower()
+        coverage = sum(1 for k in keywords if k in corpus) / len(keywords)
+        confidence = (1 - cfg["keyword_weight"]) * relevance + cfg["keyword_weight"] * coverage
+    else:
+        confidence = relevance
+
+    if confidence >= cfg["proceed_above"]:
+        return "proceed", round(confidence, 4)
+    if confidence <= cfg["refetch_below"]:
+        return "refetch", round(confidence, 4)
+    return None, round(confidence, 4)
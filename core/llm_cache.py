@@ -0,0 +1,137 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("LLMCache")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_CACHE_CONFIG = {
+    "enabled": True,
+    "memory_entries": 512,
+    "ttl_seconds": 86400,
+    "db_path": "storage/llm_cache.db",
+    "templates": {},
+}
+
+# 只有这些字段影响输出，stream 等传输参数不参与哈希
+KEY_FIELDS = ["model", "messages", "response_format", "temperature", "top_p", "max_tokens", "stop"]
+
+
+class LLMCache:
+    """
+    LLM 响应缓存：内存 LRU + SQLite 持久层，均带 TTL。
+    键 = sha256(模板名 + 影响输出的请求参数)，仅对配置中启用的模板生效。
+    """
+
+    def __init__(self, cfg: Optional[dict] = None):
+        cfg = dict(DEFAULT_CACHE_CONFIG, **(cfg or {}))
+        self.enabled = bool(cfg["enabled"])
+        self.memory_entries = int(cfg["memory_entries"])
+        self.ttl = float(cfg["ttl_seconds"])
+        self.templates: Dict[str, bool] = cfg.get("templates") or {}
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self.conn: Optional[sqlite3.Connection] = None
+
+        if self.enabled:
+            db_path = PROJECT_ROOT / cfg["db_path"]
+            try:
+                db_path.parent.mkdir(parents=True, exist_ok=True)
+                # web 进程与 structure_generate wrapper 共用同一个库
+                self.conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=5)
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+                with self.conn:
+                    self.conn.execute("""
+                        CREATE TABLE IF NOT EXISTS llm_cache (
+                            key TEXT PRIMARY KEY,
+                            template TEXT NOT NULL,
+                            response TEXT NOT NULL,
+                            expires_at REAL NOT NULL
+                        )
+                    """)
+                    self.conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            except Exception as e:
+                logger.warning(f"LLM disk cache unavailable, memory tier only: {e}")
+                self.conn = None
+
+    def is_enabled_for(self, template: Optional[str]) -> bool:
+        return self.enabled and bool(template) and bool(self.templates.get(template, False))
+
+    @staticmethod
+    def make_key(template: str, payload: Dict[str, Any]) -> str:
+        material = {"template": template, **{k: payload.get(k) for k in KEY_FIELDS if k in payload}}
+        raw = json.dumps(material, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, template: str, field: str):
+        bucket = self.counters.setdefault(template, {"hits_memory": 0, "hits_disk": 0, "misses": 0, "stores": 0})
+        bucket[field] += 1
+
+    def _remember(self, key: str, expires_at: float, response: Any):
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, template: str, key: str) -> Optional[Any]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] >= now:
+                self._memory.move_to_end(key)
+                self._count(template, "hits_memory")
+                return entry[1]
+            del self._memory[key]
+
+        if self.conn is not None:
+            try:
+                row = self.conn.execute(
+                    "SELECT response, expires_at FROM llm_cache WHERE key = ? AND expires_at >= ?", (key, now)
+                ).fetchone()
+            except Exception as e:
+                logger.warning(f"LLM disk cache read failed: {e}")
+                row = None
+            if row is not None:
+                response = json.loads(row[0])
+                self._remember(key, row[1], response)
+                self._count(template, "hits_disk")
+                return response
+
+        self._count(template, "misses")
+        return None
+
+    def put(self, template: str, key: str, response: Any):
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, response)
+        self._count(template, "stores")
+        if self.conn is not None:
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, template, response, expires_at) VALUES (?, ?, ?, ?)",
+                        (key, template, json.dumps(response, ensure_ascii=False), expires_at)
+                    )
+            except Exception as e:
+                logger.warning(f"LLM disk cache write failed: {e}")
+
+    def stats(self) -> dict:
+        hits = sum(c["hits_memory"] + c["hits_disk"] for c in self.counters.values())
+        misses = sum(c["misses"] for c in self.counters.values())
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "templates": self.counters,
+        }
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import importlib.util
+from pathlib import Path
+from contextlib import nullcontext
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from core import tracing
+from core.llm_cache import LLMCache
+
+load_dotenv()
+
+logger = logging.getLogger("LLMClient")
+
+# 可重试的 HTTP 状态：限流 + 服务端错误
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+DEFAULT_LLM_CONFIG = {
+    "model": "deepseek-chat",
+    "http2": True,
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 60,
+    "timeout": 180,
+    "connect_timeout": 10,
+    "max_retries": 3,
+    "backoff_base": 0.5,
+    "backoff_max": 8,
+}
+
+
+def load_llm_config(config_path: str = "configs/model_config.yaml") -> dict:
+    import yaml
+    full_path = Path(__file__).resolve().parent.parent / config_path
+    try:
+        with open(full_path, 'r', encoding='utf-8') as f:
+            cfg = (yaml.safe_load(f) or {}).get('llm', {}) or {}
+    except Exception as e:
+        logger.warning(f"LLM config unavailable, using defaults: {e}")
+        cfg = {}
+    return dict(DEFAULT_LLM_CONFIG, **cfg)
+
+
+class LLMClient:
+    """
+    进程内共享的 DeepSeek HTTP 客户端：连接池 + keep-alive (+ HTTP/2)，
+    429/5xx 按抖动指数退避重试。Web 进程中由 FastAPI lifespan 负责关闭。
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(LLMClient, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_initialized"): return
+        self.cfg = load_llm_config()
+        self.api_key = os.getenv("DEEPSEEK_API_KEY")
+        base_url = os.getenv("DEEPSEEK_BASE_URL", self.cfg.get("base_url", "https://api.deepseek.com"))
+        self.api_url = self.cfg.get("api_url") or f"{base_url.rstrip('/')}/chat/completions"
+        self.model = self.cfg["model"]
+        # 确定性 prompt 的响应缓存（按模板启用）
+        self.cache = LLMCache(self.cfg.get("cache"))
+
+        # HTTP/2 依赖 h2 包，缺失时退回 HTTP/1.1 keep-alive
+        self.http2 = bool(self.cfg["http2"]) and importlib.util.find_spec("h2") is not None
+        if self.cfg["http2"] and not self.http2:
+            logger.warning("h2 not installed, LLM client falls back to HTTP/1.1.")
+
+        self._client: Optional[httpx.AsyncClient] = None
+        # httpx 不暴露连接池排队时间，用同样大小的信号量在外层计量
+        self._slots = asyncio.Semaphore(self.cfg["max_connections"])
+
+        self.in_use = 0
+        self.waiting = 0
+        self.requests_total = 0
+        self.failures = 0
+        self.retries = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self._initialized = True
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=httpx.Timeout(self.cfg["timeout"], connect=self.cfg["connect_timeout"]),
+                limits=httpx.Limits(
+                    max_connections=self.cfg["max_connections"],
+                    max_keepalive_connections=self.cfg["max_keepalive_connections"],
+                    keepalive_expiry=self.cfg["keepalive_expiry"]
+                ),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- 排队与重试 ---
+
+    async def _acquire(self):
+        waited_from = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - waited_from
+        self.queue_wait_total += waited
+        self.queue_wait_max = max(self.queue_wait_max, waited)
+        self.in_use += 1
+        self.requests_total += 1
+
+    def _release(self):
+        self.in_use -= 1
+        self._slots.release()
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        # 服务端给了 Retry-After 时优先遵守
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.cfg["backoff_max"])
+                except ValueError:
+                    pass
+        ceiling = min(self.cfg["backoff_max"], self.cfg["backoff_base"] * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    async def _sleep_before_retry(self, attempt: int, reason: str, response: Optional[httpx.Response] = None):
+        delay = self._backoff(attempt, response)
+        self.retries += 1
+        logger.warning(f"LLM request retry {attempt + 1}/{self.cfg['max_retries']} in {delay:.2f}s ({reason})")
+        await asyncio.sleep(delay)
+
+    def _build_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        payload = dict(payload)
+        payload.setdefault("model", self.model)
+        return payload
+
+    @staticmethod
+    def _cacheable(payload: Dict[str, Any], content: str) -> bool:
+        # JSON 模式下只缓存能解析的输出，避免把坏结果固化
+        if (payload.get("response_format") or {}).get("type") != "json_object":
+            return True
+        try:
+            json.loads(content.replace("```json", "").replace("```", "").strip())
+            return True
+        except ValueError:
+            return False
+
+    # --- 调用接口 ---
+
+    async def chat(self, payload: Dict[str, Any], template: Optional[str] = None,
+                   gate: Optional[AsyncContextManager] = None) -> dict:
+        """
+        非流式 chat/completions，返回响应 JSON；template 在缓存配置中启用时先查缓存。
+        gate 为准入许可（见 LLMGovernor.slot），只在真正发出请求时进入，缓存命中不占用。
+        """
+        payload = self._build_payload(payload)
+        cacheable = self.cache.is_enabled_for(template)
+        if cacheable:
+            key = self.cache.make_key(template, payload)
+            cached = self.cache.get(template, key)
+            if cached is not None:
+                tracing.annotate(cache="hit")
+                return cached
+        async with gate or nullcontext():
+            response = await self._post_chat(payload)
+        if cacheable and self._cacheable(payload, response['choices'][0]['message']['content']):
+            self.cache.put(template, key, response)
+        return response
+
+    async def stream_chat(self, payload: Dict[str, Any], template: Optional[str] = None,
+                          gate: Optional[AsyncContextManager] = None) -> AsyncIterator[str]:
+        """
+        流式 chat/completions，逐个产出 content 增量；gate 在整个流期间持有。
+        默认不缓存；仅当 template 在缓存配置中显式启用时，命中则一次性产出完整内容。
+        """
+        payload = self._build_payload(dict(payload, stream=True))
+        cacheable = self.cache.is_enabled_for(template)
+        if cacheable:
+            key = self.cache.make_key(template, payload)
+            cached = self.cache.get(template, key)
+            if cached is not None:
+                tracing.annotate(cache="hit")
+                yield cached['choices'][0]['message']['content']
+                return
+        parts = []
+        async with gate or nullcontext():
+            async for delta in self._stream_chat(payload):
+                parts.append(delta)
+                yield delta
+        # 只有完整读完的流才写入缓存
+        if cacheable:
+            self.cache.put(template, key, {"choices": [{"message": {"content": "".join(parts)}}]})
+
+    async def _post_chat(self, payload: Dict[str, Any]) -> dict:
+        await self._acquire()
+        try:
+            for attempt in range(self.cfg["max_retries"] + 1):
+                last_try = attempt >= self.cfg["max_retries"]
+                try:
+                    response = await self._get_client().post(self.api_url, json=payload)
+                except httpx.TransportError as e:
+                    if last_try:
+                        raise
+                    await self._sleep_before_retry(attempt, type(e).__name__)
+                    continue
+                if response.status_code in RETRYABLE_STATUS and not last_try:
+                    await self._sleep_before_retry(attempt, f"HTTP {response.status_code}", response)
+                    continue
+                tracing.annotate(attempts=attempt + 1, response_bytes=len(response.content))
+                response.raise_for_status()
+                return response.json()
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self._release()
+
+    async def _stream_chat(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """仅在收到首个字节之前重试，已开始输出后不再重放"""
+        await self._acquire()
+        try:
+            for attempt in range(self.cfg["max_retries"] + 1):
+                last_try = attempt >= self.cfg["max_retries"]
+                retry_response = None
+                try:
+                    async with self._get_client().stream("POST", self.api_url, json=payload) as r:
+                        if r.status_code in RETRYABLE_STATUS and not last_try:
+                            # 先释放连接再退避
+                            await r.aread()
+                            retry_response = r
+                        else:
+                            tracing.annotate(attempts=attempt + 1)
+                            r.raise_for_status()
+                            async for line in r.aiter_lines():
+                                if not line or line == "data: [DONE]": continue
+                                if line.startswith("data: "):
+                                    data = json.loads(line[6:])
+                                    delta = data['choices'][0]['delta'].get('content', '')
+                                    if delta:
+                                        yield delta
+                            return
+                except httpx.ConnectError as e:
+                    if last_try:
+                        raise
+                    await self._sleep_before_retry(attempt, type(e).__name__)
+                    continue
+                await self._sleep_before_retry(attempt, f"HTTP {retry_response.status_code}", retry_response)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self._release()
+
+    def get_metrics(self) -> dict:
+        return {
+            "http2": self.http2,
+            "max_connections": self.cfg["max_connections"],
+            "connections_in_use": self.in_use,
+            "waiting": self.waiting,
+            "requests_total": self.requests_total,
+            "retries": self.retries,
+            "failures": self.failures,
+            "queue_wait_avg_ms": round(self.queue_wait_total / self.requests_total * 1000, 2) if self.requests_total else 0.0,
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 2),
+            "cache": self.cache.stats(),
+        }
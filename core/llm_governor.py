@@ -0,0 +1,216 @@
+import time
+import asyncio
+import itertools
+import logging
+from pathlib import Path
+from dataclasses import dataclass, field
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from core import tracing
+
+logger = logging.getLogger("LLMGovernor")
+
+DEFAULT_GOVERNOR_CONFIG = {
+    "enabled": True,
+    "max_concurrency": 8,        # 同时在途的 LLM 调用上限
+    "rate_per_second": 4,        # 令牌桶补充速率（次/秒）
+    "burst": 8,                  # 令牌桶容量
+    "report_interval": 1.0,      # 排队中每隔多少秒回调一次排队位置
+    "default_priority": 2,
+    "background_priority": 3,    # 优先级数值不小于此值的阶段视为后台任务
+    "max_background": 2,         # 后台任务最多占用的并发槽位，其余留给交互会话
+    "phase_priorities": {        # 数值越小越优先
+        "synthesizer": 0,
+        "query_refiner": 1,
+        "evidence_evaluator": 1,
+        "intent_check": 1,
+        "sandbox_prep": 1,
+        "structural_outline": 3,
+    },
+}
+
+# 排队回调：(排队位置, 已等待秒数)
+WaitCallback = Callable[[int, float], Awaitable[None]]
+
+
+@dataclass
+class _Waiter:
+    priority: int
+    vtime: float
+    seq: int
+    session_id: str
+    phase: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Optional[asyncio.Future] = None
+
+
+class LLMGovernor:
+    """
+    出站 LLM 调用的准入控制：令牌桶限速 + 并发上限。
+    排队顺序 = (阶段优先级, 会话虚拟时间, 到达序号)：同优先级内按会话公平轮转，
+    单个会话连续发起的调用不会挤占其他会话。
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(LLMGovernor, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_initialized"): return
+        cfg = dict(DEFAULT_GOVERNOR_CONFIG, **self._load_config())
+        self.enabled = bool(cfg["enabled"])
+        self.max_concurrency = int(cfg["max_concurrency"])
+        self.rate = float(cfg["rate_per_second"])
+        self.burst = float(cfg["burst"])
+        self.report_interval = float(cfg["report_interval"])
+        self.default_priority = int(cfg["default_priority"])
+        self.background_priority = int(cfg["background_priority"])
+        self.max_background = int(cfg["max_background"])
+        self.phase_priorities: Dict[str, int] = dict(DEFAULT_GOVERNOR_CONFIG["phase_priorities"], **(cfg.get("phase_priorities") or {}))
+
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.in_flight = 0
+        self.background_in_flight = 0
+        self.waiters: List[_Waiter] = []
+        self.session_vtime: Dict[str, float] = {}
+        self.global_vtime = 0.0
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = 0
+        self.queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.phase_counts: Dict[str, int] = {}
+        self._initialized = True
+
+    @staticmethod
+    def _load_config(config_path: str = "configs/model_config.yaml") -> dict:
+        import yaml
+        full_path = Path(__file__).resolve().parent.parent / config_path
+        try:
+            with open(full_path, 'r', encoding='utf-8') as f:
+                return ((yaml.safe_load(f) or {}).get('llm', {}) or {}).get('governor', {}) or {}
+        except Exception as e:
+            logger.warning(f"Governor config unavailable, using defaults: {e}")
+            return {}
+
+    # --- 调度 ---
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    @staticmethod
+    def _order(w: _Waiter):
+        return (w.priority, w.vtime, w.seq)
+
+    def _on_timer(self):
+        self._timer = None
+        self._pump()
+
+    def _pump(self):
+        self._refill()
+        while self.waiters and self.in_flight < self.max_concurrency and self.tokens >= 1:
+            eligible = [w for w in self.waiters
+                        if not self._is_background(w) or self.background_in_flight < self.max_background]
+            if not eligible:
+                break
+            w = min(eligible, key=self._order)
+            self.waiters.remove(w)
+            if w.future.done():
+                continue
+            self.tokens -= 1
+            self.in_flight += 1
+            if self._is_background(w):
+                self.background_in_flight += 1
+            self.global_vtime = max(self.global_vtime, w.vtime)
+            w.future.set_result(None)
+        # 只缺令牌时定时唤醒；缺并发槽位时由 release 唤醒
+        if self.waiters and self.in_flight < self.max_concurrency and self.tokens < 1 and self._timer is None:
+            delay = max(0.0, (1 - self.tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+        if len(self.session_vtime) > 1024:
+            self.session_vtime = {k: v for k, v in self.session_vtime.items() if v > self.global_vtime}
+
+    def _is_background(self, w: _Waiter) -> bool:
+        return w.priority >= self.background_priority
+
+    def _release(self, w: _Waiter):
+        self.in_flight -= 1
+        if self._is_background(w):
+            self.background_in_flight -= 1
+        self._pump()
+
+    def position(self, waiter: _Waiter) -> int:
+        ahead = self._order(waiter)
+        return 1 + sum(1 for w in self.waiters if self._order(w) < ahead)
+
+    @asynccontextmanager
+    async def slot(self, session_id: Optional[str], phase: Optional[str], on_wait: Optional[WaitCallback] = None):
+        """获取一个调用许可；排队期间按 report_interval 回调 on_wait(位置, 已等待秒数)"""
+        if not self.enabled:
+            yield 0.0
+            return
+        session_id = session_id or "anonymous"
+        phase = phase or "default"
+        vtime = max(self.global_vtime, self.session_vtime.get(session_id, 0.0)) + 1
+        self.session_vtime[session_id] = vtime
+        w = _Waiter(self.phase_priorities.get(phase, self.default_priority), vtime, next(self._seq), session_id, phase)
+        w.future = asyncio.get_running_loop().create_future()
+        self.waiters.append(w)
+        self._pump()
+
+        granted = False
+        try:
+            if not w.future.done():
+                self.queued += 1
+                if on_wait:
+                    await on_wait(self.position(w), 0.0)
+            while not w.future.done():
+                try:
+                    await asyncio.wait_for(asyncio.shield(w.future), timeout=self.report_interval)
+                except asyncio.TimeoutError:
+                    if on_wait and not w.future.done():
+                        await on_wait(self.position(w), time.monotonic() - w.enqueued_at)
+            granted = True
+        finally:
+            if not granted:
+                # 排队中被取消：若许可恰好已发放则归还
+                if w in self.waiters:
+                    self.waiters.remove(w)
+                elif w.future.done() and not w.future.cancelled():
+                    self._release(w)
+                if not w.future.done():
+                    w.future.cancel()
+
+        waited = time.monotonic() - w.enqueued_at
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.phase_counts[phase] = self.phase_counts.get(phase, 0) + 1
+        tracing.annotate(queue_wait_ms=round(waited * 1000, 2))
+        try:
+            yield waited
+        finally:
+            self._release(w)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "background_in_flight": self.background_in_flight,
+            "max_concurrency": self.max_concurrency,
+            "waiting": len(self.waiters),
+            "tokens": round(self.tokens, 2),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "wait_avg_ms": round(self.wait_total / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+            "phases": self.phase_counts,
+        }
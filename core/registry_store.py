@@ -0,0 +1,304 @@
+import os
+import json
+import sqlite3
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("RegistryStore")
+
+# 资产记录的固定列（与 AcademicAsset.to_dict() 一致），其余字段存入 extra JSON
+CORE_FIELDS = ["asset_id", "asset_type", "status", "asset_raw_path", "asset_processed_path", "created_at", "retry_count"]
+
+
+class RegistryStore(ABC):
+    """资产注册表存储接口：单条记录粒度的读写"""
+
+    @abstractmethod
+    def get(self, asset_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def list_all(self) -> Dict[str, dict]:
+        ...
+
+    @abstractmethod
+    def find_by_status(self, *statuses: str, asset_type: Optional[str] = None) -> List[dict]:
+        ...
+
+    @abstractmethod
+    def count(self, status: Optional[str] = None) -> int:
+        ...
+
+    @abstractmethod
+    def upsert(self, record: dict):
+        ...
+
+    @abstractmethod
+    def update(self, asset_id: str, fields: dict) -> bool:
+        ...
+
+    # --- 内容哈希 -> 已处理产物索引（上传去重） ---
+
+    @abstractmethod
+    def get_artifact(self, content_hash: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def put_artifact(self, content_hash: str, artifact: dict):
+        ...
+
+    def close(self):
+        pass
+
+
+class JsonRegistryStore(RegistryStore):
+    """旧版存储：内存字典 + 整文件重写（小规模部署/调试用）"""
+
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self.index_file = self.db_file.with_name("content_index.json")
+        self.assets_map: Dict[str, dict] = {}
+        self.content_index: Dict[str, dict] = {}
+        if self.db_file.exists():
+            try:
+                data = json.loads(self.db_file.read_text(encoding='utf-8') or "{}")
+                # 兼容旧版本 JSON 结构或直接覆盖
+                self.assets_map = data.get("assets_map", data)
+            except Exception as e:
+                logger.error(f"Load state failed: {e}")
+        if self.index_file.exists():
+            try:
+                self.content_index = json.loads(self.index_file.read_text(encoding='utf-8') or "{}")
+            except Exception as e:
+                logger.error(f"Load content index failed: {e}")
+
+    @staticmethod
+    def _write_json(path: Path, data: dict):
+        tmp = path.with_suffix(".json.tmp")
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.error(f"Save state failed: {e}")
+
+    def _flush(self):
+        self._write_json(self.db_file, self.assets_map)
+
+    def get(self, asset_id: str) -> Optional[dict]:
+        record = self.assets_map.get(asset_id)
+        return dict(record) if record else None
+
+    def list_all(self) -> Dict[str, dict]:
+        return {aid: dict(r) for aid, r in self.assets_map.items()}
+
+    def find_by_status(self, *statuses: str, asset_type: Optional[str] = None) -> List[dict]:
+        hits = [dict(r) for r in self.assets_map.values()
+                if r.get("status") in statuses and (asset_type is None or r.get("asset_type") == asset_type)]
+        return sorted(hits, key=lambda r: r.get("created_at") or "")
+
+    def count(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return len(self.assets_map)
+        return sum(1 for r in self.assets_map.values() if r.get("status") == status)
+
+    def upsert(self, record: dict):
+        self.assets_map[record["asset_id"]] = dict(record)
+        self._flush()
+
+    def update(self, asset_id: str, fields: dict) -> bool:
+        if asset_id not in self.assets_map:
+            return False
+        self.assets_map[asset_id].update(fields)
+        self._flush()
+        return True
+
+    def get_artifact(self, content_hash: str) -> Optional[dict]:
+        artifact = self.content_index.get(content_hash)
+        return dict(artifact) if artifact else None
+
+    def put_artifact(self, content_hash: str, artifact: dict):
+        self.content_index[content_hash] = dict(artifact, content_hash=content_hash)
+        self._write_json(self.index_file, self.content_index)
+
+
+class SqliteRegistryStore(RegistryStore):
+    """
+    SQLite (WAL) 存储：每次状态流转只写一行，按状态/类型走索引查询。
+    """
+
+    def __init__(self, db_path: Path, legacy_json: Optional[Path] = None, read_only: bool = False):
+        self.db_path = Path(db_path)
+        if read_only:
+            # 只读打开（检索进程等旁路读者）：不建库、不建表、不做 JSON 迁移
+            self.conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 下 NORMAL 即可保证崩溃后数据库一致（最多丢失最后一次提交）
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        if legacy_json is not None:
+            migrate_json_registry(Path(legacy_json), self)
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS assets (
+                    asset_id TEXT PRIMARY KEY,
+                    asset_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    asset_raw_path TEXT NOT NULL DEFAULT '',
+                    asset_processed_path TEXT NOT NULL DEFAULT '',
+                    created_at TEXT,
+                    retry_count INTEGER NOT NULL DEFAULT 0,
+                    extra TEXT NOT NULL DEFAULT '{}'
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_status ON assets(status)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_type_status ON assets(asset_type, status)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS content_index (
+                    content_hash TEXT PRIMARY KEY,
+                    asset_id TEXT NOT NULL,
+                    asset_type TEXT NOT NULL,
+                    artifact TEXT NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> dict:
+        record = {k: row[k] for k in CORE_FIELDS}
+        record.update(json.loads(row["extra"] or "{}"))
+        return record
+
+    @staticmethod
+    def _split(record: dict):
+        core = {k: record.get(k) for k in CORE_FIELDS}
+        core["asset_raw_path"] = core["asset_raw_path"] or ""
+        core["asset_processed_path"] = core["asset_processed_path"] or ""
+        core["retry_count"] = core["retry_count"] or 0
+        extra = {k: v for k, v in record.items() if k not in CORE_FIELDS}
+        return core, extra
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get(self, asset_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT * FROM assets WHERE asset_id = ?", (asset_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_all(self) -> Dict[str, dict]:
+        rows = self.conn.execute("SELECT * FROM assets ORDER BY created_at").fetchall()
+        return {row["asset_id"]: self._row_to_dict(row) for row in rows}
+
+    def find_by_status(self, *statuses: str, asset_type: Optional[str] = None) -> List[dict]:
+        if not statuses:
+            return []
+        sql = f"SELECT * FROM assets WHERE status IN ({','.join('?' * len(statuses))})"
+        args = list(statuses)
+        if asset_type is not None:
+            sql += " AND asset_type = ?"
+            args.append(asset_type)
+        rows = self.conn.execute(sql + " ORDER BY created_at", args).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def count(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return self.conn.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM assets WHERE status = ?", (status,)).fetchone()[0]
+
+    def upsert(self, record: dict):
+        self.upsert_many([record])
+
+    def upsert_many(self, records: List[dict]):
+        rows = []
+        for record in records:
+            core, extra = self._split(record)
+            rows.append((*[core[k] for k in CORE_FIELDS], json.dumps(extra, ensure_ascii=False)))
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO assets ({','.join(CORE_FIELDS)}, extra) "
+                f"VALUES ({','.join('?' * (len(CORE_FIELDS) + 1))})",
+                rows
+            )
+
+    def update(self, asset_id: str, fields: dict) -> bool:
+        core = {k: v for k, v in fields.items() if k in CORE_FIELDS and k != "asset_id"}
+        extra = {k: v for k, v in fields.items() if k not in CORE_FIELDS}
+        with self.conn:
+            if extra:
+                row = self.conn.execute("SELECT extra FROM assets WHERE asset_id = ?", (asset_id,)).fetchone()
+                if row is None:
+                    return False
+                merged = json.loads(row["extra"] or "{}")
+                merged.update(extra)
+                core["extra"] = json.dumps(merged, ensure_ascii=False)
+            if not core:
+                return True
+            assignments = ", ".join(f"{k} = ?" for k in core)
+            cur = self.conn.execute(f"UPDATE assets SET {assignments} WHERE asset_id = ?", (*core.values(), asset_id))
+            return cur.rowcount > 0
+
+    def get_artifact(self, content_hash: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT artifact FROM content_index WHERE content_hash = ?", (content_hash,)).fetchone()
+        return json.loads(row["artifact"]) if row else None
+
+    def put_artifact(self, content_hash: str, artifact: dict):
+        artifact = dict(artifact, content_hash=content_hash)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO content_index (content_hash, asset_id, asset_type, artifact) VALUES (?, ?, ?, ?)",
+                (content_hash, artifact["asset_id"], artifact["asset_type"], json.dumps(artifact, ensure_ascii=False))
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def migrate_json_registry(json_path: Path, store: SqliteRegistryStore) -> int:
+    """一次性迁移：把旧版 assets_registry.json 导入 SQLite，完成后原文件改名备份"""
+    if store.get_meta("json_migrated_at") or not json_path.exists():
+        return 0
+    try:
+        data = json.loads(json_path.read_text(encoding='utf-8') or "{}")
+    except Exception as e:
+        logger.error(f"Legacy registry unreadable, migration skipped: {e}")
+        return 0
+    assets_map = data.get("assets_map", data)
+    records = [r for r in assets_map.values() if isinstance(r, dict) and r.get("asset_id")]
+    if records:
+        store.upsert_many(records)
+    store.set_meta("json_migrated_at", datetime.now().isoformat())
+    if records:
+        json_path.rename(json_path.with_name(json_path.name + ".migrated"))
+    logger.info(f"Migrated {len(records)} assets from {json_path.name} to SQLite registry.")
+    return len(records)
+
+
+def create_registry_store(storage_root: Path, backend: str = "sqlite", read_only: bool = False) -> RegistryStore:
+    """read_only 供其他进程读取注册表：库文件不存在时抛 FileNotFoundError，绝不创建或迁移"""
+    storage_root = Path(storage_root)
+    legacy_json = storage_root / "assets_registry.json"
+    if backend == "json":
+        return JsonRegistryStore(legacy_json)
+    if backend == "sqlite":
+        db_path = storage_root / "assets_registry.db"
+        if read_only:
+            if not db_path.exists():
+                raise FileNotFoundError(f"Registry database not found: {db_path}")
+            return SqliteRegistryStore(db_path, read_only=True)
+        return SqliteRegistryStore(db_path, legacy_json=legacy_json)
+    raise ValueError(f"Unknown registry backend: {backend}")
@@ -0,0 +1,142 @@
+import os
+import json
+import fcntl
+import hashlib
+import logging
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("SearchCache")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_SEARCH_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 512,
+    "max_mb": 64,
+    "generation_file": "storage/search_generation",
+}
+
+
+def read_generation(path: Path) -> int:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation(path: Path) -> int:
+    """入库进程每次写入 / 删除向量后调用：代数 +1，Web 进程据此整体失效检索缓存"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        generation = read_generation(path) + 1
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(generation))
+        os.replace(tmp, path)
+    return generation
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+class SearchResultCache:
+    """
+    检索结果缓存：内存 LRU，按条目数与序列化字节数双重限额。
+    键 = (规范化子查询, 偏好, top_k, ann_params)；入库代数变化时整体失效。
+    """
+
+    def __init__(self, cfg: Optional[dict] = None):
+        cfg = dict(DEFAULT_SEARCH_CACHE_CONFIG, **(cfg or {}))
+        self.enabled = bool(cfg["enabled"])
+        self.max_entries = int(cfg["max_entries"])
+        self.max_bytes = int(float(cfg["max_mb"]) * 1024 * 1024)
+        self.generation_path = PROJECT_ROOT / cfg["generation_file"]
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._gen_mtime = None
+        self.generation = read_generation(self.generation_path)
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """与 strengthened_search 的子查询展开一致：queries + 拼接后的 keywords，规范化去重"""
+        search_params = params.get("search_params", {}) or {}
+        queries = search_params.get("queries") or params.get("queries") or []
+        if isinstance(queries, str):
+            queries = [queries]
+        keywords = " ".join(search_params.get("keywords", []) or [])
+        queries = list(dict.fromkeys(_normalize(q) for q in [*queries, keywords] if isinstance(q, str) and q.strip()))
+        preferences = {k: v for k, v in (params.get("preferences", {}) or {}).items() if v not in (None, "", "null")}
+        payload = {
+            "queries": queries,
+            "preferences": preferences,
+            "top_k": search_params.get("top_k", 8),
+            "ann_params": search_params.get("ann_params") or {},
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _sync_generation(self):
+        try:
+            mtime = self.generation_path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._gen_mtime:
+            return
+        self._gen_mtime = mtime
+        generation = read_generation(self.generation_path)
+        if generation != self.generation:
+            if self._entries:
+                self.counters["invalidations"] += 1
+                logger.info(f"Search generation {self.generation} -> {generation}, {len(self._entries)} cached results dropped.")
+            self._entries.clear()
+            self._bytes = 0
+            self.generation = generation
+
+    def get(self, key: str) -> Optional[dict]:
+        """命中时返回反序列化的新副本（调用方可随意修改）"""
+        self._sync_generation()
+        raw = self._entries.get(key)
+        if raw is None:
+            self.counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.counters["hits"] += 1
+        return json.loads(raw)
+
+    def put(self, key: str, result: dict, generation: int):
+        """generation 为检索发起时的代数；期间若有入库则丢弃本次结果"""
+        self._sync_generation()
+        if generation != self.generation:
+            return
+        raw = json.dumps(result, ensure_ascii=False)
+        size = len(raw.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.encode("utf-8"))
+        self._entries[key] = raw
+        self._bytes += size
+        self.counters["stores"] += 1
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.encode("utf-8"))
+            self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        hits, misses = self.counters["hits"], self.counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "generation": self.generation,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            **self.counters,
+        }
@@ -4,8 +4,12 @@ import os
 import yaml
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from core.assets_manager import AcademicAsset
+from core.worker_pool import WorkerPool, SERVE_FLAG, request_socket
+from core.llm_governor import LLMGovernor
+from core.search_cache import SearchResultCache
+from core import tracing
 
 # Global directory for log assets
 LOG_DIR = Path("logs")
@@ -19,10 +23,18 @@ logging.basicConfig(
 logger = logging.getLogger("ServicesManager")
 
 class ServicesManager:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(ServicesManager, cls).__new__(cls)
+        return cls._instance
+
     def __init__(self, config_path="configs/model_config.yaml"):
         """
         Initialize the multi-environment gateway.
         """
+        if hasattr(self, "_initialized"): return
         self.project_root = Path(__file__).resolve().parent.parent
         full_config_path = self.project_root / config_path
         
@@ -32,7 +44,109 @@ class ServicesManager:
         self.envs = self.config.get('environments', {})
         self.expert_log_path = LOG_DIR / "services.log"
         self.wrapper_dir = self.project_root / "services" / "wrappers"
-        
+
+        # 常驻进程池：同一 (env, wrapper) 复用已加载模型的进程
+        self.pool_cfg = self.config.get('worker_pool', {}) or {}
+        self.pools: Dict[str, WorkerPool] = {}
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+        # 检索服务接入方式：pool / socket / inprocess（见 model_config.yaml search_service）
+        self.search_cfg = self.config.get('search_service', {}) or {}
+        self.search_mode = self.search_cfg.get('mode', 'pool')
+        self._search_lock = asyncio.Lock()  # 进程内模式只有一份 CLIP 模型，串行调用
+        self._run_search_inprocess = None
+        if self.search_mode == "inprocess":
+            try:
+                # torch / pymilvus 只在该模式下才需要装在 Web 环境里；导入失败时配置不变，只是实际走进程池
+                from services.wrappers.strengthened_search import run_search
+                self._run_search_inprocess = run_search
+            except ImportError as e:
+                logger.warning(f"In-process search unavailable ({e}), using wrapper dispatch.")
+        # 检索结果缓存：入库进程递增代数文件，代数变化即整体失效
+        self.search_cache = SearchResultCache(self.search_cfg.get('result_cache'))
+        # 结构化大纲：inprocess 时准入许可只覆盖 DeepSeek 请求本身；pool 时只能包住整个 wrapper 调用
+        self.structure_cfg = self.config.get('structure_service', {}) or {}
+        self.structure_mode = self.structure_cfg.get('mode', 'inprocess')
+        self._structure_generator = None
+        if self.structure_mode == "inprocess":
+            try:
+                from services.wrappers.structure_generate import StructureGenerator
+                self._structure_generator = StructureGenerator()
+            except Exception as e:
+                logger.warning(f"In-process structure generation unavailable ({e}), using wrapper dispatch.")
+        self._initialized = True
+
+    def _build_env(self, python_exe: str) -> Dict[str, str]:
+        current_env = os.environ.copy()
+        venv_bin = str(Path(python_exe).parent)
+        current_env["PATH"] = f"{venv_bin}{os.pathsep}{current_env.get('PATH', '')}"
+        current_env["PYTHONUNBUFFERED"] = "1"
+        return current_env
+
+    def _is_resident(self, script_name: str) -> bool:
+        if not self.pool_cfg.get('enabled', False):
+            return False
+        return script_name in (self.pool_cfg.get('resident_scripts') or [])
+
+    def _get_pool(self, env_key: str, script_name: str) -> WorkerPool:
+        pool_key = f"{env_key}:{script_name}"
+        pool = self.pools.get(pool_key)
+        if pool is None:
+            python_exe = self.envs.get(env_key)
+            sizes = self.pool_cfg.get('pool_size', {}) or {}
+            pool = WorkerPool(
+                name=pool_key,
+                cmd=[python_exe, "-u", str(self.wrapper_dir / script_name), SERVE_FLAG],
+                cwd=str(self.project_root),
+                env=self._build_env(python_exe),
+                size=sizes.get(env_key, 1),
+                idle_timeout=self.pool_cfg.get('idle_timeout', 900),
+                start_timeout=self.pool_cfg.get('start_timeout', 300),
+                max_restarts=self.pool_cfg.get('max_restarts', 3)
+            )
+            self.pools[pool_key] = pool
+            self._ensure_maintenance()
+        return pool
+
+    def _ensure_maintenance(self):
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def _maintenance_loop(self):
+        """周期性健康检查与空闲驱逐"""
+        interval = self.pool_cfg.get('health_check_interval', 30)
+        while True:
+            await asyncio.sleep(interval)
+            for pool in list(self.pools.values()):
+                try:
+                    await pool.maintain()
+                except Exception as e:
+                    logger.error(f"Pool maintenance failed for {pool.name}: {e}")
+
+    def get_pool_stats(self) -> Dict[str, dict]:
+        return {key: pool.stats() for key, pool in self.pools.items()}
+
+    def get_service_modes(self) -> Dict[str, dict]:
+        """配置的接入方式与实际生效的方式（进程内依赖缺失时退回 pool）"""
+        search_effective = self.search_mode
+        if self.search_mode == "inprocess" and self._run_search_inprocess is None:
+            search_effective = "pool"
+        structure_effective = self.structure_mode
+        if self.structure_mode == "inprocess" and self._structure_generator is None:
+            structure_effective = "pool"
+        return {
+            "search": {"configured": self.search_mode, "effective": search_effective},
+            "structure": {"configured": self.structure_mode, "effective": structure_effective},
+        }
+
+    async def shutdown(self):
+        """关闭所有常驻进程（由 FastAPI lifespan 调用）"""
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        for pool in self.pools.values():
+            await pool.shutdown()
+        self.pools.clear()
 
     async def _dispatch_async(self, env_key: str, script_name: str, asset: Optional[AcademicAsset] = None, params: Optional[Dict] = None, timeout: int = 3600) -> Dict[str, Any]:
         """
@@ -47,21 +161,28 @@ class ServicesManager:
         if not script_path.exists():
             return {"status": "error", "message": f"Wrapper script not found: {script_name}"}
 
-        current_env = os.environ.copy()
-        
-        venv_bin = str(Path(python_exe).parent)
-        
-        current_env["PATH"] = f"{venv_bin}{os.pathsep}{current_env.get('PATH', '')}"
-        
-        current_env["PYTHONUNBUFFERED"] = "1"
-        
         # 准备参数
         input_data = {}
         if asset:
             input_data = asset.to_dict()
         if params:
             input_data.update(params)
-        
+
+        if self._is_resident(script_name):
+            pool = self._get_pool(env_key, script_name)
+            if not pool.degraded:
+                logger.info(f"Dispatching task to resident [{env_key}] -> {script_name} (Asset: {asset.asset_id if asset else 'N/A'})")
+                try:
+                    result = await pool.run(input_data, timeout=timeout)
+                    if asset and result.get("status") == "error":
+                        result.setdefault("asset_id", asset.asset_id)
+                    return result
+                except Exception as e:
+                    logger.error(f"Resident worker unavailable for {script_name}, falling back to one-shot: {e}")
+            else:
+                logger.warning(f"Pool {pool.name} degraded, using one-shot dispatch.")
+
+        current_env = self._build_env(python_exe)
         input_str = json.dumps(input_data)
 
         logger.info(f"Dispatching task to [{env_key}] -> {script_name} (Asset: {asset.asset_id if asset else 'N/A'})")
@@ -82,6 +203,10 @@ class ServicesManager:
             except asyncio.TimeoutError:
                 process.kill()
                 return {"status": "error", "message": f"Task timed out after {timeout}s", "asset_id": asset.asset_id if asset else None}
+            except asyncio.CancelledError:
+                # 调用方放弃（如专家分支超时），回收子进程
+                process.kill()
+                raise
 
             # 解码输出
             out_str = stdout.decode().strip()
@@ -132,9 +257,39 @@ class ServicesManager:
         """数据入库"""
         return await self._dispatch_async("data_stream", "milvus_ingest.py", asset=asset)
 
+    async def _dispatch_batch(self, env_key: str, script_name: str, assets: List[AcademicAsset], timeout_per_asset: int = 3600) -> Dict[str, dict]:
+        """
+        批量分派：一次 wrapper 调用处理多个资产，返回 {asset_id: 单资产结果}。
+        整体失败（崩溃/超时）时每个资产都拿到同一个错误。
+        """
+        res = await self._dispatch_async(
+            env_key, script_name,
+            params={"batch": [a.to_dict() for a in assets]},
+            timeout=timeout_per_asset * len(assets)
+        )
+        per_asset = res.get("results") if res.get("status") == "success" else None
+        if not isinstance(per_asset, dict):
+            error = {"status": "error", "message": res.get("message", "Batch task returned no per-asset results")}
+            return {a.asset_id: dict(error, asset_id=a.asset_id) for a in assets}
+        return per_asset
+
+    async def start_clip_indexing_batch(self, assets: List[AcademicAsset]) -> Dict[str, dict]:
+        """批量特征提取（共享同一个 CLIP 模型）"""
+        return await self._dispatch_batch("data_stream", "clip_work.py", assets)
+
+    async def start_milvus_ingestion_batch(self, assets: List[AcademicAsset]) -> Dict[str, dict]:
+        """批量入库（共享 Milvus 连接与 MinIO 客户端，末尾统一 flush）"""
+        return await self._dispatch_batch("data_stream", "milvus_ingest.py", assets)
+
     async def start_structure_generation(self, asset: AcademicAsset):
-        """DeepSeek 结构化输出"""
-        return await self._dispatch_async("agent_logic", "structure_generate.py", asset=asset)
+        """DeepSeek 结构化输出（后台阶段，经准入控制排在交互会话之后）"""
+        gate = LLMGovernor().slot("background:structuring", "structural_outline")
+        if self._structure_generator is not None:
+            # Web 进程即 AgentLogic 环境：直接复用共享的 LLMClient，许可在发请求时才获取
+            return await self._structure_generator.generate_outline(asset, gate=gate)
+        # pool：许可覆盖整个子进程调用（含 worker 拉起与上下文读取），粒度较粗
+        async with gate:
+            return await self._dispatch_async("agent_logic", "structure_generate.py", asset=asset)
 
     async def call_visual_expert(self,  params: dict):
         """Qwen-VL 视觉推理"""
@@ -145,5 +300,34 @@ class ServicesManager:
         return await self._dispatch_async("sandbox_inference", "sandbox_inference.py", params=params)
     
     async def start_academic_search(self, params: dict):
-        """学术搜索"""
+        """学术搜索：先查结果缓存，未命中再实际检索，成功结果按发起时的入库代数写回"""
+        if not self.search_cache.enabled:
+            return await self._run_academic_search(params)
+        key = self.search_cache.make_key(params)
+        cached = self.search_cache.get(key)
+        if cached is not None:
+            tracing.annotate(cache="hit")
+            return cached
+        generation = self.search_cache.generation
+        result = await self._run_academic_search(params)
+        if isinstance(result, dict) and result.get("status") == "success":
+            self.search_cache.put(key, result, generation)
+        return result
+
+    def get_search_cache_stats(self) -> dict:
+        return self.search_cache.stats()
+
+    async def _run_academic_search(self, params: dict):
+        """按配置走本地 socket 服务 / 进程内常驻检索 / wrapper 进程池，前两者失败时退回进程池"""
+        timeout = self.search_cfg.get('timeout', 120)
+        if self.search_mode == "socket":
+            socket_path = str(self.project_root / self.search_cfg.get('socket_path', 'storage/search_service.sock'))
+            try:
+                return await request_socket(socket_path, params, timeout=timeout)
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(f"Search socket service unavailable ({e}), falling back to wrapper dispatch.")
+        elif self._run_search_inprocess is not None:
+            # 线程内的检索无法中途取消，这里不套超时，避免锁释放后并发使用同一模型
+            async with self._search_lock:
+                return await asyncio.to_thread(self._run_search_inprocess, params)
         return await self._dispatch_async("data_stream", "strengthened_search.py", params=params)
\ No newline at end of file
@@ -0,0 +1,145 @@
+import os
+import json
+import sqlite3
+import logging
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("SessionsStore")
+
+# 会话列表所需的轻量元数据（索引列）
+META_FIELDS = ["chat_id", "chat_name", "status", "messages_count", "evidence_count", "retry_count", "uptime", "last_active"]
+
+# 重启时仍处于推理中的状态统一复位为 Idle
+INTERRUPTED_STATUSES = ["Preparing", "Researching", "Evaluating", "Strengthening", "Finalizing"]
+
+
+class SessionsStore:
+    """
+    会话存储：每个会话一个只追加的 JSONL 日志（snapshot / meta / message / evidence 事件），
+    累积事件过多时压缩为单条快照；会话列表走 SQLite 元数据索引，无需加载正文。
+    """
+
+    def __init__(self, storage_dir: Path, compact_every: int = 200):
+        self.storage_dir = Path(storage_dir)
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.compact_every = compact_every
+        self.conn = sqlite3.connect(str(self.storage_dir / "sessions_index.db"), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    chat_id TEXT PRIMARY KEY,
+                    chat_name TEXT,
+                    status TEXT,
+                    messages_count INTEGER NOT NULL DEFAULT 0,
+                    evidence_count INTEGER NOT NULL DEFAULT 0,
+                    retry_count INTEGER NOT NULL DEFAULT 0,
+                    uptime TEXT,
+                    last_active TEXT,
+                    journal_events INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions(last_active)")
+        self.migrate_legacy_json()
+        self._reset_interrupted()
+
+    def _journal_path(self, chat_id: str) -> Path:
+        return self.storage_dir / f"{chat_id}.jsonl"
+
+    # --- 索引 ---
+
+    def _upsert_meta(self, meta: dict, journal_events: int):
+        values = [meta.get(k) for k in META_FIELDS]
+        with self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO sessions ({','.join(META_FIELDS)}, journal_events) "
+                f"VALUES ({','.join('?' * (len(META_FIELDS) + 1))})",
+                (*values, journal_events)
+            )
+
+    def _reset_interrupted(self):
+        with self.conn:
+            self.conn.execute(
+                f"UPDATE sessions SET status = 'Idle' WHERE status IN ({','.join('?' * len(INTERRUPTED_STATUSES))})",
+                INTERRUPTED_STATUSES
+            )
+
+    def exists(self, chat_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone() is not None
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def list_meta(self) -> Dict[str, dict]:
+        rows = self.conn.execute(f"SELECT {','.join(META_FIELDS)} FROM sessions ORDER BY last_active DESC").fetchall()
+        return {row["chat_id"]: dict(row) for row in rows}
+
+    def get_meta(self, chat_id: str) -> Optional[dict]:
+        row = self.conn.execute(f"SELECT {','.join(META_FIELDS)} FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone()
+        return dict(row) if row else None
+
+    # --- 日志 ---
+
+    def read_events(self, chat_id: str) -> List[dict]:
+        path = self._journal_path(chat_id)
+        if not path.exists():
+            return []
+        events = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 崩溃时最后一行可能只写了一半
+                    logger.warning(f"Skipping truncated journal line in {path.name}")
+        return events
+
+    def append(self, chat_id: str, events: List[dict], meta: dict) -> bool:
+        """追加事件并更新索引；返回是否应当压缩"""
+        if events:
+            with open(self._journal_path(chat_id), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events))
+        row = self.conn.execute("SELECT journal_events FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone()
+        journal_events = (row["journal_events"] if row else 0) + len(events)
+        self._upsert_meta(meta, journal_events)
+        return journal_events > self.compact_every
+
+    def compact(self, chat_id: str, snapshot: dict):
+        """用一条快照替换整段日志"""
+        path = self._journal_path(chat_id)
+        tmp = path.with_suffix(".jsonl.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "snapshot", "data": snapshot}, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+        self._upsert_meta(snapshot, 1)
+
+    # --- 旧版迁移 ---
+
+    def migrate_legacy_json(self) -> int:
+        """把旧版整文件 storage/chats/*.json 转为单快照日志，原文件改名备份"""
+        count = 0
+        for file_path in self.storage_dir.glob("*.json"):
+            try:
+                data = json.loads(file_path.read_text(encoding="utf-8"))
+                chat_id = data["chat_id"]
+                if not self.exists(chat_id):
+                    data.setdefault("messages_count", len(data.get("messages", [])))
+                    data.setdefault("evidence_count", len(data.get("evidence", [])))
+                    self.compact(chat_id, data)
+                file_path.rename(file_path.with_name(file_path.name + ".migrated"))
+                count += 1
+            except Exception as e:
+                logger.error(f"Legacy session migration failed for {file_path.name}: {e}")
+        if count:
+            logger.info(f"Migrated {count} legacy chat sessions to journal storage ({datetime.now().isoformat()}).")
+        return count
+
+    def close(self):
+        self.conn.close()
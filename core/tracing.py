@@ -0,0 +1,135 @@
+import math
+import time
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+# 当前任务所属的轮次追踪与所在 span；asyncio.gather / create_task 会复制上下文，
+# 并发分支因此各自挂在发起它们的 span 之下
+_current_trace: ContextVar[Optional["TurnTrace"]] = ContextVar("turn_trace", default=None)
+_current_span: ContextVar[Optional[dict]] = ContextVar("trace_span", default=None)
+
+PERCENTILES = (50, 95, 99)
+
+
+class TurnTrace:
+    """
+    单轮推理的 span 记录：每个 span 记录相对本轮开始的起止时间（毫秒）、父 span、
+    结果状态，以及调用方补充的属性（重试次数、请求/响应大小、排队时间等）。
+    """
+
+    def __init__(self, chat_id: str, turn: int):
+        self.chat_id = chat_id
+        self.turn = turn
+        self.started_at = datetime.now().isoformat()
+        self._t0 = time.perf_counter()
+        self.spans: List[dict] = []
+
+    def _now_ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000, 2)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        parent = _current_span.get()
+        record = {"name": name, "parent": parent["name"] if parent else None,
+                  "start_ms": self._now_ms(), **attrs}
+        self.spans.append(record)
+        token = _current_span.set(record)
+        try:
+            yield record
+            record.setdefault("status", "ok")
+        except BaseException as e:
+            if isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                record["status"] = "cancelled"
+            else:
+                record["status"] = "error"
+                record["error"] = str(e)[:200]
+            raise
+        finally:
+            record["end_ms"] = self._now_ms()
+            record["duration_ms"] = round(record["end_ms"] - record["start_ms"], 2)
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # 异步生成器在其他上下文中被关闭时无法复位，直接置空即可
+                _current_span.set(None)
+
+    def to_dict(self) -> dict:
+        return {
+            "turn": self.turn,
+            "started_at": self.started_at,
+            "duration_ms": self._now_ms(),
+            "spans": self.spans,
+        }
+
+
+def activate(trace: Optional[TurnTrace]):
+    """把 trace 绑定到当前任务上下文，之后的 span() / annotate() 都记到它上面"""
+    _current_trace.set(trace)
+    _current_span.set(None)
+
+
+def current_trace() -> Optional[TurnTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """在当前 trace 上开一个 span；没有活动 trace 时不记录"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield {}
+        return
+    with trace.span(name, **attrs) as record:
+        yield record
+
+
+def annotate(**attrs):
+    """给当前 span 补充属性（如 LLMClient 内部的重试次数、缓存命中）"""
+    record = _current_span.get()
+    if record is not None:
+        record.update(attrs)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩法百分位，输入需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class PhaseLatency:
+    """跨会话的各阶段耗时分布（每个阶段保留最近 window 个样本）"""
+
+    def __init__(self, window: int = 2000):
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.turns = 0
+
+    def add(self, trace: dict):
+        self.turns += 1
+        for s in trace.get("spans", []):
+            if "duration_ms" not in s:
+                continue  # 本轮结束时仍未完成的 span（如被丢弃的投机检索）
+            name = s["name"]
+            self.samples.setdefault(name, deque(maxlen=self.window)).append(s["duration_ms"])
+            if s.get("status") not in (None, "ok"):
+                self.errors[name] = self.errors.get(name, 0) + 1
+        self.samples.setdefault("turn", deque(maxlen=self.window)).append(trace.get("duration_ms", 0.0))
+
+    def summary(self) -> dict:
+        phases = {}
+        for name, values in self.samples.items():
+            ordered = sorted(values)
+            phases[name] = {
+                "count": len(ordered),
+                "errors": self.errors.get(name, 0),
+                **{f"p{q}_ms": percentile(ordered, q) for q in PERCENTILES},
+                "max_ms": ordered[-1] if ordered else 0.0,
+            }
+        return {"turns": self.turns, "window": self.window, "phases": phases}
@@ -0,0 +1,326 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("WorkerPool")
+
+# 常驻进程协议：一行一个 JSON。子进程会把日志也打到 stdout，
+# 因此只有带此前缀的行才被视为协议应答。
+RESULT_MARK = "@@WORKER@@ "
+SERVE_FLAG = "--serve"
+# 本地 socket 服务模式：wrapper 以 `--socket <path>` 启动，协议同上但不需要前缀
+SOCKET_FLAG = "--socket"
+
+
+# --- 子进程侧：wrapper 在 --serve 模式下调用 ---
+
+def _emit(message: dict):
+    sys.stdout.write(RESULT_MARK + json.dumps(message, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def serve_stdio(handler: Callable[[dict], dict]):
+    """
+    常驻循环：从 stdin 逐行读取任务，调用 handler，结果写回 stdout。
+    handler 接收与单次模式 argv[1] 相同结构的字典，返回结果字典。
+    """
+    _emit({"event": "ready"})
+    for line in sys.stdin:
+        reply = _handle_line(line, handler)
+        if reply is not None:
+            _emit(reply)
+
+
+def _handle_line(line: str, handler: Callable[[dict], dict]) -> Optional[dict]:
+    line = line.strip()
+    if not line:
+        return None
+    job_id = None
+    try:
+        message = json.loads(line)
+        job_id = message.get("job_id")
+        if message.get("op") == "ping":
+            result = {"status": "success", "pong": True}
+        else:
+            result = handler(message.get("payload") or {})
+    except Exception as e:
+        result = {"status": "error", "message": f"Resident worker error: {str(e)}"}
+    return {"job_id": job_id, "result": result}
+
+
+def serve_socket(handler: Callable[[dict], dict], path: str):
+    """
+    常驻本地 Unix socket 服务：每个连接可连续发送多行任务，逐个串行处理
+    （模型只有一份，不做多线程并发）。
+    """
+    import socketserver
+
+    class _LineHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                reply = _handle_line(raw.decode("utf-8", errors="replace"), handler)
+                if reply is not None:
+                    self.wfile.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+    if os.path.exists(path):
+        os.remove(path)  # 上次异常退出遗留的 socket 文件
+    with socketserver.UnixStreamServer(path, _LineHandler) as server:
+        logger.info(f"Socket worker listening on {path}")
+        try:
+            server.serve_forever()
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# --- 父进程侧：由 ServicesManager 持有 ---
+
+class WorkerCrashed(Exception):
+    pass
+
+
+async def request_socket(path: str, payload: dict, timeout: float) -> dict:
+    """向 serve_socket 启动的本地服务发送一个任务；连接失败时抛出 OSError 由调用方降级"""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_unix_connection(path, limit=64 * 1024 * 1024), timeout=timeout
+    )
+    try:
+        job_id = uuid.uuid4().hex
+        message = {"job_id": job_id, "op": "run", "payload": payload}
+        writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode())
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.readline(), timeout=timeout)
+        if not raw:
+            raise WorkerCrashed(f"Socket worker at {path} closed the connection")
+        return json.loads(raw).get("result") or {}
+    finally:
+        writer.close()
+
+
+class ResidentWorker:
+    """单个常驻 wrapper 进程，一次只处理一个任务"""
+
+    def __init__(self, name: str, cmd: List[str], cwd: str, env: Dict[str, str]):
+        self.name = name
+        self.cmd = cmd
+        self.cwd = cwd
+        self.env = env
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.busy = False
+        self.jobs_done = 0
+        self.started_at = 0.0
+        self.last_used = 0.0
+        self._stderr_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, timeout: float):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            env=self.env,
+            limit=64 * 1024 * 1024  # 单行结果可能很大（检索结果/特征统计）
+        )
+        # stderr 必须持续消费，否则管道写满后子进程会阻塞
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+        try:
+            await asyncio.wait_for(self._read_message(), timeout=timeout)
+        except BaseException:
+            # 含取消：半加载的进程（可能已占显存）必须回收
+            await asyncio.shield(self.stop())
+            raise
+        self.started_at = self.last_used = time.monotonic()
+        logger.info(f"Resident worker [{self.name}] ready (pid={self.process.pid}).")
+
+    async def _drain_stderr(self):
+        try:
+            async for raw in self.process.stderr:
+                line = raw.decode(errors="replace").rstrip()
+                if line:
+                    logger.debug(f"[{self.name}] {line}")
+        except Exception:
+            pass
+
+    async def _read_message(self) -> dict:
+        while True:
+            raw = await self.process.stdout.readline()
+            if not raw:
+                raise WorkerCrashed(f"Worker [{self.name}] exited with code {self.process.returncode}")
+            line = raw.decode(errors="replace")
+            if line.startswith(RESULT_MARK):
+                return json.loads(line[len(RESULT_MARK):])
+
+    async def request(self, payload: Optional[dict], timeout: float, op: str = "run") -> dict:
+        job_id = uuid.uuid4().hex
+        message = {"job_id": job_id, "op": op, "payload": payload}
+        self.process.stdin.write((json.dumps(message, ensure_ascii=False) + "\n").encode())
+        await self.process.stdin.drain()
+        while True:
+            reply = await asyncio.wait_for(self._read_message(), timeout=timeout)
+            if reply.get("job_id") == job_id:
+                self.last_used = time.monotonic()
+                if op == "run":
+                    self.jobs_done += 1
+                return reply.get("result") or {}
+
+    async def ping(self, timeout: float) -> bool:
+        try:
+            res = await self.request(None, timeout=timeout, op="ping")
+            return bool(res.get("pong"))
+        except Exception:
+            return False
+
+    async def stop(self):
+        if self.process and self.process.returncode is None:
+            try:
+                self.process.stdin.close()
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except Exception:
+                self.process.kill()
+                await self.process.wait()
+        if self._stderr_task:
+            self._stderr_task.cancel()
+
+
+class WorkerPool:
+    """
+    同一 (环境, wrapper) 的常驻进程池：按需拉起、崩溃后替换、空闲驱逐。
+    """
+
+    def __init__(self, name: str, cmd: List[str], cwd: str, env: Dict[str, str], size: int = 1,
+                 idle_timeout: float = 900, start_timeout: float = 300, max_restarts: int = 3):
+        self.name = name
+        self.cmd = cmd
+        self.cwd = cwd
+        self.env = env
+        self.size = max(1, int(size))
+        self.idle_timeout = idle_timeout
+        self.start_timeout = start_timeout
+        self.max_restarts = max_restarts
+
+        self.workers: List[ResidentWorker] = []
+        self._slots = asyncio.Semaphore(self.size)
+        self._lock = asyncio.Lock()
+        self.consecutive_failures = 0
+        self.last_failure = 0.0
+        self.restarts = 0
+        self.jobs_done = 0
+
+    @property
+    def degraded(self) -> bool:
+        """连续拉起失败超过上限时视为不可用（冷却期内），调用方应退回单次模式"""
+        if self.consecutive_failures < self.max_restarts:
+            return False
+        return time.monotonic() - self.last_failure < self.idle_timeout
+
+    async def _acquire(self) -> ResidentWorker:
+        async with self._lock:
+            for w in list(self.workers):
+                if not w.busy and not w.is_alive:
+                    self.workers.remove(w)
+                    self.restarts += 1
+                    logger.warning(f"Pool [{self.name}]: worker died, will be replaced.")
+            for w in self.workers:
+                if not w.busy:
+                    w.busy = True
+                    return w
+            worker = ResidentWorker(self.name, self.cmd, self.cwd, self.env)
+            worker.busy = True
+            self.workers.append(worker)
+        try:
+            await worker.start(self.start_timeout)
+            self.consecutive_failures = 0
+            return worker
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                self.consecutive_failures += 1
+                self.last_failure = time.monotonic()
+            # 取消时同样移出列表，否则 busy=True 的僵尸项永远不会被维护或复用
+            if worker in self.workers:
+                self.workers.remove(worker)
+            raise
+
+    async def run(self, payload: dict, timeout: float) -> dict:
+        async with self._slots:
+            worker = None
+            try:
+                # 拉起也在 try 内：启动期间被取消 / 失败时 _acquire 已回收进程，异常原样抛给调用方
+                worker = await self._acquire()
+                result = await worker.request(payload, timeout=timeout)
+                self.jobs_done += 1
+                return result
+            except asyncio.TimeoutError:
+                if worker is None:
+                    raise
+                # 超时后进程状态不可信，直接替换
+                await self._discard(worker)
+                return {"status": "error", "message": f"Task timed out after {timeout}s"}
+            except asyncio.CancelledError:
+                if worker is not None:
+                    # 调用方取消时任务仍在子进程中执行，同样替换
+                    await asyncio.shield(self._discard(worker))
+                raise
+            except Exception as e:
+                if worker is None:
+                    raise
+                await self._discard(worker)
+                return {"status": "error", "message": f"Resident worker failure: {str(e)}"}
+            finally:
+                if worker is not None:
+                    worker.busy = False
+
+    async def _discard(self, worker: ResidentWorker):
+        async with self._lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+        self.restarts += 1
+        await worker.stop()
+
+    async def maintain(self, ping_timeout: float = 10):
+        """健康检查 + 空闲驱逐，仅作用于空闲进程"""
+        now = time.monotonic()
+        async with self._lock:
+            idle = [w for w in self.workers if not w.busy]
+            for w in idle:
+                w.busy = True
+        for w in idle:
+            try:
+                if not w.is_alive:
+                    await self._discard(w)
+                elif now - w.last_used > self.idle_timeout:
+                    logger.info(f"Pool [{self.name}]: evicting idle worker (pid={w.process.pid}).")
+                    async with self._lock:
+                        self.workers.remove(w)
+                    await w.stop()
+                elif not await w.ping(ping_timeout):
+                    logger.warning(f"Pool [{self.name}]: health check failed, restarting worker.")
+                    await self._discard(w)
+            finally:
+                w.busy = False
+
+    async def shutdown(self):
+        async with self._lock:
+            workers, self.workers = self.workers, []
+        for w in workers:
+            await w.stop()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "alive": sum(1 for w in self.workers if w.is_alive),
+            "busy": sum(1 for w in self.workers if w.busy),
+            "jobs_done": self.jobs_done,
+            "restarts": self.restarts,
+            "degraded": self.degraded
+        }
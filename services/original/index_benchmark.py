@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import yaml
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from pymilvus import connections, utility, Collection, CollectionSchema, FieldSchema, DataType
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+from services.original.index_profiles import resolve_index_profile, build_index_params, build_search_params, VECTOR_INDEX_NAME
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - [IndexBench] - %(levelname)s - %(message)s')
+logger = logging.getLogger("IndexBenchmark")
+
+
+def sample_vectors(collection: Collection, vec_field: str, limit: int) -> np.ndarray:
+    """Stream up to `limit` stored vectors out of the live collection."""
+    rows = []
+    iterator = collection.query_iterator(batch_size=1000, limit=limit, output_fields=[vec_field])
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            rows.extend(r[vec_field] for r in batch)
+    finally:
+        iterator.close()
+    return np.asarray(rows, dtype=np.float32)
+
+
+def ground_truth(base: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k by inner product (matches the collection's IP metric)."""
+    scores = queries @ base.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray, k: int) -> float:
+    hits = sum(len(set(f[:k]) & set(t[:k].tolist())) for f, t in zip(found, truth))
+    return hits / float(k * len(truth))
+
+
+class IndexBenchmark:
+    """
+    Builds each index profile on a scratch copy of a vector sample and measures
+    recall@k against brute force, single-query latency / QPS, build time and memory.
+    """
+
+    def __init__(self, milvus_config="configs/milvus_config.yaml"):
+        with open(PROJECT_ROOT / milvus_config, 'r', encoding='utf-8') as f:
+            self.db_cfg = yaml.safe_load(f)
+        conn = self.db_cfg['connection']
+        connections.connect("default", host=conn['host'], port=conn['port'])
+        self.c = self.db_cfg['collection']
+        self.vec_field = self.db_cfg['schema']['vec']
+
+    def _scratch_collection(self, profile_name: str, base: np.ndarray) -> Collection:
+        name = f"{self.c['name']}_bench_{profile_name}"
+        if utility.has_collection(name):
+            utility.drop_collection(name)
+        fields = [
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+            FieldSchema(name=self.vec_field, dtype=DataType.FLOAT_VECTOR, dim=base.shape[1]),
+        ]
+        collection = Collection(name, CollectionSchema(fields, "Index profile benchmark scratch"))
+        # Row position doubles as primary key so ANN ids compare directly with ground truth
+        for start in range(0, len(base), 5000):
+            chunk = base[start:start + 5000]
+            collection.insert([list(range(start, start + len(chunk))), chunk.tolist()])
+        collection.flush()
+        return collection
+
+    def _time_queries(self, collection: Collection, queries: np.ndarray, k: int, search_param: Dict[str, Any]):
+        found, latencies = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            res = collection.search(data=[q.tolist()], anns_field=self.vec_field, param=search_param, limit=k)
+            latencies.append(time.perf_counter() - t0)
+            found.append([hit.id for hit in res[0]])
+        return found, np.asarray(latencies) * 1000.0
+
+    def run_profile(self, profile_name: str, base: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                    k: int, keep: bool = False) -> List[Dict[str, Any]]:
+        profile = resolve_index_profile(self.db_cfg, profile_name)
+        collection = self._scratch_collection(profile_name, base)
+        rows = []
+        try:
+            t0 = time.perf_counter()
+            collection.create_index(field_name=self.vec_field, index_params=build_index_params(profile, self.c['metric_type']))
+            utility.wait_for_index_building_complete(collection.name)
+            build_s = time.perf_counter() - t0
+            collection.load()
+            mem_mb = sum(getattr(s, "mem_size", 0) for s in utility.get_query_segment_info(collection.name)) / 2 ** 20
+
+            # Warm-up so the first timed query does not pay for lazy loading
+            collection.search(data=[queries[0].tolist()], anns_field=self.vec_field,
+                              param=build_search_params(profile, self.c['metric_type']), limit=k)
+            for override in [{}] + profile['sweep']:
+                search_param = build_search_params(profile, self.c['metric_type'], override)
+                found, lat = self._time_queries(collection, queries, k, search_param)
+                rows.append({
+                    "profile": profile_name,
+                    "index_type": profile['index_type'],
+                    "build_params": profile['build_params'],
+                    "search_params": search_param['params'],
+                    f"recall@{k}": round(recall_at_k(found, truth, k), 4),
+                    "qps": round(len(queries) / (lat.sum() / 1000.0), 1),
+                    "p50_ms": round(float(np.percentile(lat, 50)), 2),
+                    "p95_ms": round(float(np.percentile(lat, 95)), 2),
+                    "build_s": round(build_s, 2),
+                    "mem_mb": round(mem_mb, 1),
+                })
+                logger.info(f"{profile_name} {search_param['params']}: recall@{k}={rows[-1][f'recall@{k}']} "
+                            f"qps={rows[-1]['qps']} p95={rows[-1]['p95_ms']}ms")
+        except Exception as e:
+            # e.g. DISKANN not enabled on this Milvus deployment
+            logger.warning(f"Profile {profile_name} skipped: {e}")
+            rows.append({"profile": profile_name, "index_type": profile['index_type'], "error": str(e)})
+        finally:
+            if not keep:
+                utility.drop_collection(collection.name)
+        return rows
+
+    def run(self, profiles: List[str], sample: int, n_queries: int, k: int, keep: bool = False) -> Dict[str, Any]:
+        live = Collection(self.c['name'])
+        vectors = sample_vectors(live, self.vec_field, sample + n_queries)
+        if len(vectors) <= n_queries + k:
+            raise RuntimeError(f"Only {len(vectors)} vectors in {self.c['name']}; not enough to benchmark.")
+        # Held-out stored vectors act as queries; they are excluded from the indexed base
+        rng = np.random.default_rng(0)
+        perm = rng.permutation(len(vectors))
+        queries, base = vectors[perm[:n_queries]], vectors[perm[n_queries:]]
+        truth = ground_truth(base, queries, k)
+        logger.info(f"Benchmarking {profiles} on {len(base)} vectors with {len(queries)} queries (k={k}).")
+
+        results = []
+        for name in profiles:
+            results.extend(self.run_profile(name, base, queries, truth, k, keep))
+        return {"collection": self.c['name'], "base_size": len(base), "queries": len(queries), "k": k,
+                "current_profile": resolve_index_profile(self.db_cfg)['name'], "results": results}
+
+    def apply(self, profile_name: str):
+        """Rebuild the live collection's vector index with the given profile."""
+        profile = resolve_index_profile(self.db_cfg, profile_name)
+        collection = Collection(self.c['name'])
+        collection.release()
+        for idx in collection.indexes:
+            if idx.field_name == self.vec_field:
+                collection.drop_index(index_name=idx.index_name)
+        collection.create_index(field_name=self.vec_field, index_params=build_index_params(profile, self.c['metric_type']),
+                                index_name=VECTOR_INDEX_NAME)
+        utility.wait_for_index_building_complete(collection.name)
+        collection.load()
+        logger.info(f"{self.c['name']} now uses {profile['index_type']} ({profile_name}). "
+                    f"Set collection.index_profile: \"{profile_name}\" so searches use its search_params.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vector index profiles on recall / latency / memory")
+    parser.add_argument("--profiles", nargs="*", help="Profile names (default: all in milvus_config.yaml)")
+    parser.add_argument("--sample", type=int, default=20000, help="Vectors copied into each scratch collection")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=str(PROJECT_ROOT / "logs" / "index_benchmark.json"))
+    parser.add_argument("--keep", action="store_true", help="Keep scratch collections after the run")
+    parser.add_argument("--apply", metavar="PROFILE", help="Rebuild the live collection's index with PROFILE and exit")
+    args = parser.parse_args()
+
+    bench = IndexBenchmark()
+    if args.apply:
+        bench.apply(args.apply)
+        sys.exit(0)
+
+    report = bench.run(args.profiles or list(bench.db_cfg.get('index_profiles', {}) or {}),
+                       args.sample, args.queries, args.k, args.keep)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"Report written to {args.output}")
@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+
+VECTOR_INDEX_NAME = "idx_vector"
+
+
+def resolve_index_profile(db_cfg: Dict[str, Any], name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Resolve a named profile from milvus_config.yaml index_profiles. Without profiles the
+    legacy collection.index_type / nlist keys (and search.nprobe) are used unchanged.
+    """
+    c = db_cfg.get('collection', {}) or {}
+    profiles = db_cfg.get('index_profiles', {}) or {}
+    name = name or c.get('index_profile')
+    if name:
+        if name not in profiles:
+            raise ValueError(f"Unknown index profile '{name}', expected one of {sorted(profiles)}")
+        p = profiles[name]
+        return {
+            "name": name,
+            "index_type": p['index_type'],
+            "build_params": dict(p.get('build_params') or {}),
+            "search_params": dict(p.get('search_params') or {}),
+            "sweep": list(p.get('sweep') or []),
+        }
+    return {
+        "name": "legacy",
+        "index_type": c.get('index_type', "IVF_FLAT"),
+        "build_params": {"nlist": c.get('nlist', 128)},
+        "search_params": {"nprobe": (db_cfg.get('search', {}) or {}).get('nprobe', 12)},
+        "sweep": [],
+    }
+
+
+def build_index_params(profile: Dict[str, Any], metric_type: str) -> Dict[str, Any]:
+    return {"metric_type": metric_type, "index_type": profile['index_type'], "params": profile['build_params']}
+
+
+def build_search_params(profile: Dict[str, Any], metric_type: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Per-query ANN params (nprobe / ef / search_list); overrides win over the profile defaults."""
+    return {"metric_type": metric_type, "params": dict(profile['search_params'], **(overrides or {}))}
@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import math
+import shutil
+import uuid
+import fcntl
+import logging
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("LexicalIndex")
+
+# ASCII terms keep inner dots/dashes so "3.2", "f1-score", "resnet-50" survive as one token
+ASCII_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-_][a-z0-9]+)*")
+CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+# Only text-bearing records are indexed; image/frame refs are URLs
+LEXICAL_TYPES = ("text", "transcript_context")
+DOC_FIELDS = ("asset_name", "modality", "content_type", "content_ref", "timestamp", "coordinates")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    CJK-aware tokenization: ASCII words/numbers as whole tokens, CJK runs as
+    overlapping bigrams (a single-character run stays a unigram).
+    """
+    text = (text or "").lower()
+    tokens = ASCII_TOKEN.findall(text)
+    for run in CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class _Segment:
+    """One immutable per-asset segment; postings and vectors are memory-mapped."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path / "terms.json", "r", encoding="utf-8") as f:
+            self.terms: Dict[str, List[int]] = json.load(f)
+        with open(path / "docs.json", "r", encoding="utf-8") as f:
+            self.docs: List[Dict[str, Any]] = json.load(f)
+        self.doc_len = np.load(path / "doc_len.npy", mmap_mode="r")
+        self.post_doc = np.load(path / "postings_doc.npy", mmap_mode="r")
+        self.post_tf = np.load(path / "postings_tf.npy", mmap_mode="r")
+        vec_path = path / "vectors.npy"
+        self.vectors = np.load(vec_path, mmap_mode="r") if vec_path.exists() else None
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        span = self.terms.get(term)
+        if span is None:
+            return self.post_doc[:0], self.post_tf[:0]
+        return self.post_doc[span[0]:span[1]], self.post_tf[span[0]:span[1]]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over content_ref texts, stored as one segment per asset under
+    index_dir. Segments are written at ingest time and swapped in atomically via
+    manifest.json; readers reload when the manifest changes.
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        self.root = Path(index_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._manifest_mtime = None
+        self.segments: Dict[str, _Segment] = {}
+
+    # --- writer side (milvus_ingest) ---
+
+    def _read_manifest(self) -> Dict[str, str]:
+        path = self.root / "manifest.json"
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict[str, str]):
+        tmp = self.root / "manifest.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, self.root / "manifest.json")
+
+    def _update_manifest(self, asset_name: str, segment: Optional[str]):
+        # Several ingest workers may finish at once; serialize manifest swaps
+        with open(self.root / "manifest.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = self._read_manifest()
+            old = manifest.pop(asset_name, None)
+            if segment:
+                manifest[asset_name] = segment
+            self._write_manifest(manifest)
+        if old and old != segment:
+            shutil.rmtree(self.root / old, ignore_errors=True)
+
+    def add_segment(self, asset_name: str, docs: List[Dict[str, Any]], vectors: Optional[List[List[float]]] = None) -> int:
+        """(Re)build the asset's segment; docs carry DOC_FIELDS, vectors align with docs."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_len = []
+        for doc_id, doc in enumerate(docs):
+            counts = Counter(tokenize(doc.get("content_ref", "")))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        name = f"seg_{re.sub(r'[^A-Za-z0-9_.-]', '_', asset_name)}_{uuid.uuid4().hex[:8]}"
+        tmp = self.root / f"{name}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        terms, post_doc, post_tf = {}, [], []
+        for term in sorted(postings):
+            start = len(post_doc)
+            for doc_id, tf in postings[term]:
+                post_doc.append(doc_id)
+                post_tf.append(min(tf, 65535))
+            terms[term] = [start, len(post_doc)]
+
+        np.save(tmp / "doc_len.npy", np.asarray(doc_len, dtype=np.int32))
+        np.save(tmp / "postings_doc.npy", np.asarray(post_doc, dtype=np.int32))
+        np.save(tmp / "postings_tf.npy", np.asarray(post_tf, dtype=np.uint16))
+        if vectors:
+            # float16 is enough to re-score lexical-only hits against the query vector
+            np.save(tmp / "vectors.npy", np.asarray(vectors, dtype=np.float16))
+        with open(tmp / "terms.json", "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(tmp / "docs.json", "w", encoding="utf-8") as f:
+            json.dump([{k: d.get(k) for k in DOC_FIELDS} for d in docs], f, ensure_ascii=False)
+
+        final = self.root / name
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+        self._update_manifest(asset_name, name)
+        return len(docs)
+
+    def remove_asset(self, asset_name: str):
+        self._update_manifest(asset_name, None)
+
+    # --- reader side (search worker) ---
+
+    def refresh(self):
+        path = self.root / "manifest.json"
+        mtime = path.stat().st_mtime_ns if path.exists() else None
+        if mtime == self._manifest_mtime:
+            return
+        manifest = self._read_manifest()
+        segments = {}
+        for asset_name, seg_name in manifest.items():
+            seg = self.segments.get(asset_name)
+            if seg is not None and seg.path.name == seg_name:
+                segments[asset_name] = seg
+                continue
+            try:
+                segments[asset_name] = _Segment(self.root / seg_name)
+            except Exception as e:
+                logger.warning(f"Lexical segment {seg_name} unreadable, skipped: {e}")
+        self.segments = segments
+        self._manifest_mtime = mtime
+
+    def search(self, query: str, top_k: int = 10, assets: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        BM25 top-k across segments (optionally only the given assets' segments);
+        each hit carries bm25 score, doc fields and its vector. Corpus statistics stay global.
+        """
+        self.refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.segments:
+            return []
+
+        all_segments = list(self.segments.values())
+        segments = [self.segments[a] for a in assets if a in self.segments] if assets else all_segments
+        n_docs = sum(len(s.docs) for s in all_segments)
+        if n_docs == 0 or not segments:
+            return []
+        avgdl = sum(float(s.doc_len.sum()) for s in all_segments) / n_docs
+        df = {t: sum(len(s.postings(t)[0]) for s in all_segments) for t in terms}
+
+        hits = []
+        for seg in segments:
+            scores = np.zeros(len(seg.docs), dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * seg.doc_len / max(avgdl, 1e-6))
+            for t in terms:
+                if not df[t]:
+                    continue
+                docs, tf = seg.postings(t)
+                if not len(docs):
+                    continue
+                idf = math.log(1 + (n_docs - df[t] + 0.5) / (df[t] + 0.5))
+                tf = tf.astype(np.float32)
+                scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+            matched = np.flatnonzero(scores)
+            if not len(matched):
+                continue
+            if len(matched) > top_k:
+                matched = matched[np.argpartition(scores[matched], -top_k)[-top_k:]]
+            for i in matched:
+                hits.append((float(scores[i]), seg, int(i)))
+
+        hits.sort(key=lambda h: h[0], reverse=True)
+        results = []
+        for score, seg, i in hits[:top_k]:
+            results.append({
+                "bm25": round(score, 4),
+                "doc": seg.docs[i],
+                "vector": seg.vectors[i] if seg.vectors is not None else None,
+            })
+        return results
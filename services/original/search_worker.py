@@ -1,23 +1,110 @@
+import time
+import json
 import torch
+import numpy as np
 import yaml
 import logging
+from collections import OrderedDict
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-from pymilvus import connections, Collection
 from transformers import CLIPProcessor, CLIPModel
+from services.original.lexical_index import LexicalIndex
+from services.original.vector_store import create_vector_store, filter_expr, matches_filters
+from core.registry_store import create_registry_store
 
 # Standardized English logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - [Worker] - %(levelname)s - %(message)s')
 logger = logging.getLogger("SearchWorker")
 
+DEFAULT_SEARCH_CONFIG = {
+    "candidate_factor": 5,           # over-fetch when only soft scoring applies
+    "min_candidates": 100,           # floor for the unfiltered over-fetch
+    "filtered_candidate_factor": 2,  # over-fetch inside a hard-filtered subset
+    "hard_filters": True,
+    "page_window": 1,                # PDF pages kept around a requested page
+    "time_window": 60,               # video seconds kept around a requested timestamp
+    "catalog_ttl": 60,               # seconds between asset-name catalog refreshes
+    "rerank_depth_factor": 2,        # per-list ranks kept for fusion (x top_k)
+    "coalesce": True,                # merge neighbouring hits into one evidence segment
+    "coalesce_window": 30,           # video seconds one merged segment may span
+    "coalesce_bbox_overlap": 0.1,    # PDF: intersection / smaller box area to merge on the same page
+    "coalesce_max_members": 8,
+}
+
+# Records whose content_ref is a URL rather than text
+MEDIA_TYPES = ("image", "image_frame")
+# Shortest suffix/prefix overlap treated as a repeated transcript window
+MIN_TEXT_OVERLAP = 8
+
+# Soft-scoring weights; overridden by strategies.yaml retrieval_preferences
+DEFAULT_BONUS_WEIGHTS = {
+    "asset_match_bonus": 0.40,
+    "modality_match_bonus": 0.20,
+    "page_match_bonus": 0.45,        # exact page (PDF) / second (video) match
+    "content_match_bonus": 0.15,     # query appears verbatim in the record text
+    "transcript_bonus": 0.05,
+    "heading_bonus": 0.10,
+}
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _fusion_key(entity) -> tuple:
+    # Milvus ids are not known to the lexical index, so fuse on the record's identity
+    return (entity.get("asset_name"), entity.get("content_type"), entity.get("timestamp"), entity.get("content_ref"))
+
+
+def _parse_bbox(raw) -> Optional[List[float]]:
+    try:
+        box = json.loads(raw) if isinstance(raw, str) else raw
+        if isinstance(box, (list, tuple)) and len(box) == 4:
+            return [float(v) for v in box]
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _bbox_overlap(a: List[float], b: List[float]) -> float:
+    """Intersection over the smaller box's area."""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return w * h / smaller if smaller > 0 else 0.0
+
+
+def _join_texts(texts: List[str]) -> str:
+    """Concatenate member texts, dropping repeats and the overlap between adjacent transcript windows."""
+    merged = ""
+    for text in texts:
+        text = text.strip()
+        if not text or text in merged:
+            continue
+        k = min(len(merged), len(text))
+        while k >= MIN_TEXT_OVERLAP and not merged.endswith(text[:k]):
+            k -= 1
+        merged = merged + text[k:] if k >= MIN_TEXT_OVERLAP else "\n".join(filter(None, [merged, text]))
+    return merged
+
+
 class AcademicSearchWorker:
-    def __init__(self, config_path="configs/model_config.yaml", milvus_config="configs/milvus_config.yaml"):
+    def __init__(self, config_path="configs/model_config.yaml", milvus_config="configs/milvus_config.yaml",
+                 strategies_config="configs/strategies.yaml"):
         self.project_root = Path(__file__).resolve().parent.parent.parent
         
         with open(self.project_root / config_path, 'r', encoding='utf-8') as f:
             self.model_cfg = yaml.safe_load(f)
         with open(self.project_root / milvus_config, 'r', encoding='utf-8') as f:
             self.db_cfg = yaml.safe_load(f)
+        with open(self.project_root / strategies_config, 'r', encoding='utf-8') as f:
+            strategies = yaml.safe_load(f) or {}
+        self.weights = dict(DEFAULT_BONUS_WEIGHTS, **(strategies.get('retrieval_preferences', {}) or {}))
 
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         
@@ -25,100 +112,358 @@ class AcademicSearchWorker:
         self.model = CLIPModel.from_pretrained(model_path).to(self.device)
         self.processor = CLIPProcessor.from_pretrained(model_path)
         
-        conn = self.db_cfg['connection']
-        connections.connect("default", host=conn['host'], port=conn['port'])
-        self.collection = Collection(self.db_cfg['collection']['name'])
-        self.collection.load()
-        logger.info("SearchWorker initialized: CLIP model and Milvus collection loaded.")
+        # Milvus or the embedded npy-shard store, per milvus_config.yaml backend
+        self.store = create_vector_store(self.db_cfg, self.project_root)
 
-    def _encode_query(self, query: str) -> List[float]:
-        inputs = self.processor(text=[query], return_tensors="pt", padding=True, truncation=True).to(self.device)
+        # Query-embedding LRU keyed by normalized text (CLIP's tokenizer lower-cases anyway)
+        service_cfg = self.model_cfg.get('search_service', {}) or {}
+        self.embedding_cache_size = int(service_cfg.get('embedding_cache_size', 2048))
+        self.embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+
+        # Preference push-down: hard filters are evaluated inside the vector store
+        self.search_cfg = dict(DEFAULT_SEARCH_CONFIG, **(self.db_cfg.get('search', {}) or {}))
+        self._catalog: List[str] = []
+        self._catalog_at = 0.0
+
+        # BM25 index over text records, written by milvus_ingest; fused with vector candidates
+        lex_cfg = self.model_cfg.get('lexical_index', {}) or {}
+        self.lexical = None
+        if lex_cfg.get('enabled', False):
+            self.lexical = LexicalIndex(self.project_root / lex_cfg.get('index_dir', 'storage/lexical_index'),
+                                        k1=lex_cfg.get('k1', 1.2), b=lex_cfg.get('b', 0.75))
+        logger.info(f"SearchWorker initialized: CLIP model and {type(self.store).__name__} loaded.")
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _cached_encode(self, queries: List[str]) -> List[List[float]]:
+        """Encode only the queries missing from the LRU, in one batch."""
+        keys = [self._normalize_query(q) for q in queries]
+        missing = list(dict.fromkeys(k for k in keys if k not in self.embedding_cache))
+        self.embedding_misses += len(missing)
+        self.embedding_hits += len(keys) - len(missing)
+        if missing:
+            for key, vector in zip(missing, self._encode_queries(missing)):
+                self.embedding_cache[key] = vector
+        vectors = []
+        for key in keys:
+            self.embedding_cache.move_to_end(key)
+            vectors.append(self.embedding_cache[key])
+        while len(self.embedding_cache) > self.embedding_cache_size:
+            self.embedding_cache.popitem(last=False)
+        return vectors
+
+    def embedding_cache_stats(self) -> Dict[str, int]:
+        return {"size": len(self.embedding_cache), "hits": self.embedding_hits, "misses": self.embedding_misses}
+
+    def _encode_queries(self, queries: List[str]) -> List[List[float]]:
+        # One CLIP forward pass for all sub-queries
+        inputs = self.processor(text=queries, return_tensors="pt", padding=True, truncation=True).to(self.device)
         with torch.no_grad():
             text_features = self.model.get_text_features(**inputs)
             if hasattr(text_features, "pooler_output"):
                 text_features = text_features.pooler_output
             # L2 Normalization for IP (Inner Product) consistency
             text_features = text_features / text_features.norm(p=2, dim=-1, keepdim=True)
-            return text_features.cpu().numpy()[0].tolist()
+            return text_features.cpu().numpy().tolist()
 
-    def search(self, query: str, preferences: Optional[Dict] = None, top_k: int = 10) -> List[Dict[str, Any]]:
-        query_vector = self._encode_query(query)
-        search_params = {"metric_type": "IP", "params": {"nprobe": 12}}
-        
-        # Candidate expansion for soft-scoring (5x top_k)
-        candidates = self.collection.search(
-            data=[query_vector],
-            anns_field="vector", 
-            param=search_params,
-            limit=top_k * 5,  
-            output_fields=["asset_name", "modality", "content_type", "content_ref", "coordinates", "timestamp"]
-        )
-
-        formatted_results = []
-        query_lower = query.lower()
-        
-        for hit in candidates[0]:
-            base_score = float(hit.score)
-            bonus = 0.0
-            
-            entity = hit.entity
-            asset_name = entity.get("asset_name", "")
-            modality = entity.get("modality", "")
-            timestamp = entity.get("timestamp")
-            content = entity.get("content_ref") or ""
-            c_type = entity.get("content_type", "")
-
-            if preferences:
-                # 1. Asset Name Match (High Priority)
-                pref_asset = preferences.get("asset_name")
-                if pref_asset and pref_asset.lower() in asset_name.lower():
-                    bonus += 0.40
-                
-                # 2. Modality Preference
-                pref_mod = preferences.get("modality")
-                if pref_mod and pref_mod == modality:
-                    bonus += 0.20
-                
-                # 3. Precise Page/Timestamp Match
-                # Note: For PDF, timestamp field stores the page number
-                pref_time = preferences.get("timestamp")
-                if pref_time is not None:
-                    try:
-                        if abs(float(timestamp) - float(pref_time)) < 0.01:
-                            bonus += 0.45 # Strongest signal for specific page/time
-                    except (TypeError, ValueError):
-                        pass
-
-            # 4. Content Heuristics
-            if query_lower in content.lower(): 
-                bonus += 0.15
-            
-            # 5. Type-specific boosts
-            if modality == "video" and c_type == "transcript_context":
-                bonus += 0.05
-            elif modality == "pdf" and c_type in ["heading", "title"]:
-                bonus += 0.10
-
-            final_score = base_score + bonus
-
-            formatted_results.append({
-                "score": round(float(final_score), 4),
-                "base_vector_score": round(base_score, 4),
-                "content": content,
-                "metadata": {
-                    "asset_name": asset_name,
-                    "modality": modality,
-                    "type": c_type,
-                    "bbox": entity.get("coordinates"),
-                    "timestamp": float(timestamp) if modality == "video" else None,
-                    "page_label": int(float(timestamp)) if modality == "pdf" else None
+    def _encode_query(self, query: str) -> List[float]:
+        return self._encode_queries([query])[0]
+
+    # --- Vectorized soft scoring ---
+
+    @staticmethod
+    def _columns(entities: List[Any]) -> Dict[str, np.ndarray]:
+        """Candidate fields as column arrays (one pass over the hits)."""
+        return {
+            "asset_name": np.array([e.get("asset_name") or "" for e in entities], dtype=object),
+            "modality": np.array([e.get("modality") or "" for e in entities], dtype=object),
+            "content_type": np.array([e.get("content_type") or "" for e in entities], dtype=object),
+            "content": np.array([e.get("content_ref") or "" for e in entities], dtype=str),
+            "timestamp": np.array([_to_float(e.get("timestamp")) for e in entities], dtype=np.float64),
+        }
+
+    def _boosted_scores(self, cols: Dict[str, np.ndarray], base: np.ndarray, query_lower: str,
+                        preferences: Optional[Dict]) -> np.ndarray:
+        """base vector score + preference / content / type bonuses, all as boolean masks"""
+        w = self.weights
+        bonus = np.zeros_like(base)
+        if preferences:
+            # 1. Asset name match: substring test once per distinct asset
+            pref_asset = preferences.get("asset_name")
+            if pref_asset:
+                names, inverse = np.unique(cols["asset_name"].astype(str), return_inverse=True)
+                matched = np.array([pref_asset.lower() in n.lower() for n in names], dtype=bool)
+                bonus += w["asset_match_bonus"] * matched[inverse]
+            # 2. Modality preference
+            pref_mod = preferences.get("modality")
+            if pref_mod:
+                bonus += w["modality_match_bonus"] * (cols["modality"] == pref_mod)
+            # 3. Precise page/timestamp match (PDF timestamp stores the page number)
+            pref_time = _to_float(preferences.get("timestamp"))
+            if not np.isnan(pref_time):
+                with np.errstate(invalid="ignore"):
+                    bonus += w["page_match_bonus"] * (np.abs(cols["timestamp"] - pref_time) < 0.01)
+        # 4. Content heuristics
+        if query_lower and len(base):
+            bonus += w["content_match_bonus"] * (np.char.find(np.char.lower(cols["content"]), query_lower) >= 0)
+        # 5. Type-specific boosts
+        is_video, is_pdf = cols["modality"] == "video", cols["modality"] == "pdf"
+        bonus += w["transcript_bonus"] * (is_video & (cols["content_type"] == "transcript_context"))
+        bonus += w["heading_bonus"] * (is_pdf & np.isin(cols["content_type"], ["heading", "title"]))
+        return base + bonus
+
+    @staticmethod
+    def _format_hit(entity, score: float, base_score: float) -> Dict[str, Any]:
+        modality = entity.get("modality", "")
+        timestamp = entity.get("timestamp")
+        return {
+            "score": round(float(score), 4),
+            "base_vector_score": round(float(base_score), 4),
+            "content": entity.get("content_ref") or "",
+            "metadata": {
+                "asset_name": entity.get("asset_name", ""),
+                "modality": modality,
+                "type": entity.get("content_type", ""),
+                "bbox": entity.get("coordinates"),
+                "timestamp": float(timestamp) if modality == "video" else None,
+                "page_label": int(float(timestamp)) if modality == "pdf" else None
+            }
+        }
+
+    def _rank_vector_hits(self, hits, query_lower: str, preferences: Optional[Dict], depth: int) -> list:
+        """Re-rank one query's candidates; only the top `depth` are materialized as result dicts."""
+        entities = [hit.entity for hit in hits]
+        if not entities:
+            return []
+        base = np.array([hit.score for hit in hits], dtype=np.float64)
+        scores = self._boosted_scores(self._columns(entities), base, query_lower, preferences)
+        if len(scores) > depth:
+            top = np.argpartition(-scores, depth - 1)[:depth]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(_fusion_key(entities[i]), self._format_hit(entities[i], scores[i], base[i]), None) for i in top]
+
+    # --- Hard preference filters ---
+
+    def _asset_catalog(self) -> List[str]:
+        """Ready asset ids from the asset registry, cached for catalog_ttl seconds."""
+        if time.monotonic() - self._catalog_at < self.search_cfg['catalog_ttl']:
+            return self._catalog
+        try:
+            backend = ((self.model_cfg.get('pipeline', {}) or {}).get('registry', {}) or {}).get('backend', 'sqlite')
+            # Read-only: the web process owns schema creation and the legacy JSON migration
+            store = create_registry_store(self.project_root / "storage", backend, read_only=True)
+            try:
+                # Deduplicated assets have no vectors under their own name, so filtering on them finds nothing
+                self._catalog = [r['asset_id'] for r in store.find_by_status("Ready") if not r.get('duplicate_of')]
+            finally:
+                store.close()
+        except FileNotFoundError:
+            self._catalog = []
+        except Exception as e:
+            logger.warning(f"Asset catalog unavailable, asset filter stays soft: {e}")
+        self._catalog_at = time.monotonic()
+        return self._catalog
+
+    def _build_filters(self, preferences: Optional[Dict]) -> Dict[str, Any]:
+        """
+        Resolve preferences into hard filters. The asset preference is an LLM guess, so it only
+        becomes a filter when it matches known assets; page/time windows only apply within an asset.
+        """
+        filters: Dict[str, Any] = {}
+        if not preferences or not self.search_cfg['hard_filters']:
+            return filters
+        pref_mod = preferences.get("modality")
+        if pref_mod in ("pdf", "video"):
+            filters["modality"] = pref_mod
+        pref_asset = preferences.get("asset_name")
+        if isinstance(pref_asset, str) and pref_asset.strip() and pref_asset.lower() != "null":
+            assets = [a for a in self._asset_catalog() if pref_asset.lower() in a.lower()]
+            if assets:
+                filters["assets"] = assets
+        pref_time = preferences.get("timestamp")
+        if filters.get("assets") and pref_time is not None:
+            try:
+                t = float(pref_time)
+                filters["windows"] = {
+                    "pdf": (t - self.search_cfg['page_window'], t + self.search_cfg['page_window']),
+                    "video": (t - self.search_cfg['time_window'], t + self.search_cfg['time_window']),
                 }
-            })
+            except (TypeError, ValueError):
+                pass
+        return filters
+
+    def _vector_search(self, query_vectors: List[List[float]], limit: int, filters: Dict[str, Any],
+                       ann_params: Optional[Dict[str, Any]] = None):
+        # ann_params: per-request nprobe / ef / search_list override of the index profile
+        return self.store.search(query_vectors, limit, filters, ann_params)
 
-        # Re-sort based on boosted scores
-        formatted_results = sorted(formatted_results, key=lambda x: x['score'], reverse=True)
+    def search(self, query: Optional[str] = None, preferences: Optional[Dict] = None, top_k: int = 10,
+               queries: Optional[List[str]] = None, rrf_k: int = 60,
+               ann_params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Multi-query hybrid search: all sub-queries are encoded in one batch and sent as a single
+        multi-vector store search; each query also runs a BM25 lookup so exact terms outside the
+        vector top-k are still found. All per-query rankings are merged with reciprocal-rank fusion.
+        ann_params overrides the index profile's search params for this request (e.g. {"ef": 128}).
+        """
+        queries = [q for q in (queries or [query]) if q]
+        if not queries:
+            return []
+        query_vectors = self._cached_encode(queries)
+
+        # Hard preferences narrow the scanned subset, so less over-fetch is needed there
+        filters = self._build_filters(preferences)
+        candidates = None
+        if filters:
+            candidates = self._vector_search(query_vectors, top_k * self.search_cfg['filtered_candidate_factor'], filters, ann_params)
+            if min(len(hits) for hits in candidates) < top_k:
+                # Filter too narrow (or wrong guess): fall back to soft scoring over the full collection
+                logger.info(f"Filtered search under-filled ({filter_expr(filters)}), retrying unfiltered.")
+                filters, candidates = {}, None
+        if candidates is None:
+            limit = max(top_k * self.search_cfg['candidate_factor'], self.search_cfg['min_candidates'])
+            candidates = self._vector_search(query_vectors, limit, {}, ann_params)
+
+        depth = max(1, top_k * self.search_cfg['rerank_depth_factor'])
+        ranked_lists = []
+        for qi, (q, hits, q_vec) in enumerate(zip(queries, candidates, query_vectors)):
+            # Re-sort each query's list by its boosted score before fusing
+            ranked_lists.append((qi, self._rank_vector_hits(hits, q.lower(), preferences, depth)))
+            if self.lexical is not None:
+                ranked_lists.append((qi, self._lexical_ranking(q, q_vec, preferences, top_k * 5, filters)))
+
+        fused: Dict[Any, Dict[str, Any]] = {}
+        for qi, ranked in ranked_lists:
+            for rank, (key, result, bm25) in enumerate(ranked, start=1):
+                entry = fused.get(key)
+                if entry is None:
+                    entry = fused[key] = dict(result, rrf_score=0.0, matched_queries=set())
+                elif result['score'] > entry['score']:
+                    entry.update(score=result['score'], base_vector_score=result['base_vector_score'])
+                if bm25 is not None:
+                    entry['bm25_score'] = max(bm25, entry.get('bm25_score', 0.0))
+                entry['rrf_score'] += 1.0 / (rrf_k + rank)
+                entry['matched_queries'].add(qi)
+
+        formatted_results = sorted(fused.values(), key=lambda x: (x['rrf_score'], x['score']), reverse=True)
+        for r in formatted_results:
+            r['rrf_score'] = round(r['rrf_score'], 6)
+            r['matched_queries'] = len(r['matched_queries'])
+        if self.search_cfg['coalesce']:
+            # Coalesce over the whole fused pool so top_k counts distinct segments
+            return self._coalesce(formatted_results, top_k)
         return formatted_results[:top_k]
 
+    # --- Temporal / spatial coalescing ---
+
+    def _joins(self, segment: Dict[str, Any], hit: Dict[str, Any]) -> bool:
+        """Same video within coalesce_window seconds, or same PDF page with an overlapping bbox."""
+        lead, meta = segment["leader"]["metadata"], hit["metadata"]
+        if len(segment["members"]) >= self.search_cfg['coalesce_max_members']:
+            return False
+        if meta.get("asset_name") != lead.get("asset_name") or meta.get("modality") != lead.get("modality"):
+            return False
+        if meta.get("modality") == "video" and meta.get("timestamp") is not None:
+            t = meta["timestamp"]
+            return max(segment["end"], t) - min(segment["start"], t) <= self.search_cfg['coalesce_window']
+        if meta.get("modality") == "pdf" and meta.get("page_label") == lead.get("page_label"):
+            box = _parse_bbox(meta.get("bbox"))
+            return box is not None and any(_bbox_overlap(box, b) >= self.search_cfg['coalesce_bbox_overlap']
+                                           for b in segment["boxes"])
+        return False
+
+    def _coalesce(self, ranked: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Greedy merge in fused-rank order: each hit joins the first compatible segment or opens a
+        new one. Once top_k segments exist, remaining hits may only join existing segments.
+        """
+        segments: List[Dict[str, Any]] = []
+        for hit in ranked:
+            target = next((seg for seg in segments if self._joins(seg, hit)), None)
+            meta = hit["metadata"]
+            locator = meta.get("timestamp") if meta.get("modality") == "video" else meta.get("page_label")
+            if target is None:
+                if len(segments) >= top_k:
+                    continue
+                target = {"leader": hit, "members": [], "boxes": [], "start": locator, "end": locator}
+                segments.append(target)
+            target["members"].append(hit)
+            box = _parse_bbox(meta.get("bbox"))
+            if box is not None:
+                target["boxes"].append(box)
+            if locator is not None:
+                target["start"] = locator if target["start"] is None else min(target["start"], locator)
+                target["end"] = locator if target["end"] is None else max(target["end"], locator)
+        return [self._segment_result(seg) for seg in segments]
+
+    @staticmethod
+    def _segment_result(segment: Dict[str, Any]) -> Dict[str, Any]:
+        """The leader hit carries the segment; merged fields keep span, best scores and member refs."""
+        members = segment["members"]
+        if len(members) == 1:
+            return members[0]
+        result = dict(segment["leader"])
+        result["score"] = max(m["score"] for m in members)
+        result["base_vector_score"] = max(m["base_vector_score"] for m in members)
+        result["matched_queries"] = max(m["matched_queries"] for m in members)
+        bm25 = [m["bm25_score"] for m in members if "bm25_score" in m]
+        if bm25:
+            result["bm25_score"] = max(bm25)
+
+        modality = result["metadata"].get("modality")
+        ordered = sorted(members, key=lambda m: m["metadata"].get("timestamp") or 0) if modality == "video" else \
+            sorted(members, key=lambda m: (_parse_bbox(m["metadata"].get("bbox")) or [0, 0])[1])
+        texts = [m["content"] for m in ordered if m["metadata"].get("type") not in MEDIA_TYPES]
+        metadata = dict(result["metadata"], span=[segment["start"], segment["end"]])
+        joined = _join_texts(texts)
+        if joined:
+            result["content"] = joined
+            if metadata.get("type") in MEDIA_TYPES:
+                # Content is no longer the leader's URL (kept in members); don't pose as a media hit
+                metadata["type"] = "segment"
+        if segment["boxes"]:
+            boxes = np.array(segment["boxes"])
+            metadata["bbox"] = json.dumps([*boxes[:, :2].min(axis=0).tolist(), *boxes[:, 2:].max(axis=0).tolist()])
+        result["metadata"] = metadata
+        # Text members are already folded into content; media members keep their URL
+        members = [{
+            "type": m["metadata"].get("type"),
+            "timestamp": m["metadata"].get("timestamp"),
+            "page_label": m["metadata"].get("page_label"),
+            "score": m["score"],
+            "ref": m["content"] if m["metadata"].get("type") in MEDIA_TYPES else None,
+        } for m in ordered]
+        result["members"] = [{k: v for k, v in m.items() if v is not None} for m in members]
+        return result
+
+    def _lexical_ranking(self, query: str, query_vector: List[float], preferences: Optional[Dict], limit: int,
+                         filters: Optional[Dict[str, Any]] = None) -> list:
+        """BM25 candidates in BM25 order; vector score recomputed from the stored float16 embedding."""
+        filters = filters or {}
+        try:
+            lexical_hits = self.lexical.search(query, top_k=limit, assets=filters.get("assets"))
+        except Exception as e:
+            logger.warning(f"Lexical search failed, vector results only: {e}")
+            return []
+        if filters:
+            lexical_hits = [h for h in lexical_hits if matches_filters(h["doc"], filters)]
+        if not lexical_hits:
+            return []
+        q_vec = np.asarray(query_vector, dtype=np.float32)
+        entities = [h["doc"] for h in lexical_hits]
+        base = np.array([float(np.dot(h["vector"].astype(np.float32), q_vec)) if h["vector"] is not None else 0.0
+                         for h in lexical_hits], dtype=np.float64)
+        scores = self._boosted_scores(self._columns(entities), base, query.lower(), preferences)
+        # Order stays BM25; the boosted score only feeds the fused entry
+        return [(_fusion_key(e), self._format_hit(e, scores[i], base[i]), h["bm25"])
+                for i, (e, h) in enumerate(zip(entities, lexical_hits))]
+
 if __name__ == "__main__":
     # Internal test logic
     worker = AcademicSearchWorker()
\ No newline at end of file
@@ -0,0 +1,480 @@
+import os
+import json
+import uuid
+import shutil
+import fcntl
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.original.lexical_index import DOC_FIELDS
+from services.original.index_profiles import resolve_index_profile, build_index_params, build_search_params, VECTOR_INDEX_NAME
+
+logger = logging.getLogger("VectorStore")
+
+OUTPUT_FIELDS = ["asset_name", "modality", "content_type", "content_ref", "coordinates", "timestamp"]
+
+DEFAULT_LOCAL_CONFIG = {
+    "path": "storage/vector_store",
+    "dtype": "float16",        # float16 halves disk / page cache; scores are computed in float32
+    "ivf": {
+        "enabled": True,
+        "min_rows": 50000,     # below this (or inside a narrow filter) search is exact brute force
+        "nlist": 256,
+        "nprobe": 16,
+        "train_sample": 65536,
+        "train_iters": 10,
+        "retrain_growth": 2.0,  # retrain centroids once the collection doubles
+    },
+}
+
+
+# --- Scalar filters (shared by every backend and by lexical hits) ---
+
+def quote(value: str) -> str:
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def filter_expr(filters: Dict[str, Any]) -> Optional[str]:
+    """Hard filters as a Milvus boolean expression."""
+    clauses = []
+    if filters.get("assets"):
+        clauses.append(f"asset_name in [{', '.join(quote(a) for a in filters['assets'])}]")
+    if filters.get("modality"):
+        clauses.append(f"modality == {quote(filters['modality'])}")
+    if filters.get("windows"):
+        mods = [filters["modality"]] if filters.get("modality") else list(filters["windows"])
+        ranges = [f'(modality == "{m}" and timestamp >= {lo} and timestamp <= {hi})'
+                  for m, (lo, hi) in filters["windows"].items() if m in mods]
+        clauses.append(f"({' or '.join(ranges)})")
+    return " and ".join(clauses) if clauses else None
+
+
+def matches_filters(entity: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """The same filters evaluated on a single record."""
+    if filters.get("assets") and entity.get("asset_name") not in filters["assets"]:
+        return False
+    if filters.get("modality") and entity.get("modality") != filters["modality"]:
+        return False
+    window = (filters.get("windows") or {}).get(entity.get("modality"))
+    if filters.get("windows"):
+        try:
+            return window is not None and window[0] <= float(entity.get("timestamp")) <= window[1]
+        except (TypeError, ValueError):
+            return False
+    return True
+
+
+def _timestamp(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class VectorHit:
+    """Backend-neutral hit with the attributes the search worker reads from Milvus hits."""
+    __slots__ = ("id", "score", "entity")
+
+    def __init__(self, id: int, score: float, entity: Dict[str, Any]):
+        self.id = id
+        self.score = score
+        self.entity = entity
+
+
+class VectorStore(ABC):
+    """
+    Vector store interface: ingest writes one asset's rows at a time, the search worker
+    runs multi-vector searches with optional hard filters (see filter_expr).
+    Rows are column lists in DOC_FIELDS order followed by the vectors.
+    """
+
+    @abstractmethod
+    def insert(self, data: List[list]) -> int:
+        ...
+
+    @abstractmethod
+    def delete_asset(self, asset_name: str):
+        ...
+
+    def flush(self):
+        pass
+
+    @abstractmethod
+    def search(self, query_vectors: List[List[float]], limit: int, filters: Optional[Dict[str, Any]] = None,
+               ann_params: Optional[Dict[str, Any]] = None) -> List[List[Any]]:
+        ...
+
+    def close(self):
+        pass
+
+
+class MilvusVectorStore(VectorStore):
+    """Milvus collection; hard filters become expr (and modality partitions when enabled)."""
+
+    def __init__(self, db_cfg: Dict[str, Any], writer: bool = False):
+        from pymilvus import connections, utility, Collection
+        self.db_cfg = db_cfg
+        self.c = db_cfg['collection']
+        self.vec_field = db_cfg['schema']['vec']
+        self.use_partitions = bool(self.c.get('partition_by_modality', False))
+        self.index_profile = resolve_index_profile(db_cfg)
+        self.metric_type = self.c.get('metric_type', "IP")
+
+        conn = db_cfg['connection']
+        connections.connect("default", host=conn['host'], port=conn['port'])
+        if writer and not utility.has_collection(self.c['name']):
+            self.collection = self._create_collection()
+        else:
+            self.collection = Collection(self.c['name'])
+            if writer:
+                self._check_vector_index()
+        if writer:
+            self._ensure_scalar_indexes()
+            # Modality partitions: searches with a modality preference scan one partition
+            if self.use_partitions:
+                for modality in ("pdf", "video"):
+                    if not self.collection.has_partition(modality):
+                        self.collection.create_partition(modality)
+        self.collection.load()
+        logger.info(f"Milvus collection {self.c['name']} loaded.")
+
+    def _create_collection(self):
+        from pymilvus import FieldSchema, CollectionSchema, DataType, Collection
+        s = self.db_cfg['schema']
+        fields = [
+            FieldSchema(name=s['pk'], dtype=DataType.INT64, is_primary=True, auto_id=True),
+            FieldSchema(name="asset_name", dtype=DataType.VARCHAR, max_length=500),
+            FieldSchema(name="modality", dtype=DataType.VARCHAR, max_length=50),
+            FieldSchema(name="content_type", dtype=DataType.VARCHAR, max_length=50),
+            FieldSchema(name="content_ref", dtype=DataType.VARCHAR, max_length=1000),
+            FieldSchema(name="timestamp", dtype=DataType.DOUBLE),
+            FieldSchema(name="coordinates", dtype=DataType.VARCHAR, max_length=500),
+            FieldSchema(name=self.vec_field, dtype=DataType.FLOAT_VECTOR, dim=self.c['dim'])
+        ]
+        schema = CollectionSchema(fields, "Unified Academic Assets with MinIO URLs")
+        collection = Collection(self.c['name'], schema)
+        collection.create_index(field_name=self.vec_field, index_params=build_index_params(self.index_profile, self.c['metric_type']),
+                                index_name=VECTOR_INDEX_NAME)
+        logger.info(f"Vector index profile '{self.index_profile['name']}' ({self.index_profile['index_type']}) created.")
+        return collection
+
+    def _check_vector_index(self):
+        """Existing collections are never re-indexed implicitly; warn when the profile changed."""
+        try:
+            current = next((idx.params.get('index_type') for idx in self.collection.indexes
+                            if idx.field_name == self.vec_field), None)
+            if current and current != self.index_profile['index_type']:
+                logger.warning(f"Vector index is {current} but profile '{self.index_profile['name']}' expects "
+                               f"{self.index_profile['index_type']}; run services/original/index_benchmark.py "
+                               f"--apply {self.index_profile['name']}")
+        except Exception as e:
+            logger.warning(f"Vector index check skipped: {e}")
+
+    def _ensure_scalar_indexes(self):
+        """Scalar indexes on the filter fields (skipped when present) so expr filters avoid full scans."""
+        for field, index_type in (self.db_cfg.get('scalar_indexes', {}) or {}).items():
+            index_name = f"idx_{field}"
+            try:
+                if self.collection.has_index(index_name=index_name):
+                    continue
+                self.collection.create_index(field_name=field, index_params={"index_type": index_type}, index_name=index_name)
+                logger.info(f"Scalar index {index_type} created on {field}.")
+            except Exception as e:
+                logger.warning(f"Scalar index on {field} not created: {e}")
+
+    def insert(self, data: List[list]) -> int:
+        # One asset has a single modality, so the whole batch goes to that partition
+        self.collection.insert(data, partition_name=data[1][0] if self.use_partitions else None)
+        return len(data[0])
+
+    def delete_asset(self, asset_name: str):
+        self.collection.delete(expr=f"asset_name == {quote(asset_name)}")
+
+    def flush(self):
+        self.collection.flush()
+
+    def search(self, query_vectors: List[List[float]], limit: int, filters: Optional[Dict[str, Any]] = None,
+               ann_params: Optional[Dict[str, Any]] = None):
+        filters = filters or {}
+        kwargs = {}
+        expr = filter_expr(filters)
+        if expr:
+            kwargs["expr"] = expr
+        if self.use_partitions and filters.get("modality"):
+            # _default keeps records ingested before partitioning was enabled searchable
+            kwargs["partition_names"] = [filters["modality"], "_default"]
+        return self.collection.search(
+            data=query_vectors,
+            anns_field=self.vec_field,
+            param=build_search_params(self.index_profile, self.metric_type, ann_params),
+            limit=min(limit, 16384),  # Milvus topk upper bound
+            output_fields=OUTPUT_FIELDS,
+            **kwargs
+        )
+
+
+class _Shard:
+    """One asset's rows: memory-mapped vectors plus a JSON metadata sidecar."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            self.meta: List[Dict[str, Any]] = json.load(f)
+        self.timestamps = np.load(path / "timestamp.npy", mmap_mode="r")
+
+    def __len__(self):
+        return len(self.meta)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Embedded store for Milvus-free installs: one shard per asset under root, swapped in via
+    manifest.json (same layout as the lexical index). Search is exact brute force over the
+    filtered rows; past ivf.min_rows an in-memory IVF (k-means centroids persisted to disk)
+    limits the scan to the nprobe closest lists.
+    """
+
+    def __init__(self, root: str, dim: int, metric_type: str = "IP", cfg: Optional[Dict[str, Any]] = None):
+        if metric_type != "IP":
+            raise ValueError(f"Local vector store supports metric_type IP only, got {metric_type}")
+        cfg = cfg or {}
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dim = int(dim)
+        self.dtype = np.dtype(cfg.get('dtype', DEFAULT_LOCAL_CONFIG['dtype']))
+        self.ivf_cfg = dict(DEFAULT_LOCAL_CONFIG['ivf'], **(cfg.get('ivf', {}) or {}))
+        self._manifest_mtime = None
+        self.shards: List[_Shard] = []
+        self._ivf = None
+
+    # --- writer side (milvus_ingest) ---
+
+    def _read_manifest(self) -> Dict[str, str]:
+        path = self.root / "manifest.json"
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _update_manifest(self, asset_name: str, shard: Optional[str]):
+        with open(self.root / "manifest.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = self._read_manifest()
+            old = manifest.pop(asset_name, None)
+            if shard:
+                manifest[asset_name] = shard
+            tmp = self.root / "manifest.json.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp, self.root / "manifest.json")
+        if old and old != shard:
+            shutil.rmtree(self.root / old, ignore_errors=True)
+
+    def insert(self, data: List[list]) -> int:
+        """Rows are grouped by asset; each asset's shard is rebuilt as a whole."""
+        vectors = np.asarray(data[len(DOC_FIELDS)], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dim {self.dim}, got shape {vectors.shape}")
+        rows = [dict(zip(DOC_FIELDS, r)) for r in zip(*data[:len(DOC_FIELDS)])]
+        by_asset: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            by_asset.setdefault(row["asset_name"], []).append(i)
+
+        for asset_name, idx in by_asset.items():
+            name = f"shard_{uuid.uuid4().hex[:12]}"
+            tmp = self.root / f"{name}.tmp"
+            tmp.mkdir(parents=True)
+            np.save(tmp / "vectors.npy", vectors[idx].astype(self.dtype))
+            np.save(tmp / "timestamp.npy", np.array([_timestamp(rows[i]["timestamp"]) for i in idx], dtype=np.float64))
+            with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+                json.dump([rows[i] for i in idx], f, ensure_ascii=False)
+            os.replace(tmp, self.root / name)
+            self._update_manifest(asset_name, name)
+        return len(rows)
+
+    def delete_asset(self, asset_name: str):
+        self._update_manifest(asset_name, None)
+
+    # --- reader side (search worker) ---
+
+    def refresh(self):
+        path = self.root / "manifest.json"
+        mtime = path.stat().st_mtime_ns if path.exists() else None
+        if mtime == self._manifest_mtime:
+            return
+        loaded = {s.path.name: s for s in self.shards}
+        shards = []
+        for asset_name, shard_name in self._read_manifest().items():
+            shard = loaded.get(shard_name)
+            if shard is None:
+                try:
+                    shard = _Shard(self.root / shard_name)
+                except Exception as e:
+                    logger.warning(f"Vector shard {shard_name} unreadable, skipped: {e}")
+                    continue
+            shards.append(shard)
+        self.shards = shards
+        self._manifest_mtime = mtime
+
+        # Global row ids: shard i owns [offsets[i], offsets[i + 1])
+        self.offsets = np.cumsum([0] + [len(s) for s in shards])
+        self.col_asset = np.array([m.get("asset_name") for s in shards for m in s.meta], dtype=object)
+        self.col_modality = np.array([m.get("modality") for s in shards for m in s.meta], dtype=object)
+        self.col_timestamp = np.concatenate([np.asarray(s.timestamps) for s in shards]) if shards else np.array([])
+        self._ivf = None
+        if self.ivf_cfg['enabled'] and self.offsets[-1] >= self.ivf_cfg['min_rows']:
+            self._ivf = self._build_ivf()
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Vectorized matches_filters over all rows; None means no filter."""
+        if not filters:
+            return None
+        mask = np.ones(int(self.offsets[-1]), dtype=bool)
+        if filters.get("assets"):
+            mask &= np.isin(self.col_asset, list(filters["assets"]))
+        if filters.get("modality"):
+            mask &= self.col_modality == filters["modality"]
+        if filters.get("windows"):
+            in_window = np.zeros_like(mask)
+            with np.errstate(invalid="ignore"):
+                for modality, (lo, hi) in filters["windows"].items():
+                    in_window |= (self.col_modality == modality) & (self.col_timestamp >= lo) & (self.col_timestamp <= hi)
+            mask &= in_window
+        return mask
+
+    def _gather(self, rows: np.ndarray) -> np.ndarray:
+        """float32 vectors for sorted global row ids."""
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        shard_of = np.searchsorted(self.offsets, rows, side="right") - 1
+        for si in np.unique(shard_of):
+            sel = shard_of == si
+            out[sel] = self.shards[si].vectors[rows[sel] - self.offsets[si]]
+        return out
+
+    def _iter_blocks(self, rows: Optional[np.ndarray], block: int = 65536):
+        """(row ids, float32 vectors) blocks, either all rows shard by shard or the given subset."""
+        if rows is None:
+            for si, shard in enumerate(self.shards):
+                for start in range(0, len(shard), block):
+                    vecs = np.asarray(shard.vectors[start:start + block], dtype=np.float32)
+                    yield np.arange(start, start + len(vecs)) + self.offsets[si], vecs
+        else:
+            for start in range(0, len(rows), block):
+                yield rows[start:start + block], self._gather(rows[start:start + block])
+
+    # IVF (inner product, spherical k-means)
+
+    def _build_ivf(self) -> Dict[str, Any]:
+        total = int(self.offsets[-1])
+        centroids = self._load_centroids(total)
+        if centroids is None:
+            centroids = self._train_centroids(total)
+        assign = np.empty(total, dtype=np.int32)
+        for rows, vecs in self._iter_blocks(None):
+            assign[rows] = np.argmax(vecs @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(len(centroids) + 1))
+        return {"centroids": centroids, "order": order, "bounds": bounds}
+
+    def _load_centroids(self, total: int) -> Optional[np.ndarray]:
+        try:
+            with open(self.root / "ivf_meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            centroids = np.load(self.root / "ivf_centroids.npy")
+        except (OSError, ValueError):
+            return None
+        if (len(centroids) != self.ivf_cfg['nlist'] or centroids.shape[1] != self.dim
+                or total >= meta.get("trained_rows", 0) * self.ivf_cfg['retrain_growth']):
+            return None
+        return centroids
+
+    def _train_centroids(self, total: int) -> np.ndarray:
+        nlist = min(int(self.ivf_cfg['nlist']), total)
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(total, size=min(total, int(self.ivf_cfg['train_sample'])), replace=False))
+        x = self._gather(sample)
+        centroids = x[rng.choice(len(x), size=nlist, replace=False)].copy()
+        for _ in range(int(self.ivf_cfg['train_iters'])):
+            labels = np.argmax(x @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, x)
+            counts = np.bincount(labels, minlength=nlist)
+            # Empty lists keep their previous centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / np.linalg.norm(sums[filled], axis=1, keepdims=True).clip(1e-12)
+        np.save(self.root / "ivf_centroids.tmp.npy", centroids)
+        os.replace(self.root / "ivf_centroids.tmp.npy", self.root / "ivf_centroids.npy")
+        with open(self.root / "ivf_meta.json", "w", encoding="utf-8") as f:
+            json.dump({"trained_rows": total, "nlist": nlist}, f)
+        logger.info(f"Local IVF trained: {nlist} lists over {total} vectors.")
+        return centroids
+
+    def _ivf_rows(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        ivf = self._ivf
+        probe = np.argsort(-(ivf["centroids"] @ q))[:nprobe]
+        rows = np.concatenate([ivf["order"][ivf["bounds"][c]:ivf["bounds"][c + 1]] for c in probe])
+        return np.sort(rows)
+
+    def _top_hits(self, candidates: List[tuple], limit: int) -> List[VectorHit]:
+        if not candidates:
+            return []
+        rows = np.concatenate([c[0] for c in candidates])
+        scores = np.concatenate([c[1] for c in candidates])
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        hits = []
+        for i in top:
+            row = int(rows[i])
+            si = int(np.searchsorted(self.offsets, row, side="right") - 1)
+            hits.append(VectorHit(row, float(scores[i]), self.shards[si].meta[row - self.offsets[si]]))
+        return hits
+
+    def search(self, query_vectors: List[List[float]], limit: int, filters: Optional[Dict[str, Any]] = None,
+               ann_params: Optional[Dict[str, Any]] = None) -> List[List[VectorHit]]:
+        self.refresh()
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dim)
+        if not self.shards or not len(queries):
+            return [[] for _ in range(len(queries))]
+        mask = self._filter_mask(filters or {})
+        subset = np.flatnonzero(mask) if mask is not None else None
+
+        # Narrow filters are cheaper (and exact) as brute force over the subset
+        if self._ivf is None or (subset is not None and len(subset) < self.ivf_cfg['min_rows']):
+            per_query = [[] for _ in range(len(queries))]
+            for rows, vecs in self._iter_blocks(subset):
+                scores = vecs @ queries.T
+                top = np.argpartition(-scores, min(limit, len(rows)) - 1, axis=0)[:limit]
+                for qi in range(len(queries)):
+                    per_query[qi].append((rows[top[:, qi]], scores[top[:, qi], qi]))
+            return [self._top_hits(c, limit) for c in per_query]
+
+        nprobe = int((ann_params or {}).get("nprobe", self.ivf_cfg['nprobe']))
+        results = []
+        for q in queries:
+            rows = self._ivf_rows(q, nprobe)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            candidates = [(r, v @ q) for r, v in self._iter_blocks(rows)]
+            results.append(self._top_hits(candidates, limit))
+        return results
+
+
+def create_vector_store(db_cfg: Dict[str, Any], project_root: Path, writer: bool = False) -> VectorStore:
+    """backend: milvus (default) | local, from milvus_config.yaml"""
+    backend = db_cfg.get('backend', 'milvus')
+    if backend == "milvus":
+        return MilvusVectorStore(db_cfg, writer=writer)
+    if backend == "local":
+        local_cfg = dict(DEFAULT_LOCAL_CONFIG, **(db_cfg.get('local', {}) or {}))
+        c = db_cfg['collection']
+        return LocalVectorStore(Path(project_root) / local_cfg['path'], dim=c['dim'],
+                                metric_type=c.get('metric_type', "IP"), cfg=local_cfg)
+    raise ValueError(f"Unknown vector store backend: {backend}")
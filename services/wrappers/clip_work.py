@@ -42,6 +42,7 @@ tqdm.tqdm = DisabledTqdm
 # 注入项目根目录
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 from core.assets_manager import AcademicAsset, AssetType
+from core.worker_pool import serve_stdio, SERVE_FLAG
 
 class CLIPWorker:
     def __init__(self, global_cfg_path="configs/model_config.yaml"):
@@ -225,10 +226,19 @@ class CLIPWorker:
             json.dump(results, f, ensure_ascii=False, indent=4)
         return len(results)
 
+# 常驻模式下复用已加载的 CLIP 模型
+_WORKER = None
+
+def get_worker() -> CLIPWorker:
+    global _WORKER
+    if _WORKER is None:
+        _WORKER = CLIPWorker()
+    return _WORKER
+
 def run_clip_work(asset: AcademicAsset):
     log_message("INFO", f"{'='*20} CLIP Task {asset.asset_id} Start {'='*20}")
     try:
-        worker = CLIPWorker()
+        worker = get_worker()
         if asset.asset_type == AssetType.PDF:
             count = worker._process_pdf(asset)
         elif asset.asset_type == AssetType.VIDEO:
@@ -244,12 +254,23 @@ def run_clip_work(asset: AcademicAsset):
         log_message("DEBUG", traceback.format_exc()) # 打印堆栈到日志文件
         return {"status": "error", "message": str(e)}
 
+def handle_job(data: dict) -> dict:
+    """单资产或 {"batch": [...]} 批量任务；批量时逐资产返回结果"""
+    if "batch" in data:
+        results = {}
+        for asset_data in data["batch"]:
+            asset_obj = AcademicAsset.from_dict(asset_data)
+            results[asset_obj.asset_id] = run_clip_work(asset_obj)
+        return {"status": "success", "results": results}
+    return run_clip_work(AcademicAsset.from_dict(data))
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if SERVE_FLAG in sys.argv:
+        get_worker()
+        serve_stdio(handle_job)
+    elif len(sys.argv) > 1:
         try:
-            asset_data = json.loads(sys.argv[1])
-            asset_obj = AcademicAsset.from_dict(asset_data)
-            print(json.dumps(run_clip_work(asset_obj)))
+            print(json.dumps(handle_job(json.loads(sys.argv[1]))))
         except Exception as e:
             log_message("ERROR", f"Entry point error: {e}")
             print(json.dumps({"status": "error", "message": str(e)}))
\ No newline at end of file
@@ -6,11 +6,14 @@ import traceback
 from pathlib import Path
 from datetime import datetime
 from minio import Minio
-from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
 
 # 注入项目根目录以加载 core 模块
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 from core.assets_manager import AcademicAsset, AssetType
+from core.worker_pool import serve_stdio, SERVE_FLAG
+from core.search_cache import bump_generation, DEFAULT_SEARCH_CACHE_CONFIG
+from services.original.lexical_index import LexicalIndex, LEXICAL_TYPES, DOC_FIELDS
+from services.original.vector_store import create_vector_store
 
 # --- 基础日志函数 ---
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
@@ -45,8 +48,16 @@ class MilvusIngestor:
             secure=False
         )
         self.bucket_name = "academic-assets"
-        self._setup_minio()
-        self._setup_milvus()
+        try:
+            self._setup_minio()
+        except Exception as e:
+            # 单机部署可不起 MinIO：图片 / 帧的引用退回本地文件名（与单次上传失败时一致）
+            log_message("WARNING", f"MinIO unavailable, assets keep local refs: {e}")
+            self.minio_client = None
+        self._setup_vector_store()
+        self.lexical = self._setup_lexical()
+        cache_cfg = (self.model_cfg.get('search_service', {}) or {}).get('result_cache', {}) or {}
+        self.generation_path = self.project_root / cache_cfg.get('generation_file', DEFAULT_SEARCH_CACHE_CONFIG['generation_file'])
 
     def _setup_minio(self):
         if not self.minio_client.bucket_exists(self.bucket_name):
@@ -63,37 +74,44 @@ class MilvusIngestor:
             self.minio_client.set_bucket_policy(self.bucket_name, json.dumps(policy))
             log_message("INFO", f"MinIO Bucket {self.bucket_name} initialized")
 
-    def _setup_milvus(self):
-        conn = self.db_cfg['connection']
-        connections.connect("default", host=conn['host'], port=conn['port'])
-        
-        c = self.db_cfg['collection']
-        s = self.db_cfg['schema']
-        
-        if not utility.has_collection(c['name']):
-            fields = [
-                FieldSchema(name=s['pk'], dtype=DataType.INT64, is_primary=True, auto_id=True),
-                FieldSchema(name="asset_name", dtype=DataType.VARCHAR, max_length=500),
-                FieldSchema(name="modality", dtype=DataType.VARCHAR, max_length=50),      
-                FieldSchema(name="content_type", dtype=DataType.VARCHAR, max_length=50),  
-                FieldSchema(name="content_ref", dtype=DataType.VARCHAR, max_length=1000), 
-                FieldSchema(name="timestamp", dtype=DataType.DOUBLE),               
-                FieldSchema(name="coordinates", dtype=DataType.VARCHAR, max_length=500),    
-                FieldSchema(name=s['vec'], dtype=DataType.FLOAT_VECTOR, dim=c['dim'])
-            ]
-            schema = CollectionSchema(fields, "Unified Academic Assets with MinIO URLs")
-            self.collection = Collection(c['name'], schema)
-            index_params = {"metric_type": c['metric_type'], "index_type": c['index_type'], "params": {"nlist": c['nlist']}}
-            self.collection.create_index(field_name=s['vec'], index_params=index_params)
-        else:
-            self.collection = Collection(c['name'])
-        
-        self.collection.load()
-        log_message("INFO", f"Milvus Collection {c['name']} loaded")
+    def _setup_vector_store(self):
+        # backend: milvus（建集合 / 索引 / 分区）或 local（npy 分片，无需 Milvus 服务）
+        self.store = create_vector_store(self.db_cfg, self.project_root, writer=True)
+        log_message("INFO", f"Vector store ready: {type(self.store).__name__}")
+
+    def _setup_lexical(self):
+        lex_cfg = self.model_cfg.get('lexical_index', {}) or {}
+        if not lex_cfg.get('enabled', False):
+            return None
+        return LexicalIndex(self.project_root / lex_cfg.get('index_dir', 'storage/lexical_index'),
+                            k1=lex_cfg.get('k1', 1.2), b=lex_cfg.get('b', 0.75))
+
+    def _index_lexical(self, asset: AcademicAsset, data):
+        """为该资产重建 BM25 段（只含文本与转写窗口），失败不影响向量入库"""
+        if self.lexical is None:
+            return
+        try:
+            docs, vectors = [], []
+            for row in zip(*data):
+                if row[2] not in LEXICAL_TYPES:
+                    continue
+                docs.append(dict(zip(DOC_FIELDS, row[:6])))
+                vectors.append(row[6])
+            self.lexical.add_segment(asset.asset_id, docs, vectors)
+            log_message("INFO", f"Lexical index: {len(docs)} text records for {asset.asset_id}.")
+        except Exception as e:
+            log_message("ERROR", f"Lexical index failed for {asset.asset_id}: {e}")
+
+    def bump_generation(self):
+        """向量库内容已变：使 Web 进程的检索结果缓存失效"""
+        try:
+            bump_generation(self.generation_path)
+        except OSError as e:
+            log_message("WARNING", f"Search generation not bumped: {e}")
 
     def _upload_file(self, local_path, remote_path):
         p = Path(local_path)
-        if not p.exists() or p.stat().st_size == 0:
+        if self.minio_client is None or not p.exists() or p.stat().st_size == 0:
             return None
         try:
             self.minio_client.fput_object(self.bucket_name, remote_path, str(p))
@@ -102,7 +120,7 @@ class MilvusIngestor:
             log_message("ERROR", f"MinIO upload fail: {e}")
             return None
 
-    def ingest_asset(self, asset: AcademicAsset):
+    def ingest_asset(self, asset: AcademicAsset, flush: bool = True):
         log_message("INFO", f"Processing Asset: {asset.asset_id} ({asset.asset_type.value})")
         
         if asset.asset_type == AssetType.PDF:
@@ -113,8 +131,13 @@ class MilvusIngestor:
             return {"status": "error", "message": "unsupported type"}
 
         if data and data[0]:
-            self.collection.insert(data)
-            self.collection.flush()
+            # 幂等入库：断点续跑或重试时先清理该资产的旧向量，避免重复
+            self.store.delete_asset(asset.asset_id)
+            self.store.insert(data)
+            if flush:
+                self.store.flush()
+            self._index_lexical(asset, data)
+            self.bump_generation()
             log_message("INFO", f"DONE: {asset.asset_id} ingestion complete, {len(data[0])} records.")
             return len(data[0])
         return 0
@@ -207,10 +230,19 @@ class MilvusIngestor:
         coords = ["null"] * len(names)
         return [names, modalities, types, refs, timestamps, coords, vecs]
 
+# 常驻模式下复用向量库连接与 MinIO 客户端
+_INGESTOR = None
+
+def get_ingestor() -> MilvusIngestor:
+    global _INGESTOR
+    if _INGESTOR is None:
+        _INGESTOR = MilvusIngestor()
+    return _INGESTOR
+
 def run_milvus_ingest(asset: AcademicAsset):
     log_message("INFO", f"--- Ingest Start: {datetime.now()} ---")
     try:
-        ingestor = MilvusIngestor()
+        ingestor = get_ingestor()
         count = ingestor.ingest_asset(asset)
         return {"status": "success", "asset_id": asset.asset_id, "vector_inserted": count}
     except Exception as e:
@@ -218,12 +250,44 @@ def run_milvus_ingest(asset: AcademicAsset):
         log_message("DEBUG", traceback.format_exc())
         return {"status": "error", "message": str(e)}
 
+def run_milvus_ingest_batch(assets):
+    """批量入库：逐资产插入，末尾统一 flush 一次"""
+    log_message("INFO", f"--- Batch Ingest Start ({len(assets)} assets): {datetime.now()} ---")
+    try:
+        ingestor = get_ingestor()
+    except Exception as e:
+        log_message("ERROR", f"Ingest Error: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+    results = {}
+    for asset in assets:
+        try:
+            count = ingestor.ingest_asset(asset, flush=False)
+            results[asset.asset_id] = {"status": "success", "asset_id": asset.asset_id, "vector_inserted": count}
+        except Exception as e:
+            log_message("ERROR", f"Ingest Error for {asset.asset_id}: {str(e)}")
+            log_message("DEBUG", traceback.format_exc())
+            results[asset.asset_id] = {"status": "error", "asset_id": asset.asset_id, "message": str(e)}
+    try:
+        ingestor.store.flush()
+        # 逐资产已递增过；flush 后数据才对检索完全可见，再递增一次，丢弃期间缓存的结果
+        ingestor.bump_generation()
+    except Exception as e:
+        log_message("ERROR", f"Flush Error: {str(e)}")
+        return {"status": "error", "message": f"Flush failed: {str(e)}"}
+    return {"status": "success", "results": results}
+
+def handle_job(data: dict) -> dict:
+    if "batch" in data:
+        return run_milvus_ingest_batch([AcademicAsset.from_dict(d) for d in data["batch"]])
+    return run_milvus_ingest(AcademicAsset.from_dict(data))
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if SERVE_FLAG in sys.argv:
+        serve_stdio(handle_job)
+    elif len(sys.argv) > 1:
         try:
-            asset_data = json.loads(sys.argv[1])
-            asset_obj = AcademicAsset.from_dict(asset_data)
-            print(json.dumps(run_milvus_ingest(asset_obj)))
+            print(json.dumps(handle_job(json.loads(sys.argv[1]))))
         except Exception as e:
             log_message("ERROR", f"Entry point error: {e}")
             print(json.dumps({"status": "error", "message": str(e)}))
\ No newline at end of file
@@ -8,9 +8,11 @@ from pathlib import Path
 PROJECT_ROOT = str(Path(__file__).resolve().parent.parent.parent)
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
-    from services.original.sandbox_worker import run_calculation
 
-def main():
+from services.original.sandbox_worker import run_calculation
+from core.worker_pool import serve_stdio, SERVE_FLAG
+
+def run_sandbox(params: dict) -> dict:
     CURRENT_DIR = Path(__file__).resolve().parent
     PROJECT_ROOT = CURRENT_DIR.parent.parent
     LOG_DIR = PROJECT_ROOT / "logs"
@@ -18,15 +20,12 @@ def main():
     
     log_file_path = LOG_DIR / "sandbox_inference.log"
 
-    input_str = sys.argv[1] if len(sys.argv) > 1 else "{}"
-    
     with open(log_file_path, "a", encoding="utf-8") as f:
         f.write(f"\n[{datetime.now()}] --- Sandbox Request Start ---\n")
-        f.write(f"Raw Input: {input_str}\n")
+        f.write(f"Raw Input: {json.dumps(params, ensure_ascii=False)}\n")
         f.flush()
 
         try:
-            params = json.loads(input_str)
             expr = params.get("expression", "")
             mode = params.get("mode", "eval")
             sym = params.get("symbol", "x")
@@ -50,7 +49,21 @@ def main():
         
         f.write(f"[{datetime.now()}] --- Sandbox Request End ---\n")
 
-    print(json.dumps(output))
+    return output
+
+def main():
+    if SERVE_FLAG in sys.argv:
+        serve_stdio(run_sandbox)
+        return
+
+    input_str = sys.argv[1] if len(sys.argv) > 1 else "{}"
+    try:
+        params = json.loads(input_str)
+    except Exception as e:
+        print(json.dumps({"status": "error", "message": str(e), "worker": "ScientificSandbox"}))
+        return
+
+    print(json.dumps(run_sandbox(params)))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
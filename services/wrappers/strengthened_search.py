@@ -6,61 +6,95 @@ PROJECT_ROOT = str(Path(__file__).resolve().parent.parent.parent)
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 from services.original.search_worker import AcademicSearchWorker
+from core.worker_pool import serve_stdio, serve_socket, SERVE_FLAG, SOCKET_FLAG
 
-def main():
-    # Setup Paths and Logging
-    PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
-    LOG_DIR = PROJECT_ROOT / "logs"
-    LOG_DIR.mkdir(exist_ok=True)
-    log_file_path = LOG_DIR / "strengthened_search.log"
-
-    # Redirect stderr/stdout to log file for traceability
-    log_file = open(log_file_path, "a", encoding="utf-8")
-    
-    def log_event(message):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+LOG_DIR = Path(PROJECT_ROOT) / "logs"
+LOG_DIR.mkdir(exist_ok=True)
+log_file_path = LOG_DIR / "strengthened_search.log"
+
+def log_event(message):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(log_file_path, "a", encoding="utf-8") as log_file:
         log_file.write(f"[{timestamp}] {message}\n")
-        log_file.flush()
 
-    if len(sys.argv) < 2:
-        error_msg = {"status": "error", "message": "No search parameters provided"}
-        print(json.dumps(error_msg))
-        return
+# 单次检索最多展开的子查询数（一次 CLIP 批量编码 + 一次多向量检索）
+MAX_QUERIES = 5
+
+# 常驻模式（进程池 / 本地 socket / Web 进程内）下复用 CLIP 模型、向量库句柄与查询向量缓存
+_WORKER = None
+
+def get_worker() -> AcademicSearchWorker:
+    global _WORKER
+    if _WORKER is None:
+        _WORKER = AcademicSearchWorker()
+    return _WORKER
 
+def run_search(raw_input: dict) -> dict:
     try:
-        # Expected input format from Refiner: 
-        # { "search_params": {...}, "preferences": {...}, "logic_intent": {...} }
-        raw_input = json.loads(sys.argv[1])
+        # Expected input format from Refiner:
+        # { "search_params": {"keywords": [...], "queries": [...], "top_k": 8, "ann_params": {...}}, "preferences": {...}, "logic_intent": {...} }
         search_params = raw_input.get("search_params", {})
         preferences = raw_input.get("preferences", {})
-        
-        # Extract refined keywords and top_k
+
+        # Extract refined keywords, sub-queries and top_k
         keywords = " ".join(search_params.get("keywords", []))
         top_k = search_params.get("top_k", 8)
-        
-        log_event(f"New Search Request: Keywords='{keywords}', Preferences={preferences}")
+        queries = search_params.get("queries") or raw_input.get("queries") or []
+        if isinstance(queries, str):
+            queries = [queries]
+        # Joined keywords stay as one more query; duplicates and blanks dropped
+        queries = list(dict.fromkeys(q.strip() for q in [*queries, keywords] if isinstance(q, str) and q.strip()))
+        queries = queries[:MAX_QUERIES]
+
+        log_event(f"New Search Request: Queries={queries}, Preferences={preferences}")
 
         # Execution
-        worker = AcademicSearchWorker()
+        worker = get_worker()
         results = worker.search(
-            query=keywords, 
-            preferences=preferences, 
-            top_k=top_k
+            queries=queries,
+            preferences=preferences,
+            top_k=top_k,
+            ann_params=search_params.get("ann_params")  # optional per-request nprobe / ef override
         )
-        
-        log_event(f"Search successful. Hits returned: {len(results)}")
-        
-        # Output result to stdout for the calling process
-        print(json.dumps({
+
+        log_event(f"Search successful. Hits returned: {len(results)}, embedding cache: {worker.embedding_cache_stats()}")
+        return {
             "status": "success",
             "results": results
-        }))
+        }
 
+    except Exception as e:
+        log_event(f"CRITICAL ERROR: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+def main():
+    if SERVE_FLAG in sys.argv:
+        get_worker()
+        serve_stdio(run_search)
+        return
+
+    if SOCKET_FLAG in sys.argv:
+        # 独立常驻的检索服务：python strengthened_search.py --socket storage/search_service.sock
+        idx = sys.argv.index(SOCKET_FLAG)
+        socket_path = sys.argv[idx + 1] if len(sys.argv) > idx + 1 else "storage/search_service.sock"
+        get_worker()
+        serve_socket(run_search, socket_path)
+        return
+
+    if len(sys.argv) < 2:
+        error_msg = {"status": "error", "message": "No search parameters provided"}
+        print(json.dumps(error_msg))
+        return
+
+    try:
+        raw_input = json.loads(sys.argv[1])
     except Exception as e:
         log_event(f"CRITICAL ERROR: {str(e)}")
         print(json.dumps({"status": "error", "message": str(e)}))
-    finally:
-        log_file.close()
+        return
+
+    # Output result to stdout for the calling process
+    print(json.dumps(run_search(raw_input)))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
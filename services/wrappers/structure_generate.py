@@ -1,12 +1,11 @@
-import os
 import sys
 import json
 import yaml
-import httpx
 import asyncio
 import dotenv
 import traceback
 from pathlib import Path
+from typing import AsyncContextManager, Optional
 from datetime import datetime
 
 # 加载环境变量
@@ -17,6 +16,8 @@ sys.path.append(str(PROJECT_ROOT))
 
 from core.assets_manager import AcademicAsset, AssetType
 from core.prompts_manager import PromptManager
+from core.llm_client import LLMClient
+from core.worker_pool import serve_stdio, SERVE_FLAG
 
 # --- 基础日志函数 ---
 LOG_DIR = PROJECT_ROOT / "logs"
@@ -51,10 +52,8 @@ class StructureGenerator:
         # 初始化 Prompt Manager
         self.prompt_manager = PromptManager()
         
-        # API 配置
-        llm_cfg = self.config.get("llm", {})
-        self.api_url = llm_cfg.get("api_url", "https://api.deepseek.com/v1/chat/completions")
-        self.api_key = os.getenv("DEEPSEEK_API_KEY")
+        # API 配置：进程内共享连接池（常驻模式下跨任务复用连接）
+        self.llm = LLMClient()
 
     def _extract_context(self, asset: AcademicAsset) -> str:
         """从处理后的文件中提取文本内容作为 LLM 上下文"""
@@ -87,12 +86,13 @@ class StructureGenerator:
 
         return ""
 
-    async def generate_outline(self, asset: AcademicAsset):
-        """渲染 Prompt 并调用 DeepSeek API"""
+    async def generate_outline(self, asset: AcademicAsset, gate: Optional[AsyncContextManager] = None):
+        """渲染 Prompt 并调用 DeepSeek API；gate 为准入许可，只覆盖实际发出的 HTTP 请求（缓存命中不占用）"""
         log_message("INFO", f"Starting structure generation for asset: {asset.asset_id}")
         
         try:
-            context = self._extract_context(asset)
+            # 大文件读取放到线程中，Web 进程内调用时不阻塞事件循环
+            context = await asyncio.to_thread(self._extract_context, asset)
             
             # 渲染 Prompt
             prompt = self.prompt_manager.render(
@@ -103,48 +103,41 @@ class StructureGenerator:
 
             log_message("INFO", f"Sending request to DeepSeek for asset: {asset.asset_id}")
             
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers={"Authorization": f"Bearer {self.api_key}"},
-                    json={
-                        "model": "deepseek-chat",
-                        "messages": [
-                            {"role": "system", "content": "You are a professional academic assistant. Return results in JSON format."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "response_format": {"type": "json_object"}
-                    }
-                )
-                response.raise_for_status()
-                res_data = response.json()
-                outline_content = json.loads(res_data['choices'][0]['message']['content'])
-                
-                # 确定保存路径
-                processed_root = Path(self.config['paths']['processed_storage'])
-                if asset.asset_type == AssetType.PDF:
-                    clean_id = asset.asset_id.replace(".pdf", "")
-                    save_dir = processed_root / "magic-pdf" / clean_id
-                else:
-                    save_dir = processed_root / "video" / asset.asset_id
-                save_dir.mkdir(parents=True, exist_ok=True)
-                save_path = save_dir / "summary_outline.json"
-                
-                result_payload = {
-                    "asset_id": asset.asset_id,
-                    "generated_at": datetime.now().isoformat(),
-                    "outline": outline_content
-                }
-                
-                with open(save_path, 'w', encoding='utf-8') as f:
-                    json.dump(result_payload, f, ensure_ascii=False, indent=4)
-                
-                log_message("INFO", f"Successfully generated outline for {asset.asset_id}. Saved to: {save_path}")
-                return {
-                    "status": "success",
-                    "save_path": str(save_path),
-                    "asset_id": asset.asset_id
-                }
+            res_data = await self.llm.chat({
+                "model": "deepseek-chat",
+                "messages": [
+                    {"role": "system", "content": "You are a professional academic assistant. Return results in JSON format."},
+                    {"role": "user", "content": prompt}
+                ],
+                "response_format": {"type": "json_object"}
+            }, template="structural_outline", gate=gate)
+            outline_content = json.loads(res_data['choices'][0]['message']['content'])
+            
+            # 确定保存路径
+            processed_root = Path(self.config['paths']['processed_storage'])
+            if asset.asset_type == AssetType.PDF:
+                clean_id = asset.asset_id.replace(".pdf", "")
+                save_dir = processed_root / "magic-pdf" / clean_id
+            else:
+                save_dir = processed_root / "video" / asset.asset_id
+            save_dir.mkdir(parents=True, exist_ok=True)
+            save_path = save_dir / "summary_outline.json"
+            
+            result_payload = {
+                "asset_id": asset.asset_id,
+                "generated_at": datetime.now().isoformat(),
+                "outline": outline_content
+            }
+            
+            with open(save_path, 'w', encoding='utf-8') as f:
+                json.dump(result_payload, f, ensure_ascii=False, indent=4)
+            
+            log_message("INFO", f"Successfully generated outline for {asset.asset_id}. Saved to: {save_path}")
+            return {
+                "status": "success",
+                "save_path": str(save_path),
+                "asset_id": asset.asset_id
+            }
 
         except Exception as e:
             log_message("ERROR", f"DeepSeek call or processing failed for {asset.asset_id}: {str(e)}")
@@ -156,13 +149,28 @@ async def run_structure_generate(asset: AcademicAsset):
     generator = StructureGenerator()
     return await generator.generate_outline(asset)
 
+async def run_once(asset: AcademicAsset):
+    """单次模式：任务结束即关闭连接池"""
+    try:
+        return await run_structure_generate(asset)
+    finally:
+        await LLMClient().aclose()
+
+def serve():
+    """常驻模式：复用同一事件循环逐个处理任务"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    serve_stdio(lambda data: loop.run_until_complete(run_structure_generate(AcademicAsset.from_dict(data))))
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if SERVE_FLAG in sys.argv:
+        serve()
+    elif len(sys.argv) > 1:
         try:
             asset_data = json.loads(sys.argv[1])
             asset_obj = AcademicAsset.from_dict(asset_data)
             
-            result = asyncio.run(run_structure_generate(asset_obj))
+            result = asyncio.run(run_once(asset_obj))
             print(json.dumps(result))
         except Exception as e:
             log_message("ERROR", f"CLI execution error: {str(e)}")
@@ -5,6 +5,12 @@ import os
 from datetime import datetime
 from pathlib import Path
 
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent.parent)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from core.worker_pool import serve_stdio, SERVE_FLAG
+
 def run_visual_inference(params,timeout=600):
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
     PROJECT_ROOT = Path(SCRIPT_DIR).resolve().parent.parent
@@ -67,7 +73,27 @@ def run_visual_inference(params,timeout=600):
     except Exception as e:
         return {"status": "error", "message": f"Wrapper internal error: {str(e)}"}
 
+def serve():
+    """常驻模式：Qwen2-VL 直接加载在本进程内，避免每次请求重新加载权重"""
+    from services.original.qwenvl_worker import load_config, VisualExpert
+
+    expert = VisualExpert(load_config())
+
+    def handle(params):
+        image_path = params.get("image", "")
+        if not os.path.exists(image_path):
+            return {"status": "error", "message": f"Image not found at: {image_path}"}
+        try:
+            return {"status": "success", "response": expert.reason(params.get("prompt", ""), [image_path])}
+        except Exception as e:
+            return {"status": "error", "message": f"Inference error: {str(e)}"}
+
+    serve_stdio(handle)
+
 if __name__ == "__main__":
+    if SERVE_FLAG in sys.argv:
+        serve()
+        sys.exit(0)
     try:
         input_json = sys.argv[1] if len(sys.argv) > 1 else "{}"
         params = json.loads(input_json)
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from core.asset_scheduler import AssetPriorityQueue
+
+
+def drain(queue: AssetPriorityQueue):
+    async def _drain():
+        return [await queue.get() for _ in range(queue.qsize())]
+    return asyncio.run(_drain())
+
+
+def fill(queue: AssetPriorityQueue, *entries):
+    async def _fill():
+        for entry in entries:
+            await queue.put(*entry)
+    asyncio.run(_fill())
+
+
+def test_sjf_takes_the_cheapest_asset_first():
+    queue = AssetPriorityQueue(policy="sjf")
+    fill(queue, ("video", 900), ("short_pdf", 40), ("long_pdf", 300))
+    assert drain(queue) == ["short_pdf", "long_pdf", "video"]
+
+
+def test_fifo_ignores_cost():
+    queue = AssetPriorityQueue(policy="fifo", aging_rate=0)
+    fill(queue, ("video", 900), ("short_pdf", 40), ("long_pdf", 300))
+    assert drain(queue) == ["video", "short_pdf", "long_pdf"]
+
+
+def test_equal_scores_keep_arrival_order():
+    queue = AssetPriorityQueue(policy="sjf", aging_rate=0)
+    fill(queue, ("a", 60), ("b", 60), ("c", 60))
+    assert drain(queue) == ["a", "b", "c"]
+
+
+def test_user_priority_outweighs_cost():
+    queue = AssetPriorityQueue(policy="sjf", aging_rate=0, priority_weight=600)
+    fill(queue, ("short_pdf", 40), ("video", 500, 1))
+    assert drain(queue) == ["video", "short_pdf"]
+
+
+def test_set_priority_reorders_a_waiting_asset():
+    queue = AssetPriorityQueue(policy="sjf", aging_rate=0)
+    fill(queue, ("short_pdf", 40), ("video", 500))
+    assert queue.set_priority("video", 1)
+    assert not queue.set_priority("missing", 1)
+    assert [e.asset_id for e in queue.ordered()] == ["video", "short_pdf"]
+
+
+def test_aging_lets_a_long_job_overtake_fresh_short_ones():
+    queue = AssetPriorityQueue(policy="sjf", aging_rate=1.0)
+    fill(queue, ("video", 900), ("short_pdf", 40))
+    # 视频已排队 15 分钟：900 - 900 < 40
+    queue._entries["video"].enqueued_at = time.monotonic() - 900
+    assert drain(queue) == ["video", "short_pdf"]
+
+
+def test_without_aging_the_long_job_waits():
+    queue = AssetPriorityQueue(policy="sjf", aging_rate=0)
+    fill(queue, ("video", 900), ("short_pdf", 40))
+    queue._entries["video"].enqueued_at = time.monotonic() - 900
+    assert drain(queue) == ["short_pdf", "video"]
+
+
+def test_get_batch_collects_in_schedule_order():
+    async def scenario():
+        queue = AssetPriorityQueue(policy="sjf", aging_rate=0)
+        for asset_id, cost in [("c", 300), ("a", 10), ("b", 100), ("d", 900)]:
+            await queue.put(asset_id, cost)
+        return await queue.get_batch(max_items=3, window=0), queue.qsize()
+    assert asyncio.run(scenario()) == (["a", "b", "c"], 1)
+
+
+def test_get_batch_waits_for_late_arrivals_within_the_window():
+    async def scenario():
+        queue = AssetPriorityQueue(policy="sjf")
+        await queue.put("first", 10)
+
+        async def late():
+            await asyncio.sleep(0.05)
+            await queue.put("second", 10)
+        producer = asyncio.create_task(late())
+        batch = await queue.get_batch(max_items=2, window=1.0)
+        await producer
+        return batch
+    assert asyncio.run(scenario()) == ["first", "second"]
@@ -0,0 +1,87 @@
+from core.evidence_manager import EvidenceManager, assess_sufficiency, estimate_tokens, evidence_key
+
+
+def ev(content, score, asset="a.pdf", page=1, type_="text"):
+    return {"content": content, "score": score,
+            "metadata": {"asset_name": asset, "type": type_, "page_label": page}}
+
+
+def test_duplicate_hits_keep_the_best_score_and_latest_turn():
+    manager = EvidenceManager()
+    assert manager.add([ev("lemma 3", 0.5)], turn=0) == 1
+    assert manager.add([ev("  lemma 3 ", 0.7), ev("lemma 3", 0.4)], turn=2) == 0
+    (item,) = manager.to_list()
+    assert item["score"] == 0.7 and item["turn"] == 2
+
+
+def test_same_text_on_another_page_is_distinct():
+    manager = EvidenceManager()
+    manager.add([ev("lemma 3", 0.5, page=1), ev("lemma 3", 0.5, page=2)], turn=0)
+    assert len(manager) == 2
+    assert evidence_key(ev("x", 0, page=1)) != evidence_key(ev("x", 0, page=2))
+
+
+def test_older_evidence_decays_across_turns():
+    manager = EvidenceManager(cfg={"decay_per_turn": 0.5})
+    manager.add([ev("old but strong", 0.9)], turn=0)
+    manager.add([ev("fresh", 0.6, page=2)], turn=2)
+    assert [i["content"] for i in manager.ranked(turn=2)] == ["fresh", "old but strong"]
+
+
+def test_max_items_keeps_the_highest_ranked():
+    manager = EvidenceManager(cfg={"max_items": 2})
+    manager.add([ev(f"item {i}", i / 10, page=i) for i in range(5)], turn=0)
+    assert sorted(i["content"] for i in manager.to_list()) == ["item 3", "item 4"]
+
+
+def test_select_prefers_diverse_evidence():
+    manager = EvidenceManager(cfg={"mmr_lambda": 0.5})
+    manager.add([ev("gradient descent converges slowly", 0.9, page=1),
+                 ev("gradient descent converges slowly here", 0.85, page=1),
+                 ev("adam uses adaptive moments", 0.8, page=7)], turn=0)
+    picked = manager.select("evidence_evaluator", turn=0, budget=10_000)
+    assert [p["content"] for p in picked[:2]] == ["gradient descent converges slowly", "adam uses adaptive moments"]
+    assert all("turn" not in p for p in picked)
+
+
+def test_select_respects_the_token_budget_but_keeps_one_item():
+    manager = EvidenceManager(cfg={"token_budgets": {"synthesizer": 40}})
+    manager.add([ev("x" * 400, 0.9, page=1), ev("short", 0.5, page=2)], turn=0)
+    assert [p["content"] for p in manager.select("synthesizer", turn=0)] == ["x" * 400]
+    assert [p["content"] for p in manager.select("synthesizer", turn=0, budget=150)] == ["x" * 400, "short"]
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("注意力") == 4
+    assert estimate_tokens("abcdefgh") == 3
+
+
+def scored(base, content=""):
+    return {"content": content, "score": base + 0.3, "base_vector_score": base}
+
+
+def test_sufficiency_without_evidence_refetches():
+    assert assess_sufficiency([], ["x"], 0.5) == ("refetch", 0.0)
+
+
+def test_sufficiency_decides_clear_cases_locally():
+    assert assess_sufficiency([scored(0.9)] * 3, [], 0.5) == ("proceed", 1.0)
+    assert assess_sufficiency([scored(0.2)] * 3, [], 0.5) == ("refetch", 0.0)
+
+
+def test_sufficiency_leaves_the_grey_zone_to_the_llm():
+    assert assess_sufficiency([scored(0.5)] * 3, [], 0.5) == (None, 0.5)
+
+
+def test_sufficiency_uses_vector_score_of_the_top_n_only():
+    docs = [scored(0.9), scored(0.9), scored(0.9), scored(0.0), scored(0.0)]
+    assert assess_sufficiency(docs, [], 0.5)[0] == "proceed"
+    # 没有 base_vector_score 时退回 score
+    assert assess_sufficiency([{"content": "", "score": 0.9}], [], 0.5)[0] == "proceed"
+
+
+def test_missing_keywords_pull_confidence_into_the_grey_zone():
+    docs = [scored(0.9, "dropout reduces overfitting")] * 3
+    assert assess_sufficiency(docs, ["Dropout", "overfitting"], 0.5) == ("proceed", 1.0)
+    assert assess_sufficiency(docs, ["batchnorm", "layernorm"], 0.5) == (None, 0.6)
+    assert assess_sufficiency(docs, ["dropout", "layernorm"], 0.5, cfg={"proceed_above": 0.75}) == ("proceed", 0.8)
@@ -0,0 +1,56 @@
+import numpy as np
+
+from services.original.lexical_index import LexicalIndex, tokenize
+
+
+def doc(asset, text, timestamp=None):
+    return {"asset_name": asset, "modality": "pdf", "content_type": "text", "content_ref": text,
+            "timestamp": timestamp, "coordinates": "null"}
+
+
+def test_tokenize_keeps_version_numbers_and_hyphenated_terms():
+    assert tokenize("ResNet-50 reaches F1-score 3.2 on v1_2") == ["resnet-50", "reaches", "f1-score", "3.2", "on", "v1_2"]
+
+
+def test_tokenize_splits_cjk_runs_into_bigrams():
+    assert tokenize("注意力机制") == ["注意", "意力", "力机", "机制"]
+    assert tokenize("BERT 和 GPT") == ["bert", "gpt", "和"]
+
+
+def test_search_ranks_by_bm25_and_returns_vectors(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    docs = [doc("a.pdf", "dropout regularization in deep networks"),
+            doc("a.pdf", "dropout dropout dropout"),
+            doc("a.pdf", "batch normalization")]
+    index.add_segment("a.pdf", docs, vectors=[[1, 0], [0, 1], [1, 1]])
+    hits = LexicalIndex(str(tmp_path)).search("dropout", top_k=5)
+    assert [h["doc"]["content_ref"] for h in hits] == ["dropout dropout dropout", "dropout regularization in deep networks"]
+    assert hits[0]["bm25"] > hits[1]["bm25"] > 0
+    assert np.allclose(hits[0]["vector"], [0, 1])
+
+
+def test_asset_filter_keeps_global_statistics(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add_segment("a.pdf", [doc("a.pdf", "attention heads")])
+    index.add_segment("b.pdf", [doc("b.pdf", "attention heads"), doc("b.pdf", "unrelated text")])
+    everything = {h["doc"]["asset_name"]: h["bm25"] for h in index.search("attention")}
+    only_a = index.search("attention", assets=["a.pdf"])
+    assert [h["doc"]["asset_name"] for h in only_a] == ["a.pdf"]
+    assert only_a[0]["bm25"] == everything["a.pdf"]
+    assert index.search("attention", assets=["missing.pdf"]) == []
+
+
+def test_rebuilding_and_removing_an_asset_swaps_its_segment(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add_segment("a.pdf", [doc("a.pdf", "old wording")])
+    index.add_segment("a.pdf", [doc("a.pdf", "new wording")])
+    assert [h["doc"]["content_ref"] for h in index.search("wording")] == ["new wording"]
+    index.remove_asset("a.pdf")
+    assert index.search("wording") == []
+
+
+def test_query_without_known_terms_returns_nothing(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add_segment("a.pdf", [doc("a.pdf", "convolution")])
+    assert index.search("transformer") == []
+    assert index.search("   ") == []
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import pytest
+
+from core.llm_governor import LLMGovernor
+
+
+@pytest.fixture
+def governor():
+    LLMGovernor._instance = None
+    gov = LLMGovernor()
+    gov.enabled = True
+    gov.max_concurrency = 1
+    gov.burst = gov.tokens = 100.0
+    gov.rate = 1000.0
+    gov.max_background = 1
+    gov.report_interval = 0.01
+    yield gov
+    LLMGovernor._instance = None
+
+
+async def admission_order(gov, calls):
+    """先占住唯一槽位，按顺序排入 calls=[(session, phase, label)]，放行后记录获准顺序"""
+    order = []
+    release = asyncio.Event()
+
+    async def blocker():
+        async with gov.slot("blocker", "query_refiner"):
+            await release.wait()
+
+    async def call(session, phase, label):
+        async with gov.slot(session, phase):
+            order.append(label)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(blocker())]
+    await asyncio.sleep(0)
+    for session, phase, label in calls:
+        tasks.append(asyncio.create_task(call(session, phase, label)))
+        await asyncio.sleep(0)
+    assert len(gov.waiters) == len(calls)
+    release.set()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_sessions_take_turns_within_a_priority(governor):
+    calls = [("a", "query_refiner", "a1"), ("a", "query_refiner", "a2"), ("a", "query_refiner", "a3"),
+             ("b", "query_refiner", "b1"), ("b", "query_refiner", "b2")]
+    order = asyncio.run(admission_order(governor, calls))
+    assert order == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_a_late_session_is_not_starved_by_a_backlog(governor):
+    calls = [("a", "evidence_evaluator", f"a{i}") for i in range(5)] + [("late", "evidence_evaluator", "late")]
+    order = asyncio.run(admission_order(governor, calls))
+    assert order.index("late") <= 1
+
+
+def test_phase_priority_beats_fairness(governor):
+    calls = [("a", "query_refiner", "refine"), ("b", "structural_outline", "outline"),
+             ("c", "synthesizer", "synth")]
+    order = asyncio.run(admission_order(governor, calls))
+    assert order == ["synth", "refine", "outline"]
+
+
+def test_background_phases_are_capped(governor):
+    governor.max_concurrency = 4
+
+    async def scenario():
+        release = asyncio.Event()
+        peak = 0
+
+        async def outline(i):
+            nonlocal peak
+            async with governor.slot(f"s{i}", "structural_outline"):
+                peak = max(peak, governor.background_in_flight)
+                await release.wait()
+
+        tasks = [asyncio.create_task(outline(i)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        waiting = len(governor.waiters)
+        # 后台占满配额时交互调用仍能立即获准
+        async with governor.slot("user", "synthesizer"):
+            interactive_in_flight = governor.in_flight
+        release.set()
+        await asyncio.gather(*tasks)
+        return peak, waiting, interactive_in_flight
+
+    peak, waiting, interactive_in_flight = asyncio.run(scenario())
+    assert peak == 1
+    assert waiting == 2
+    assert interactive_in_flight == 2
+
+
+def test_token_bucket_spaces_calls_beyond_the_burst(governor):
+    governor.max_concurrency = 8
+    governor.burst = governor.tokens = 2.0
+    governor.rate = 20.0
+
+    async def scenario():
+        started = time.monotonic()
+        admitted = []
+
+        async def call():
+            async with governor.slot("a", "query_refiner"):
+                admitted.append(time.monotonic() - started)
+
+        await asyncio.gather(*(call() for _ in range(4)))
+        return sorted(admitted)
+
+    admitted = asyncio.run(scenario())
+    assert admitted[1] < 0.03
+    # 第 3、4 次各需等待约 1 / rate 秒补充令牌
+    assert admitted[3] >= 0.08
+
+
+def test_cancelled_waiter_leaves_the_queue(governor):
+    async def scenario():
+        release = asyncio.Event()
+        positions = []
+
+        async def blocker():
+            async with governor.slot("blocker", "query_refiner"):
+                await release.wait()
+
+        async def on_wait(position, waited):
+            positions.append(position)
+
+        async def waiter():
+            async with governor.slot("a", "query_refiner", on_wait=on_wait):
+                pass
+
+        holder = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        pending = asyncio.create_task(waiter())
+        await asyncio.sleep(0.03)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        release.set()
+        await holder
+        return positions
+
+    positions = asyncio.run(scenario())
+    assert positions and positions[0] == 1
+    assert governor.waiters == [] and governor.in_flight == 0
@@ -0,0 +1,85 @@
+from core.search_cache import SearchResultCache, bump_generation, read_generation
+
+
+def make_cache(tmp_path, **cfg):
+    return SearchResultCache(dict({"generation_file": str(tmp_path / "search_generation")}, **cfg))
+
+
+def params(queries, keywords=(), top_k=8, **preferences):
+    return {"search_params": {"queries": queries, "keywords": list(keywords), "top_k": top_k},
+            "preferences": preferences}
+
+
+def test_key_normalizes_case_whitespace_and_duplicates():
+    a = SearchResultCache.make_key(params(["Attention  Is All", "attention is all"]))
+    b = SearchResultCache.make_key(params(["attention is all"]))
+    assert a == b
+
+
+def test_key_folds_keywords_into_a_sub_query():
+    a = SearchResultCache.make_key(params(["transformer"], keywords=["self", "attention"]))
+    b = SearchResultCache.make_key(params(["transformer", "self attention"]))
+    assert a == b
+
+
+def test_key_ignores_empty_preferences():
+    a = SearchResultCache.make_key(params(["q"], asset_name=None, modality="", page="null"))
+    b = SearchResultCache.make_key(params(["q"]))
+    assert a == b
+
+
+def test_key_distinguishes_preferences_top_k_and_ann_params():
+    base = SearchResultCache.make_key(params(["q"]))
+    assert SearchResultCache.make_key(params(["q"], modality="pdf")) != base
+    assert SearchResultCache.make_key(params(["q"], top_k=3)) != base
+    with_ann = params(["q"])
+    with_ann["search_params"]["ann_params"] = {"ef": 128}
+    assert SearchResultCache.make_key(with_ann) != base
+
+
+def test_hit_returns_an_independent_copy(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("k", {"results": [1]}, cache.generation)
+    hit = cache.get("k")
+    hit["results"].append(2)
+    assert cache.get("k") == {"results": [1]}
+    assert cache.stats()["hits"] == 2
+
+
+def test_generation_bump_invalidates_everything(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("k", {"results": []}, cache.generation)
+    assert cache.get("k") is not None
+    bump_generation(tmp_path / "search_generation")
+    assert cache.get("k") is None
+    assert cache.generation == read_generation(tmp_path / "search_generation") == 1
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_result_from_a_stale_generation_is_not_stored(tmp_path):
+    cache = make_cache(tmp_path)
+    started = cache.generation
+    bump_generation(tmp_path / "search_generation")  # 检索进行期间有资产入库
+    cache.put("k", {"results": []}, started)
+    assert cache.get("k") is None
+    assert cache.stats()["stores"] == 0
+
+
+def test_lru_eviction_by_entry_count(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, {"k": key}, cache.generation)
+    cache.get("a")
+    cache.put("c", {"k": "c"}, cache.generation)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_byte_budget_evicts_and_rejects_oversized_results(tmp_path):
+    cache = make_cache(tmp_path, max_mb=150 / (1024 * 1024))
+    cache.put("a", {"text": "x" * 80}, cache.generation)
+    cache.put("b", {"text": "y" * 80}, cache.generation)
+    assert cache.get("a") is None and cache.get("b") is not None
+    cache.put("huge", {"text": "z" * 500}, cache.generation)
+    assert cache.get("huge") is None
+    assert cache.stats()["bytes"] <= cache.max_bytes
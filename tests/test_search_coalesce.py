@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+# search_worker loads CLIP at import time; these tests only need the data_stream environment
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from services.original.search_worker import AcademicSearchWorker, DEFAULT_SEARCH_CONFIG, _join_texts  # noqa: E402
+
+
+@pytest.fixture
+def worker():
+    w = object.__new__(AcademicSearchWorker)
+    w.search_cfg = dict(DEFAULT_SEARCH_CONFIG, coalesce_window=30, coalesce_bbox_overlap=0.1, coalesce_max_members=8)
+    return w
+
+
+def hit(asset, modality, type_, content, timestamp=None, page=None, bbox="null", score=0.5):
+    return {"score": score, "base_vector_score": score - 0.1, "content": content, "rrf_score": 0.01,
+            "matched_queries": 1,
+            "metadata": {"asset_name": asset, "modality": modality, "type": type_, "bbox": bbox,
+                         "timestamp": timestamp, "page_label": page}}
+
+
+def test_adjacent_video_windows_merge_into_one_segment(worker):
+    ranked = [hit("L1", "video", "transcript_context", "the gradient is computed by backprop", 100, score=0.8),
+              hit("L1", "video", "transcript_context", "computed by backprop then we update", 110, score=0.9),
+              hit("L1", "video", "transcript_context", "far away", 200)]
+    out = worker._coalesce(ranked, top_k=5)
+    assert len(out) == 2
+    segment = out[0]
+    assert segment["metadata"]["span"] == [100, 110]
+    assert segment["content"] == "the gradient is computed by backprop then we update"
+    assert segment["score"] == 0.9
+    assert [m["timestamp"] for m in segment["members"]] == [100, 110]
+    assert out[1]["content"] == "far away" and "members" not in out[1]
+
+
+def test_window_is_measured_across_the_whole_segment(worker):
+    ranked = [hit("L1", "video", "transcript_context", "a" * 10, 100),
+              hit("L1", "video", "transcript_context", "b" * 10, 125),
+              hit("L1", "video", "transcript_context", "c" * 10, 140)]
+    out = worker._coalesce(ranked, top_k=5)
+    assert [o["metadata"].get("span") for o in out] == [[100, 125], None]
+
+
+def test_pdf_hits_merge_only_on_the_same_page_with_overlap(worker):
+    ranked = [hit("L2.pdf", "pdf", "text", "lemma 3", page=4, bbox="[0, 0, 100, 50]"),
+              hit("L2.pdf", "pdf", "text", "proof of lemma 3", page=4, bbox="[0, 40, 100, 90]"),
+              hit("L2.pdf", "pdf", "text", "footer", page=4, bbox="[0, 200, 100, 220]"),
+              hit("L2.pdf", "pdf", "text", "other page", page=5, bbox="[0, 0, 100, 50]")]
+    out = worker._coalesce(ranked, top_k=5)
+    assert [o["content"] for o in out] == ["lemma 3\nproof of lemma 3", "footer", "other page"]
+    assert json.loads(out[0]["metadata"]["bbox"]) == [0, 0, 100, 90]
+
+
+def test_different_assets_never_merge(worker):
+    ranked = [hit("L1", "video", "transcript_context", "x" * 10, 100),
+              hit("L3", "video", "transcript_context", "y" * 10, 101)]
+    assert len(worker._coalesce(ranked, top_k=5)) == 2
+
+
+def test_top_k_counts_segments_and_late_hits_still_join(worker):
+    ranked = [hit("L1", "video", "transcript_context", "first window", 100),
+              hit("L2.pdf", "pdf", "text", "page text", page=1, bbox="[0, 0, 10, 10]"),
+              hit("L9", "video", "transcript_context", "dropped", 10),
+              hit("L1", "video", "transcript_context", "late joiner", 120)]
+    out = worker._coalesce(ranked, top_k=2)
+    assert len(out) == 2
+    assert out[0]["metadata"]["span"] == [100, 120]
+    assert all(o["metadata"]["asset_name"] != "L9" for o in out)
+
+
+def test_media_led_segment_with_text_becomes_type_segment(worker):
+    ranked = [hit("L1", "video", "image_frame", "http://x/100.jpg", 100, score=0.9),
+              hit("L1", "video", "transcript_context", "spoken words", 104)]
+    segment = worker._coalesce(ranked, top_k=5)[0]
+    assert segment["content"] == "spoken words"
+    assert segment["metadata"]["type"] == "segment"
+    assert segment["members"][0]["ref"] == "http://x/100.jpg"
+
+
+def test_media_only_segment_keeps_its_type_and_url(worker):
+    ranked = [hit("L1", "video", "image_frame", "http://x/100.jpg", 100),
+              hit("L1", "video", "image_frame", "http://x/102.jpg", 102)]
+    segment = worker._coalesce(ranked, top_k=5)[0]
+    assert segment["metadata"]["type"] == "image_frame"
+    assert segment["content"] == "http://x/100.jpg"
+
+
+def test_member_cap_opens_a_new_segment(worker):
+    worker.search_cfg["coalesce_max_members"] = 2
+    ranked = [hit("L1", "video", "transcript_context", f"window number {i}", 100 + i) for i in range(3)]
+    out = worker._coalesce(ranked, top_k=5)
+    assert [len(o.get("members", [o])) for o in out] == [2, 1]
+
+
+def test_join_texts_drops_repeats_and_window_overlap():
+    assert _join_texts(["alpha beta gamma delta", "gamma delta epsilon", "beta"]) == "alpha beta gamma delta epsilon"
+    assert _join_texts(["short", "other"]) == "short\nother"
@@ -0,0 +1,66 @@
+import random
+
+import numpy as np
+import pytest
+
+# search_worker loads CLIP at import time; these tests only need the data_stream environment
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from services.original.search_worker import AcademicSearchWorker, DEFAULT_BONUS_WEIGHTS  # noqa: E402
+
+
+def scalar_score(entity, base, query_lower, preferences, w=DEFAULT_BONUS_WEIGHTS):
+    """The per-hit scoring the vectorized path replaced, kept as the reference."""
+    bonus = 0.0
+    modality, c_type = entity.get("modality", ""), entity.get("content_type", "")
+    if preferences:
+        if preferences.get("asset_name") and preferences["asset_name"].lower() in entity["asset_name"].lower():
+            bonus += w["asset_match_bonus"]
+        if preferences.get("modality") and preferences["modality"] == modality:
+            bonus += w["modality_match_bonus"]
+        if preferences.get("timestamp") is not None:
+            try:
+                if abs(float(entity.get("timestamp")) - float(preferences["timestamp"])) < 0.01:
+                    bonus += w["page_match_bonus"]
+            except (TypeError, ValueError):
+                pass
+    if query_lower in (entity.get("content_ref") or "").lower():
+        bonus += w["content_match_bonus"]
+    if modality == "video" and c_type == "transcript_context":
+        bonus += w["transcript_bonus"]
+    elif modality == "pdf" and c_type in ["heading", "title"]:
+        bonus += w["heading_bonus"]
+    return base + bonus
+
+
+@pytest.fixture
+def worker():
+    w = object.__new__(AcademicSearchWorker)
+    w.weights = dict(DEFAULT_BONUS_WEIGHTS)
+    return w
+
+
+@pytest.fixture
+def candidates():
+    rng = random.Random(0)
+    entities = [{
+        "asset_name": rng.choice(["A.pdf", "B.mp4", "Calc.pdf"]),
+        "modality": rng.choice(["pdf", "video"]),
+        "content_type": rng.choice(["text", "transcript_context", "title", "heading", "image"]),
+        "content_ref": rng.choice(["Gradient descent", "例题 3.2", "x", None]),
+        "timestamp": rng.choice([float(rng.randint(1, 20)), None, "bad"]),
+    } for _ in range(500)]
+    return entities, np.array([rng.random() for _ in entities])
+
+
+@pytest.mark.parametrize("query, preferences", [
+    ("例题 3.2", {"asset_name": "calc", "modality": "pdf", "timestamp": 12}),
+    ("gradient descent", {"modality": "video", "timestamp": "7"}),
+    ("x", None),
+])
+def test_vectorized_scores_match_scalar_scoring(worker, candidates, query, preferences):
+    entities, base = candidates
+    got = worker._boosted_scores(worker._columns(entities), base, query.lower(), preferences)
+    expected = [scalar_score(e, b, query.lower(), preferences) for e, b in zip(entities, base)]
+    assert np.allclose(got, expected)
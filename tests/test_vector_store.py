@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from services.original.vector_store import LocalVectorStore, VectorStore, filter_expr, matches_filters
+
+DIM = 16
+FILTERS = [
+    {},
+    {"modality": "pdf"},
+    {"assets": ["b.mp4"]},
+    {"assets": ["a.pdf", "b.mp4"], "windows": {"video": (10, 20), "pdf": (0, 1)}},
+    {"modality": "video", "windows": {"video": (0, 5), "pdf": (0, 100)}},
+]
+
+
+def columns(rng, asset, modality, n):
+    vectors = rng.normal(size=(n, DIM))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [[asset] * n, [modality] * n, ["text"] * n, [f"{asset} {i}" for i in range(n)],
+            [float(i % 50) for i in range(n)], ["null"] * n, vectors.tolist()]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = np.random.default_rng(7)
+    data = [columns(rng, "a.pdf", "pdf", 300), columns(rng, "b.mp4", "video", 300), columns(rng, "c.pdf", "pdf", 300)]
+    writer = LocalVectorStore(str(tmp_path), DIM, cfg={"dtype": "float32"})
+    for d in data:
+        writer.insert(d)
+    vectors = np.concatenate([np.asarray(d[6]) for d in data])
+    meta = [{"asset_name": d[0][i], "modality": d[1][i], "timestamp": d[4][i]} for d in data for i in range(len(d[0]))]
+    queries = rng.normal(size=(3, DIM))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return tmp_path, vectors, meta, queries
+
+
+def expected_scores(vectors, meta, query, filters, limit):
+    keep = np.array([matches_filters(m, filters) for m in meta])
+    return np.sort((vectors @ query)[keep])[::-1][:limit]
+
+
+def test_vector_store_is_abstract():
+    with pytest.raises(TypeError):
+        VectorStore()
+
+
+def test_filter_expr_matches_the_milvus_grammar():
+    assert filter_expr({}) is None
+    assert filter_expr({"assets": ["a.pdf", 'q"uote'], "modality": "pdf"}) == \
+        'asset_name in ["a.pdf", "q\\"uote"] and modality == "pdf"'
+    assert filter_expr({"modality": "video", "windows": {"video": (10, 20), "pdf": (1, 2)}}) == \
+        'modality == "video" and ((modality == "video" and timestamp >= 10 and timestamp <= 20))'
+
+
+def test_matches_filters_rejects_records_outside_any_window():
+    filters = {"windows": {"video": (10, 20)}}
+    assert matches_filters({"modality": "video", "timestamp": 15}, filters)
+    assert not matches_filters({"modality": "video", "timestamp": 25}, filters)
+    assert not matches_filters({"modality": "pdf", "timestamp": 15}, filters)
+    assert not matches_filters({"modality": "video", "timestamp": None}, filters)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_brute_force_search_matches_python_filters(corpus, filters):
+    root, vectors, meta, queries = corpus
+    store = LocalVectorStore(str(root), DIM, cfg={"dtype": "float32"})
+    results = store.search(queries.tolist(), 10, filters)
+    for query, hits in zip(queries, results):
+        assert all(matches_filters(h.entity, filters) for h in hits)
+        assert np.allclose([h.score for h in hits], expected_scores(vectors, meta, query, filters, 10), atol=1e-5)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_ivf_with_every_list_probed_is_exact(corpus, filters):
+    root, vectors, meta, queries = corpus
+    store = LocalVectorStore(str(root), DIM, cfg={"dtype": "float32", "ivf": {"min_rows": 100, "nlist": 8, "nprobe": 8}})
+    results = store.search(queries.tolist(), 10, filters)
+    assert store._ivf is not None
+    for query, hits in zip(queries, results):
+        assert all(matches_filters(h.entity, filters) for h in hits)
+        assert np.allclose([h.score for h in hits], expected_scores(vectors, meta, query, filters, 10), atol=1e-5)
+
+
+def test_deleted_asset_disappears_from_a_live_reader(corpus):
+    root, _, _, queries = corpus
+    reader = LocalVectorStore(str(root), DIM, cfg={"dtype": "float32"})
+    assert reader.search(queries[:1].tolist(), 5, {"assets": ["b.mp4"]})[0]
+    LocalVectorStore(str(root), DIM).delete_asset("b.mp4")
+    assert reader.search(queries[:1].tolist(), 5, {"assets": ["b.mp4"]}) == [[]]
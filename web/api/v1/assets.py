@@ -1,8 +1,7 @@
 import logging
 import json
-from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException
-from core.assets_manager import GlobalAssetManager, AssetStatus
+from core.assets_manager import GlobalAssetManager, AssetStatus, resolve_processed_dir
 
 logger = logging.getLogger("AssetsAPI")
 router = APIRouter()
@@ -16,6 +15,25 @@ async def trigger_sync():
     res = await manager.start_queue_processing()
     return res
 
+@router.post("/retry")
+async def retry_asset(asset_id: str):
+    """
+    [API] 重试失败资产：跳过产物仍有效的已完成阶段
+    """
+    res = await manager.retry_asset(asset_id)
+    if res.get("message") == "Asset not found":
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return res
+
+@router.post("/priority")
+async def set_asset_priority(asset_id: str, priority: int):
+    """
+    [API] 调整资产处理优先级（越大越先处理）
+    """
+    if not await manager.set_priority(asset_id, priority):
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return {"status": "success", "asset_id": asset_id, "priority": priority}
+
 @router.get("/structure")
 async def get_structure(asset_id: str):
     """
@@ -34,9 +52,7 @@ async def get_structure(asset_id: str):
         }
 
     # 1. 构造文件完整路径
-    if asset["asset_type"]=="pdf":
-        asset["asset_processed_path"] = asset["asset_processed_path"].replace(".pdf","")
-    processed_dir = Path(asset["asset_processed_path"])
+    processed_dir = resolve_processed_dir(asset)
     outline_file = processed_dir / "summary_outline.json"
 
     # 2. 检查文件物理是否存在
@@ -28,46 +28,79 @@ async def chat_stream(
              yield {"event": "error", "data": "Task already running"}
              return
 
+        # 推理流与排队通知（LLM 准入排队位置/等待时间）共用一个事件通道
+        channel = chats_manager.open_event_channel(chat_id)
+
+        async def run_flow():
+            try:
+                async for chunk in chats_manager.execute_reasoning_flow(chat_id, message):
+                    await channel.put(("message", chunk))
+            except Exception as e:
+                import traceback
+                print(traceback.format_exc()) # 打印具体的错误堆栈到控制台
+                await channel.put(("error", str(e)))
+            finally:
+                await channel.put(("done", None))
+
+        flow_task = None
         try:
-            # 标记任务开始（虽然不再使用 create_task，但可以用个占位符防止并发）
-            chats_manager.running_tasks[chat_id] = True 
-            
+            # 标记任务开始，防止同一会话并发推理
+            flow_task = asyncio.create_task(run_flow())
+            chats_manager.running_tasks[chat_id] = flow_task
+
             last_status = None
-            
-            # 2. 直接迭代异步生成器
-            # 注意：这里直接 await 异步生成器对象
-            async for chunk in chats_manager.execute_reasoning_flow(chat_id, message):
-                
-                # 在迭代过程中，顺便检查并推送状态变更（state_change）
-                details = chats_manager.get_chat_details(chat_id)
-                if details and details['status'] != last_status:
-                    last_status = details['status']
+
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(channel.get(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    kind, data = None, None
+
+                # 顺便检查并推送状态变更（state_change）
+                status = chats_manager.get_chat_status(chat_id)
+                if status and status != last_status:
+                    last_status = status
                     yield {
                         "event": "state_change",
                         "data": json.dumps({"status": last_status}, ensure_ascii=False)
                     }
 
-                # 推送当前获取到的流式 Token 或最终结果
-                # chunk 可能是 token，也可能是最后的完整消息
-                yield {
-                    "event": "message",
-                    "data": json.dumps({"content": chunk, "status": "processing"}, ensure_ascii=False)
-                }
+                if kind == "queue":
+                    # LLM 调用排队中：推送排队位置与已等待时间
+                    yield {
+                        "event": "state_change",
+                        "data": json.dumps(data, ensure_ascii=False)
+                    }
+                elif kind == "message":
+                    # 推送当前获取到的流式 Token
+                    yield {
+                        "event": "message",
+                        "data": json.dumps({"content": data, "status": "processing"}, ensure_ascii=False)
+                    }
+                elif kind == "error":
+                    yield {"event": "error", "data": data}
+                    break
+                elif kind == "done":
+                    break
 
                 if await request.is_disconnected():
                     break
-            
-            # 迭代结束，发送完成信号
-            yield {
-                "event": "message",
-                "data": json.dumps({"status": "completed"}, ensure_ascii=False)
-            }
+
+            if kind == "done":
+                # 迭代结束，发送完成信号
+                yield {
+                    "event": "message",
+                    "data": json.dumps({"status": "completed"}, ensure_ascii=False)
+                }
 
         except Exception as e:
             import traceback
             print(traceback.format_exc()) # 打印具体的错误堆栈到控制台
             yield {"event": "error", "data": str(e)}
         finally:
+            if flow_task is not None and not flow_task.done():
+                flow_task.cancel()
+            chats_manager.close_event_channel(chat_id)
             chats_manager.running_tasks.pop(chat_id, None)
 
-    return EventSourceResponse(event_generator())
\ No newline at end of file
+    return EventSourceResponse(event_generator())
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Query
 from core.assets_manager import GlobalAssetManager
 from core.chats_manager import ChatsManager  
+from core.services_manager import ServicesManager
+from core.llm_client import LLMClient
+from core.llm_governor import LLMGovernor
 
 router = APIRouter()
 manager = GlobalAssetManager()
 chats_manager = ChatsManager()
+services_manager = ServicesManager()
 
 @router.get("/single_asset")
 async def get_single_status(asset_id : str = Query(None, description="可选，指定查询某个资产")):
     """
-    [API] 查询单一资产状态
+    [API] 查询单一资产状态（含 estimated_cost 预估成本与 eta_seconds 预计完成时间）
     """
     if asset_id:
       detail = manager.get_asset_status(asset_id)
@@ -41,4 +45,30 @@ async def get_single_chat_status(chat_id: str = Query(None, description="可选
 @router.get("/global_chats")
 async def get_global_chat_status():
     """[API] 查询全局推理引擎状态 (是否有会话正在占用 VRAM)"""
-    return {"status": "success", "data": chats_manager.get_overall_status()}
\ No newline at end of file
+    return {"status": "success", "data": chats_manager.get_overall_status()}
+
+@router.get("/services")
+async def get_services_status():
+    """[API] 查询常驻 worker 进程池状态，以及检索 / 结构化服务配置与实际生效的接入方式"""
+    return {"status": "success", "data": {"pools": services_manager.get_pool_stats(), "modes": services_manager.get_service_modes()}}
+
+@router.get("/search_cache")
+async def get_search_cache_status():
+    """[API] 查询检索结果缓存状态（命中率、条目数与字节占用、当前入库代数）"""
+    return {"status": "success", "data": services_manager.get_search_cache_stats()}
+
+@router.get("/llm")
+async def get_llm_status():
+    """[API] 查询 DeepSeek 连接池状态（占用连接、排队耗时、重试次数）与准入控制状态"""
+    return {"status": "success", "data": dict(LLMClient().get_metrics(), governor=LLMGovernor().stats())}
+
+@router.get("/chat_trace")
+async def get_chat_trace(chat_id: str = Query(..., description="会话 ID"), turn: int = Query(None, description="可选，指定轮次")):
+    """[API] 查询会话每轮推理的阶段耗时时间线（span 列表）"""
+    traces = chats_manager.get_chat_trace(chat_id, turn)
+    return {"status": "success", "data": traces} if traces is not None else {"status": "error", "message": "Not Found"}
+
+@router.get("/phase_latency")
+async def get_phase_latency():
+    """[API] 查询各推理阶段跨会话的 p50/p95/p99 耗时"""
+    return {"status": "success", "data": chats_manager.get_phase_latency()}
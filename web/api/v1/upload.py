@@ -1,8 +1,9 @@
 import logging
+import hashlib
 import aiofiles
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from core.assets_manager import GlobalAssetManager, AssetType
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from core.assets_manager import GlobalAssetManager, AssetType, AssetStatus
 
 logger = logging.getLogger("UploadAPI")
 router = APIRouter()
@@ -13,13 +14,14 @@ manager = GlobalAssetManager()
 @router.post("/file")
 async def upload_academic_asset(
     file: UploadFile = File(...),
+    priority: int = Form(0),
 ):
     """
     [API] 综合上传接口：
     1. 自动生成 asset_id (文件名)
     2. 注册为 Uploading 状态
     3. 异步写入磁盘
-    4. 写入完成后切换为 Raw 并触发入队
+    4. 写入完成后切换为 Raw 并触发入队（内容哈希命中已处理资产时直接 Ready）
     """
     filename = file.filename
     extension = filename.split(".")[-1].lower()
@@ -44,24 +46,33 @@ async def upload_academic_asset(
         await manager.register_new_upload(
             asset_id=asset_id, 
             asset_type=asset_type, 
-            raw_path=str(save_path)
+            raw_path=str(save_path),
+            priority=priority
         )
 
-        # 3. 开始异步写入磁盘
+        # 3. 开始异步写入磁盘，同时流式计算 SHA-256 用于去重
+        hasher = hashlib.sha256()
         async with aiofiles.open(save_path, 'wb') as out_file:
             while content := await file.read(1024 * 1024):  # 1MB chunks
+                hasher.update(content)
                 await out_file.write(content)
 
-        logger.info(f"File {filename} disk write complete.")
+        content_hash = hasher.hexdigest()
+        logger.info(f"File {filename} disk write complete (sha256 {content_hash[:12]}).")
 
         # 4. 关键点：写入完成后通知 manager 切换状态为 Raw 并入队
-        await manager.update_to_raw(asset_id)
+        current_state = await manager.update_to_raw(asset_id, content_hash=content_hash)
 
+        if current_state == AssetStatus.READY.value:
+            message = "Identical content already processed; linked to existing results."
+        else:
+            message = "File uploaded and added to processing queue."
         return {
             "status": "success",
             "asset_id": asset_id,
-            "current_state": "Raw",
-            "message": "File uploaded and added to processing queue."
+            "content_hash": content_hash,
+            "current_state": current_state,
+            "message": message
         }
         
     except Exception as e:
@@ -399,6 +399,15 @@ export default function ScaffoldingPage() {
     } catch (e) { console.error("Chat sync error", e); }
   },[activeChatId]);
 
+  // 会话列表只含元数据，切换到尚未加载正文的会话时拉取完整消息与证据
+  useEffect(() => {
+    if (!activeChatId) return;
+    const chat = chats.find(c => c.chat_id === activeChatId);
+    if (chat && chat.messages.length < (chat.messages_count || 0)) {
+      fullSyncChat(activeChatId);
+    }
+  }, [activeChatId, chats]);
+
 
   return (
     <div className="flex flex-col h-screen w-full bg-dracula-bg text-dracula-fg overflow-hidden font-sans">
@@ -70,6 +70,7 @@ export interface ChatSession {
   status: ChatStatus;
   messages: ChatMessage[];
   evidence: Evidence[]; // 存储后端返回的搜索证据
+  messages_count?: number; // 列表接口只返回计数，正文按需拉取
   last_active: string;
 }
 
@@ -85,6 +86,9 @@ export interface SingleAssetResponse {
     asset_processed_path: string;
     created_at: string;
     retry_count: number;
+    priority?: number;
+    estimated_cost?: { units: number; unit: 'pages' | 'seconds'; seconds: number };
+    eta_seconds?: number | null;  // 预计完成剩余秒数，未排队时为 null
   } | Record<string, any>; // 模式A返回Map，模式B返回对象
 }
 
@@ -7,6 +7,8 @@ from pathlib import Path
 
 # 导入业务逻辑单例
 from core.assets_manager import GlobalAssetManager
+from core.services_manager import ServicesManager
+from core.llm_client import LLMClient
 
 
 # 导入新编写的 API 路由 (假设文件路径如下)
@@ -37,11 +39,17 @@ async def lifespan(app: FastAPI):
     # 初始化单例管理器
     # 初始化后会从 json 自动加载历史状态并把 RAW 资产重新入队
     asset_manager = GlobalAssetManager()
+    # 上次退出时中断在各阶段的资产，从首个未完成阶段继续
+    await asset_manager.resume_interrupted()
 
     
     yield
     
     logger.info("--- [System Shutdown] ---")
+    # 释放常驻 worker 进程（显存）
+    await ServicesManager().shutdown()
+    # 关闭 DeepSeek 共享连接池
+    await LLMClient().aclose()
 
 # 初始化 FastAPI
 app = FastAPI(